@@ -1,5 +1,15 @@
 import streamlit as st
 import pandas as pd
+import sys
+import os
+
+# Add the parent of 'components' (i.e., the app folder) to sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURRENT_DIR)
+if PARENT_DIR not in sys.path:
+    sys.path.append(PARENT_DIR)
+
+from utils.load_data import load_recent_bids, record_trace_review
 
 def render():
     st.header("⚖️ Governance & Human-in-the-Loop Oversight")
@@ -9,15 +19,21 @@ def render():
         """
     )
 
-    # Policy trace table (mock)
-    trace = pd.DataFrame({
-        "step": [1, 2, 3],
-        "action": ["Bid 1.2M", "Bid 1.5M", "Hold"],
-        "reward": [120_000, 150_000, 90_000],
-        "compliant": [True, True, False]
-    })
+    # Policy trace: latest bids from the data lake (mock until a simulation has run)
     st.subheader("Policy Trace")
+    agent = st.text_input("Agent (e.g. A3; empty = all agents)", "").strip() or None
+    trace = load_recent_bids(n=200, agent=agent)
+    mock = trace.empty
+    if mock:
+        trace = pd.DataFrame({
+            "step": [1, 2, 3],
+            "action": ["Bid 1.2M", "Bid 1.5M", "Hold"],
+            "reward": [120_000, 150_000, 90_000],
+            "compliant": [True, True, False]
+        })
     st.dataframe(trace)
+    if not mock and st.button("🔏 Record review in audit trail"):
+        st.success(f"Recorded {record_trace_review(trace)} reviewed traces in the audit trail.")
 
     # Override demo
     st.subheader("Manual Policy Override")
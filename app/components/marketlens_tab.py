@@ -1,7 +1,16 @@
 import streamlit as st
 import pandas as pd
+import sys
 import os
 
+# Add the parent of 'components' (i.e., the app folder) to sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURRENT_DIR)
+if PARENT_DIR not in sys.path:
+    sys.path.append(PARENT_DIR)
+
+from utils.load_data import load_shap_importance, load_live_fairness
+
 MARKETLENS_DATA_PATH = os.path.join("..", "data", "processed", "marketlens_features.parquet")
 
 def render():
@@ -30,6 +39,23 @@ def render():
     st.subheader("MarketLens Sample Data")
     st.dataframe(df)
 
-    # SHAP / Fairness placeholder
+    # SHAP (cached by the fairness audit; never recomputed here)
     st.subheader("🔎 Fairness & Explainability")
-    st.info("SHAP visualizations and fairness metrics will be rendered here in a real deployment.")
+    importance = load_shap_importance()
+    if importance.empty:
+        st.info("Run marketlens/fairness_audit.py to compute SHAP values for this view.")
+    else:
+        st.caption("Mean |SHAP| per feature (acceptance model, cached sample)")
+        st.bar_chart(importance.set_index("feature")["mean_abs_shap"])
+
+    # Live fairness (streaming monitor counters; no re-scoring)
+    st.subheader("⚖️ Live Fairness")
+    window = st.selectbox("Window", ["1D", "7D", "30D"], index=1)
+    fairness = load_live_fairness(last=window)
+    if fairness.empty:
+        st.info("No scored quotes in this window yet. Quotes scored through marketlens.scoring.get_scorer() appear here.")
+    else:
+        single = fairness[~fairness["attributes"].str.contains(" x ")]
+        st.dataframe(single[["attributes", "group", "count", "mean_pred", "positive_rate", "parity_gap"]])
+        worst = fairness.loc[fairness["parity_gap"].abs().idxmax()]
+        st.metric("Largest parity gap", f"{worst['parity_gap']:+.2%}", help=f"{worst['attributes']}: {worst['group']}")
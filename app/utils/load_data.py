@@ -18,6 +18,12 @@ DATA_PROCESSED_DIR = os.path.join(APP_DIR, "..", "data", "processed")
 SIMULATION_RESULTS_PATH = os.path.join(DATA_PROCESSED_DIR, "simulation_results.parquet")
 DASHBOARD_DATA_PATH = os.path.join(DATA_PROCESSED_DIR, "dashboard_data.parquet")
 
+# Streaming fairness counters written by marketlens/fairness_monitor.py
+FAIRNESS_MONITOR_PATH = os.path.join(APP_DIR, "..", "marketlens", "models", "fairness_monitor.npz")
+
+# SHAP cache written by marketlens/fairness_audit.py (see marketlens/shap_cache.py)
+SHAP_CACHE_DIR = os.path.join(APP_DIR, "..", "marketlens", "models", "shap_cache")
+
 
 # -----------------------------------------------------------------------------
 # Load Simulation Results (Episode-Level KPIs)
@@ -31,8 +37,13 @@ def load_simulation_results() -> pd.DataFrame:
             ["round", "avg_profit", "win_rate", "cvar_95", "timestamp"]
         Empty DataFrame if file does not exist.
     """
-    if os.path.exists(SIMULATION_RESULTS_PATH):
-        return pd.read_parquet(SIMULATION_RESULTS_PATH)
+    # 03_run_simulation.py streams part files into this dataset directory while it runs,
+    # so a directory without parts yet means "no results so far".
+    has_parts = os.path.isdir(SIMULATION_RESULTS_PATH) and any(
+        f.endswith(".parquet") and not f.startswith(".") for f in os.listdir(SIMULATION_RESULTS_PATH)
+    )
+    if os.path.isfile(SIMULATION_RESULTS_PATH) or has_parts:
+        return pd.read_parquet(SIMULATION_RESULTS_PATH).sort_values("round", ignore_index=True)
     else:
         return pd.DataFrame(columns=["round", "avg_profit", "win_rate", "cvar_95", "timestamp"])
 
@@ -63,6 +74,89 @@ def load_dashboard_kpis() -> pd.DataFrame:
         )
 
 
+# -----------------------------------------------------------------------------
+# Load Cached SHAP Feature Importance (MarketLens)
+# -----------------------------------------------------------------------------
+def load_shap_importance() -> pd.DataFrame:
+    """
+    Mean |SHAP| per feature from the latest cached SHAP values (no recomputation).
+
+    Returns:
+        pd.DataFrame with columns ["feature", "mean_abs_shap"], descending.
+        Empty DataFrame if the fairness audit has not been run yet.
+    """
+    import sys
+    project_root = os.path.abspath(os.path.join(APP_DIR, ".."))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    from marketlens.shap_cache import ShapCache  # shap itself is only imported to compute values
+
+    cache = ShapCache.load_latest(SHAP_CACHE_DIR)
+    if cache is None:
+        return pd.DataFrame(columns=["feature", "mean_abs_shap"])
+    return cache.importance()
+
+
+# -----------------------------------------------------------------------------
+# Load Live Fairness (MarketLens streaming monitor)
+# -----------------------------------------------------------------------------
+def load_live_fairness(last: str = "7D", max_order: int = 2) -> pd.DataFrame:
+    """
+    Group fairness metrics over the last time window from the persisted monitor state
+    (computed from counters; nothing is re-scored).
+
+    Returns:
+        pd.DataFrame with one row per group (see marketlens/fairness_metrics.py).
+        Empty DataFrame if no monitor state exists yet.
+    """
+    if not os.path.exists(FAIRNESS_MONITOR_PATH):
+        return pd.DataFrame()
+    import sys
+    project_root = os.path.abspath(os.path.join(APP_DIR, ".."))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    from marketlens.fairness_monitor import FairnessMonitor
+
+    return FairnessMonitor.load(FAIRNESS_MONITOR_PATH).view(last=last, max_order=max_order)
+
+
+# -----------------------------------------------------------------------------
+# Load Recent Bids (data lake, simulation_runs)
+# -----------------------------------------------------------------------------
+def load_recent_bids(n: int = 200, agent: str = None, columns=None) -> pd.DataFrame:
+    """
+    Latest n bids (optionally of one agent, e.g. "A3") from the partitioned
+    simulation_runs dataset; only the newest run partitions are read.
+
+    Returns:
+        pd.DataFrame with columns like ["run_id", "episode", "agent_id", "action", "reward", "cvar_95", ...]
+        Empty DataFrame if no simulation has been run yet.
+    """
+    import sys
+    project_root = os.path.abspath(os.path.join(APP_DIR, ".."))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    from datalake.lake import tail
+
+    return tail("simulation_runs", n, [("agent_id", "=", agent)] if agent else None, columns=columns)
+
+
+def record_trace_review(trace: pd.DataFrame) -> int:
+    """
+    Record reviewed bids (e.g. from load_recent_bids) in the governance audit trail.
+
+    Returns:
+        Number of recorded traces.
+    """
+    import sys
+    project_root = os.path.abspath(os.path.join(APP_DIR, ".."))
+    if project_root not in sys.path:
+        sys.path.append(project_root)
+    from governance.policy_trace import audit_policy_traces
+
+    return audit_policy_traces(trace)
+
+
 # -----------------------------------------------------------------------------
 # Alias for compatibility with old imports
 # -----------------------------------------------------------------------------
@@ -1,11 +1,18 @@
+import os
+import sys
 from typing import List, Dict
 
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 class ClauseExplainer:
     """
     Generates natural language explanations for treaty bids using retrieved clauses.
+    Every explanation is recorded in the governance audit trail unless audit=False.
     """
 
-    def __init__(self):
+    def __init__(self, audit: bool = True):
+        self.audit = audit
         # Optional: add template library or language model integration here
         self.template = (
             "This quote of ${bid_value:,.0f} for {lob} (region: {region}) "
@@ -25,6 +32,11 @@ class ClauseExplainer:
         Returns:
             Explanation string
         """
+        explanation = self._quote_text(treaty_features, clauses, bid_value)
+        self._record(explanation, treaty_features, clauses, bid_value)
+        return explanation
+
+    def _quote_text(self, treaty_features: Dict, clauses: List[Dict], bid_value: float) -> str:
         lob = treaty_features.get("line_of_business", "Unknown")
         region = treaty_features.get("region", "Global")
         clause_texts = "; ".join([c.get("clause_text", "Unknown clause") for c in clauses])
@@ -36,18 +48,57 @@ class ClauseExplainer:
             clauses=clause_texts
         )
 
+    def _record(self, explanation: str, treaty_features: Dict, clauses: List[Dict], bid_value: float, **extra):
+        """Append the explanation to the tamper-evident audit trail (buffered)."""
+        if not self.audit:
+            return
+        from governance.audit_trail import get_audit_trail
+        get_audit_trail().record("explanation", treaty_features.get("treaty_id"), {
+            "source": "clauselens", "text": explanation, "treaty": treaty_features, "bid_value": bid_value,
+            "clause_ids": [c.get("clause_id") for c in clauses], **extra,
+        })
+
     def explain_with_risk(self, treaty_features: Dict, clauses: List[Dict], bid_value: float,
                           cvar_95: float, risk_adj_return: float) -> str:
         """
         Generates an explanation including CVaR and risk-adjusted metrics.
         Useful for governance/audit dashboards.
         """
-        base_explanation = self.explain_quote(treaty_features, clauses, bid_value)
+        base_explanation = self._quote_text(treaty_features, clauses, bid_value)
         risk_info = (
             f" CVaR 95% exposure is ${cvar_95:,.0f} "
             f"with a risk-adjusted return of {risk_adj_return:.2f}."
         )
-        return base_explanation + risk_info
+        explanation = base_explanation + risk_info
+        self._record(explanation, treaty_features, clauses, bid_value,
+                     cvar_95=cvar_95, risk_adj_return=risk_adj_return)
+        return explanation
+
+    def explain_with_drivers(self, treaty_features: Dict, clauses: List[Dict], bid_value: float,
+                             contributions: List[Dict], top_k: int = 3,
+                             target: str = "acceptance likelihood") -> str:
+        """
+        Generates an explanation including the model's main drivers for this quote.
+
+        Args:
+            contributions: list of {"feature", "contribution"} dicts, e.g. the "contributions"
+                of MarketLensScorer.explain_one() (largest |contribution| first)
+            top_k: number of drivers to mention
+            target: what the contributions explain (wording only)
+        """
+        base_explanation = self._quote_text(treaty_features, clauses, bid_value)
+        # Features that did not move this quote (contribution exactly 0) are not drivers
+        drivers = sorted((c for c in contributions if c["contribution"] != 0),
+                         key=lambda c: -abs(c["contribution"]))[:top_k]
+        explanation = base_explanation
+        if drivers:
+            driver_text = ", ".join(
+                f"{c['feature']} ({'raises' if c['contribution'] > 0 else 'lowers'} it, {c['contribution']:+.2f})"
+                for c in drivers
+            )
+            explanation += f" Main drivers of the {target}: {driver_text}."
+        self._record(explanation, treaty_features, clauses, bid_value, target=target, drivers=drivers)
+        return explanation
 
 
 # -----------------------------
@@ -75,3 +126,13 @@ if __name__ == "__main__":
     explanation_risk = explainer.explain_with_risk(treaty, clauses, bid_value=5_000_000,
                                                   cvar_95=3_200_000, risk_adj_return=1.45)
     print("\nExplanation with Risk Metrics:\n", explanation_risk)
+
+    # Example model drivers (as returned by MarketLensScorer.explain_one()["contributions"])
+    contributions = [
+        {"feature": "premium", "contribution": 0.42},
+        {"feature": "region_EU", "contribution": -0.11},
+        {"feature": "limit", "contribution": -0.35},
+    ]
+    explanation_drivers = explainer.explain_with_drivers(treaty, clauses, bid_value=5_000_000,
+                                                         contributions=contributions)
+    print("\nExplanation with Model Drivers:\n", explanation_drivers)
@@ -0,0 +1,226 @@
+"""
+lake.py
+
+Partitioned Parquet storage shared by the scripts, MarketLens, the MARL engine,
+governance and the Streamlit app (replaces the loose CSV hand-offs).
+- Every dataset is a hive-partitioned Parquet directory under data/lake/
+  (treaties by submission month and region, simulation outputs by run id);
+  writes append new part files, nothing is rewritten
+- Low-cardinality string columns are stored dictionary-encoded and come back
+  as pandas categoricals
+- Rows are sorted within each part (e.g. by agent, episode) so row-group
+  min/max statistics let filtered reads skip most of a file
+- Reads push column selections and filters down to partitions and row groups;
+  tail() reads newest partitions first and stops once it has enough rows
+"""
+
+import os
+import time
+import secrets
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LAKE_DIR = os.path.join(PROJECT_ROOT, "data", "lake")
+
+DATASETS = {
+    # partition_cols: directory levels; categorical_cols: dictionary-encoded columns;
+    # sort_by: row order within a part file; order_by: what "latest" means for tail();
+    # month_from: partition month derived from a date column when missing
+    "treaties": {
+        "partition_cols": ["submission_month", "region"],
+        "categorical_cols": ["cedent_id", "reinsurer_id", "treaty_type", "line_of_business"],
+        "sort_by": ["submission_date"],
+        "order_by": ["submission_date"],
+        "month_from": {"submission_month": "submission_date"},
+    },
+    "simulation_runs": {
+        "partition_cols": ["run_id"],
+        "categorical_cols": ["agent_id"],
+        "sort_by": ["agent_id", "episode"],
+        "order_by": ["episode"],
+    },
+    "simulation_stressed": {
+        "partition_cols": ["run_id"],
+        "categorical_cols": ["agent_id"],
+        "sort_by": ["agent_id", "episode"],
+        "order_by": ["episode"],
+    },
+}
+
+ROW_GROUP_SIZE = 65_536
+
+
+def dataset_path(name: str, lake_dir: str = None) -> str:
+    return os.path.join(lake_dir or LAKE_DIR, name)
+
+
+def new_run_id() -> str:
+    """
+    Sortable run id used as the simulation partition key: UTC timestamp with microseconds plus a
+    random suffix, so runs started in the same second (or microsecond) never share a partition.
+    """
+    now = time.time_ns()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now // 1_000_000_000))
+    return f"{stamp}{now // 1_000 % 1_000_000:06d}-{secrets.token_hex(3)}"
+
+
+def exists(name: str, path: str = None) -> bool:
+    """True if the dataset has at least one data file."""
+    path = path or dataset_path(name)
+    if not os.path.isdir(path):
+        return False
+    for _, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if not d.startswith((".", "_"))]
+        if any(f.endswith(".parquet") and not f.startswith((".", "_")) for f in files):
+            return True
+    return False
+
+
+# -----------------------------------------------------------------------------
+# Writing
+# -----------------------------------------------------------------------------
+def _prepare(df: pd.DataFrame, spec: dict) -> pd.DataFrame:
+    df = df.copy(deep=False)
+    for month_col, date_col in spec.get("month_from", {}).items():
+        if month_col not in df.columns:
+            dates = pd.to_datetime(df[date_col]).to_numpy().astype("datetime64[M]")
+            df[month_col] = dates.astype(str)
+    for col in spec["partition_cols"] + spec["categorical_cols"]:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    sort_by = [c for c in spec["sort_by"] if c in df.columns]
+    if sort_by:
+        df = df.sort_values(sort_by, kind="stable", ignore_index=True)
+    return df
+
+
+def write_dataset(df: pd.DataFrame, name: str, path: str = None, mode: str = "append",
+                  row_group_size: int = ROW_GROUP_SIZE) -> str:
+    """
+    Write df into the partitioned dataset.
+
+    mode:
+        "append": add new part files (default; cost is proportional to df only)
+        "overwrite_partitions": replace the partitions present in df (e.g. re-running a run id)
+        "overwrite": replace the whole dataset
+    """
+    spec = DATASETS[name]
+    path = path or dataset_path(name)
+    missing = [c for c in spec["partition_cols"] if c not in df.columns and c not in spec.get("month_from", {})]
+    if missing:
+        raise KeyError(f"❌ {name} rows need partition column(s) {missing}")
+    if mode == "overwrite" and os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path, exist_ok=True)
+
+    table = pa.Table.from_pandas(_prepare(df, spec), preserve_index=False)
+    partitioning = ds.partitioning(
+        pa.schema([(c, pa.string()) for c in spec["partition_cols"]]), flavor="hive"
+    )
+    # One physical type per column across appends: partition keys as strings, categoricals as dictionary<int32>
+    table = table.cast(pa.schema([
+        pa.field(f.name, pa.string()) if f.name in spec["partition_cols"]
+        else pa.field(f.name, pa.dictionary(pa.int32(), pa.string())) if f.name in spec["categorical_cols"]
+        else f
+        for f in table.schema
+    ]))
+    ds.write_dataset(
+        table, path, format="parquet", partitioning=partitioning,
+        # Nanosecond prefix: part names sort in write order, which tail() relies on
+        basename_template=f"part-{time.time_ns():020d}-{{i}}.parquet",
+        existing_data_behavior="delete_matching" if mode == "overwrite_partitions" else "overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd", use_dictionary=True),
+        max_rows_per_group=row_group_size,
+        min_rows_per_group=min(row_group_size, max(len(df), 1)),
+    )
+    return path
+
+
+# -----------------------------------------------------------------------------
+# Reading
+# -----------------------------------------------------------------------------
+def open_dataset(name: str, path: str = None):
+    """pyarrow Dataset with hive partitions as dictionary (categorical) columns; None if missing."""
+    path = path or dataset_path(name)
+    if not exists(name, path):
+        return None
+    return ds.dataset(path, format="parquet",
+                      partitioning=ds.HivePartitioning.discover(infer_dictionary=True),
+                      exclude_invalid_files=True, ignore_prefixes=[".", "_"])
+
+
+def _expression(filters):
+    """Accept a pyarrow Expression or DNF tuples, e.g. [("agent_id", "=", "A3"), ("episode", ">", 10)]."""
+    if filters is None or isinstance(filters, ds.Expression):
+        return filters
+    return pq.filters_to_expression(filters)
+
+
+def read_dataset(name: str, columns=None, filters=None, path: str = None) -> pd.DataFrame:
+    """Read (part of) a dataset; only matching partitions / row groups and requested columns are loaded."""
+    dataset = open_dataset(name, path)
+    if dataset is None:
+        return pd.DataFrame(columns=columns or [])
+    return dataset.to_table(columns=columns, filter=_expression(filters)).to_pandas()
+
+
+def iter_batches(name: str, columns=None, filters=None, batch_size: int = ROW_GROUP_SIZE, path: str = None):
+    """Yield DataFrame batches of a dataset (bounded memory)."""
+    dataset = open_dataset(name, path)
+    if dataset is None:
+        return
+    for batch in dataset.to_batches(columns=columns, filter=_expression(filters), batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def partition_values(name: str, column: str, path: str = None) -> list:
+    """Sorted values of a top-level partition column, from directory names only (no file reads)."""
+    path = path or dataset_path(name)
+    prefix = f"{column}="
+    if not os.path.isdir(path):
+        return []
+    return sorted(d[len(prefix):] for d in os.listdir(path) if d.startswith(prefix))
+
+
+def tail(name: str, n: int = 200, filters=None, columns=None, path: str = None) -> pd.DataFrame:
+    """
+    Latest n matching rows (by top-level partition, then the dataset's order_by), e.g. the last
+    200 bids of agent A3: tail("simulation_runs", 200, [("agent_id", "=", "A3")]).
+    Partitions are read newest first and reading stops once n rows are found.
+    """
+    dataset = open_dataset(name, path)
+    if dataset is None:
+        return pd.DataFrame(columns=columns or [])
+    spec = DATASETS[name]
+    # Recency: the top-level partition (time-ordered: month / run id) then order_by; lower partition
+    # levels (e.g. region) are not time-ordered and must not split a month
+    order = spec["partition_cols"][:1] + spec["order_by"]
+    expression = _expression(filters)
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + order))
+
+    def newest_first(fragment):
+        keys = ds.get_partition_keys(fragment.partition_expression)
+        return tuple(str(keys.get(c, "")) for c in spec["partition_cols"]), os.path.basename(fragment.path)
+
+    tables, rows, current = [], 0, None
+    for fragment in sorted(dataset.get_fragments(filter=expression), key=newest_first, reverse=True):
+        top = newest_first(fragment)[0][:1]
+        if rows >= n and top != current:
+            break  # whole newest top-level partitions read; older ones cannot contribute
+        current = top
+        table = fragment.to_table(schema=dataset.schema, columns=read_columns, filter=expression)
+        if table.num_rows:
+            tables.append(table)
+            rows += table.num_rows
+    if not tables:
+        return pd.DataFrame(columns=read_columns or dataset.schema.names)
+
+    df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+    df = df.sort_values([c for c in order if c in df.columns], kind="stable",
+                        key=lambda col: col.astype(str) if col.name in spec["partition_cols"] else col).tail(n)
+    return df[columns].reset_index(drop=True) if columns is not None else df.reset_index(drop=True)
@@ -0,0 +1,438 @@
+"""
+audit_trail.py
+
+Tamper-evident audit trail for governance decisions (policy traces, overrides,
+explanations).
+- Every record is hashed (leaf) and chained to its predecessor:
+    leaf_i  = H(0x00 || seq | kind | record_id | timestamp | payload)
+    chain_i = H(chain_{i-1} || leaf_i)
+  so editing, deleting or reordering any record breaks every later link
+- Records are sealed into blocks by periodic Merkle checkpoints (every
+  checkpoint_every records or checkpoint_interval seconds); checkpoints are
+  chained too, so the checkpoint list is a compact commitment to the whole log
+- Blocks verify independently (from the previous checkpoint's chain hash), so
+  a time range is verified by rehashing only its blocks, optionally in parallel
+- Inclusion of a single record is proven against its checkpoint's Merkle root
+  with a log2(block size) path; no other record is rehashed
+- Writes are buffered and appended in batches, one SQLite transaction each
+"""
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import hashlib
+import threading
+import pandas as pd
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+AUDIT_DB_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "audit_trail.db")
+
+BATCH_SIZE = 1_000
+CHECKPOINT_EVERY = 4_096  # records per Merkle block (proof length log2 = 12)
+CHECKPOINT_INTERVAL = 3_600  # seconds; seals a partial block so sparse logs become provable
+GENESIS = bytes(32)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    seq        INTEGER PRIMARY KEY,
+    kind       TEXT NOT NULL,
+    record_id  TEXT,
+    timestamp  TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    leaf       BLOB NOT NULL,
+    chain_hash BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_record_id ON records (record_id);
+CREATE INDEX IF NOT EXISTS idx_records_timestamp ON records (timestamp);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    id              INTEGER PRIMARY KEY,
+    start_seq       INTEGER NOT NULL,
+    end_seq         INTEGER NOT NULL UNIQUE,
+    merkle_root     BLOB NOT NULL,
+    chain_hash      BLOB NOT NULL,
+    checkpoint_hash BLOB NOT NULL,
+    timestamp       TEXT NOT NULL
+);
+"""
+RECORD_COLUMNS = ["seq", "kind", "record_id", "timestamp", "payload"]
+
+
+# -----------------------------------------------------------------------------
+# Hashing
+# -----------------------------------------------------------------------------
+def _h(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def _json_default(value):
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def canonical(payload) -> str:
+    """Deterministic JSON text of a payload (sorted keys, no whitespace)."""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+def leaf_hash(seq: int, kind: str, record_id, timestamp: str, payload: str) -> bytes:
+    rid = "" if record_id is None else record_id
+    # Length-prefixed fields keep the boundaries unambiguous (None and "" differ by the -1)
+    header = f"{seq}|{len(kind)}:{kind}|{-1 if record_id is None else len(rid)}:{rid}|{len(timestamp)}:{timestamp}|"
+    return _h(b"\x00" + header.encode() + payload.encode())
+
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return _h(b"\x01" + left + right)
+
+
+def merkle_root(leaves) -> bytes:
+    """Merkle root of leaf hashes (an unpaired node is promoted to the next level)."""
+    level = list(leaves)
+    if not level:
+        return GENESIS
+    while len(level) > 1:
+        paired = [_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        level = paired + level[-1:] if len(level) % 2 else paired
+    return level[0]
+
+
+def merkle_path(leaves, index: int) -> list:
+    """Sibling hashes from leaf `index` up to the root: [("L" | "R", hex), ...]."""
+    level, path = list(leaves), []
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append(("L" if sibling < index else "R", level[sibling].hex()))
+        paired = [_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        level = paired + level[-1:] if len(level) % 2 else paired
+        index //= 2
+    return path
+
+
+def _checkpoint_hash(previous: bytes, start_seq: int, end_seq: int, root: bytes, chain: bytes) -> bytes:
+    return _h(previous + f"{start_seq}:{end_seq}".encode() + root + chain)
+
+
+def verify_proof(proof: dict, record: dict = None) -> bool:
+    """
+    Check an inclusion proof from AuditTrail.prove() in O(log n).
+    If `record` (seq, kind, record_id, timestamp, payload) is given, its leaf is recomputed
+    instead of trusting proof["leaf"]. Compare proof["merkle_root"] with a checkpoint you trust.
+    """
+    leaf = bytes.fromhex(proof["leaf"])
+    if record is not None:
+        payload = record["payload"] if isinstance(record["payload"], str) else canonical(record["payload"])
+        leaf = leaf_hash(int(record["seq"]), record["kind"], record["record_id"], record["timestamp"], payload)
+        if leaf.hex() != proof["leaf"]:
+            return False
+    node = leaf
+    for side, sibling in proof["path"]:
+        node = _node(bytes.fromhex(sibling), node) if side == "L" else _node(node, bytes.fromhex(sibling))
+    return node.hex() == proof["merkle_root"]
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _iso(value) -> str:
+    ts = pd.Timestamp(value)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.isoformat(timespec="microseconds")
+
+
+# -----------------------------------------------------------------------------
+# Block verification (module level so it can run in worker processes)
+# -----------------------------------------------------------------------------
+def _verify_block(path: str, start_seq: int, end_seq: int, anchor: bytes, root: bytes = None, chain: bytes = None):
+    """Rehash records start_seq..end_seq from the previous chain hash; returns (n, first bad seq, error)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT seq, kind, record_id, timestamp, payload, leaf, chain_hash FROM records "
+            "WHERE seq BETWEEN ? AND ? ORDER BY seq", (start_seq, end_seq))
+        previous, leaves, expected = anchor, [], start_seq
+        for seq, kind, record_id, ts, payload, leaf, chain_hash in rows:
+            if seq != expected:
+                return len(leaves), expected, "missing record"
+            computed = leaf_hash(seq, kind, record_id, ts, payload)
+            if computed != leaf:
+                return len(leaves), seq, "record content does not match its hash"
+            previous = _h(previous + computed)
+            if previous != chain_hash:
+                return len(leaves), seq, "broken hash chain"
+            leaves.append(computed)
+            expected += 1
+        if expected != end_seq + 1:
+            return len(leaves), expected, "missing record"
+        if root is not None and (merkle_root(leaves) != root or previous != chain):
+            return len(leaves), start_seq, "block does not match its Merkle checkpoint"
+        return len(leaves), None, None
+    finally:
+        conn.close()
+
+
+class AuditTrail:
+    """
+    Append-only, hash-chained audit log with Merkle checkpoints.
+
+    Args:
+        path: SQLite database file (created on first use).
+        batch_size: buffered records written per transaction.
+        checkpoint_every: records per Merkle block.
+        checkpoint_interval: seconds after which a partial block is sealed at the next flush.
+    """
+
+    def __init__(self, path: str = None, batch_size: int = BATCH_SIZE, checkpoint_every: int = CHECKPOINT_EVERY,
+                 checkpoint_interval: float = CHECKPOINT_INTERVAL, timeout: float = 30.0):
+        self.path = path or AUDIT_DB_PATH
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")  # one fsync per batch, not per record
+        self._conn.executescript(SCHEMA)
+
+    # -------------------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------------------
+    def record(self, kind: str, record_id, payload, timestamp=None):
+        """Buffer one decision record; written with the next batch."""
+        ts = _utc_now() if timestamp is None else _iso(timestamp)
+        entry = (kind, None if record_id is None else str(record_id), canonical(payload), ts)
+        with self._lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def record_frame(self, kind: str, df: pd.DataFrame, id_column: str = "bid_id"):
+        """Buffer one record per row (payload = the row's columns)."""
+        ts = _utc_now()
+        ids = df[id_column].astype(str).tolist() if id_column in df.columns else [None] * len(df)
+        entries = [(kind, record_id, canonical(row), ts) for record_id, row in zip(ids, df.to_dict(orient="records"))]
+        with self._lock:
+            self._buffer.extend(entries)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Append buffered records (chained) and seal due checkpoints in one transaction."""
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+            if not pending:
+                return 0
+            self._conn.execute("BEGIN IMMEDIATE")  # the chain head must not move while we extend it
+            try:
+                last = self._conn.execute("SELECT seq, chain_hash FROM records ORDER BY seq DESC LIMIT 1").fetchone()
+                seq, chain = last if last else (0, GENESIS)
+                rows = []
+                for kind, record_id, payload, ts in pending:
+                    seq += 1
+                    leaf = leaf_hash(seq, kind, record_id, ts, payload)
+                    chain = _h(chain + leaf)
+                    rows.append((seq, kind, record_id, ts, payload, leaf, chain))
+                self._conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._seal(force=False)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._buffer = pending + self._buffer
+                raise
+        return len(rows)
+
+    def checkpoint(self) -> int:
+        """Flush and seal all unsealed records now; returns the number of new checkpoints."""
+        self.flush()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                n = self._seal(force=True)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return n
+
+    def _seal(self, force: bool) -> int:
+        """Write Merkle checkpoints for full blocks (and a partial one if forced or overdue)."""
+        last_cp = self._conn.execute(
+            "SELECT end_seq, checkpoint_hash FROM checkpoints ORDER BY end_seq DESC LIMIT 1").fetchone()
+        sealed_to, previous = last_cp if last_cp else (0, GENESIS)
+        head = self._conn.execute("SELECT MAX(seq) FROM records").fetchone()[0] or 0
+        n = 0
+        while head > sealed_to:
+            end = min(sealed_to + self.checkpoint_every, head)
+            if end - sealed_to < self.checkpoint_every and not force:
+                oldest = self._conn.execute("SELECT timestamp FROM records WHERE seq = ?", (sealed_to + 1,)).fetchone()[0]
+                age = (pd.Timestamp(_utc_now()) - pd.Timestamp(oldest)).total_seconds()
+                if age < self.checkpoint_interval:
+                    break
+            leaves = [r[0] for r in self._conn.execute(
+                "SELECT leaf FROM records WHERE seq BETWEEN ? AND ? ORDER BY seq", (sealed_to + 1, end))]
+            chain = self._conn.execute("SELECT chain_hash FROM records WHERE seq = ?", (end,)).fetchone()[0]
+            root = merkle_root(leaves)
+            previous = _checkpoint_hash(previous, sealed_to + 1, end, root, chain)
+            self._conn.execute(
+                "INSERT INTO checkpoints (start_seq, end_seq, merkle_root, chain_hash, checkpoint_hash, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (sealed_to + 1, end, root, chain, previous, _utc_now()))
+            sealed_to, n = end, n + 1
+        return n
+
+    # -------------------------------------------------------------------------
+    # Reads & proofs
+    # -------------------------------------------------------------------------
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def history(self, kind: str = None, record_id=None, since=None, until=None, limit: int = None) -> pd.DataFrame:
+        """Written records matching all given conditions, oldest first."""
+        where, params = [], []
+        if kind is not None:
+            where.append("kind = ?")
+            params.append(kind)
+        if record_id is not None:
+            where.append("record_id = ?")
+            params.append(str(record_id))
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(_iso(since))
+        if until is not None:
+            where.append("timestamp < ?")
+            params.append(_iso(until))
+        sql = f"SELECT {', '.join(RECORD_COLUMNS)} FROM records"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if limit is not None:
+            sql = f"SELECT * FROM ({sql} ORDER BY seq DESC LIMIT {int(limit)}) ORDER BY seq"
+        else:
+            sql += " ORDER BY seq"
+        return pd.DataFrame(self._query(sql, params), columns=RECORD_COLUMNS)
+
+    def head(self) -> dict:
+        """Latest chain hash and checkpoint hash (publish these to anchor the log externally)."""
+        record = self._query("SELECT seq, chain_hash FROM records ORDER BY seq DESC LIMIT 1")
+        cp = self._query("SELECT end_seq, checkpoint_hash FROM checkpoints ORDER BY end_seq DESC LIMIT 1")
+        return {
+            "seq": record[0][0] if record else 0,
+            "chain_hash": (record[0][1] if record else GENESIS).hex(),
+            "checkpoint_seq": cp[0][0] if cp else 0,
+            "checkpoint_hash": (cp[0][1] if cp else GENESIS).hex(),
+        }
+
+    def prove(self, seq: int) -> dict:
+        """Inclusion proof of record `seq` against its block's Merkle root (see verify_proof)."""
+        cp = self._query("SELECT id, start_seq, end_seq, merkle_root FROM checkpoints "
+                         "WHERE end_seq >= ? ORDER BY end_seq LIMIT 1", (seq,))
+        if not cp or cp[0][1] > seq:
+            raise ValueError(f"❌ Record {seq} is not sealed by a checkpoint yet; call checkpoint() first.")
+        cp_id, start, end, root = cp[0]
+        leaves = [r[0] for r in self._query("SELECT leaf FROM records WHERE seq BETWEEN ? AND ? ORDER BY seq",
+                                            (start, end))]
+        return {
+            "seq": seq,
+            "checkpoint": cp_id,
+            "leaf": leaves[seq - start].hex(),
+            "path": merkle_path(leaves, seq - start),
+            "merkle_root": root.hex(),
+        }
+
+    # -------------------------------------------------------------------------
+    # Verification
+    # -------------------------------------------------------------------------
+    def verify(self, since=None, until=None, workers: int = 1) -> dict:
+        """
+        Verify the checkpoint chain, then rehash the blocks overlapping [since, until)
+        (default: everything, including unsealed records) against their checkpoints.
+        """
+        self.flush()
+        t0 = time.time()
+        checkpoints = self._query("SELECT start_seq, end_seq, merkle_root, chain_hash, checkpoint_hash "
+                                  "FROM checkpoints ORDER BY end_seq")
+        report = {"ok": True, "records": 0, "checkpoints": len(checkpoints), "first_bad_seq": None, "error": None}
+
+        # 1. Checkpoint chain: O(#checkpoints)
+        previous, sealed_to = GENESIS, 0
+        for start, end, root, chain, cp_hash in checkpoints:
+            if start != sealed_to + 1 or _checkpoint_hash(previous, start, end, root, chain) != cp_hash:
+                report.update(ok=False, first_bad_seq=start, error="broken checkpoint chain")
+                return report
+            previous, sealed_to = cp_hash, end
+
+        # 2. Blocks overlapping the range (each anchored at the previous checkpoint's chain hash)
+        lo, hi = 1, float("inf")
+        if since is not None:
+            lo = self._query("SELECT MIN(seq) FROM records WHERE timestamp >= ?", (_iso(since),))[0][0]
+        if until is not None:
+            hi = self._query("SELECT MAX(seq) FROM records WHERE timestamp < ?", (_iso(until),))[0][0]
+        head = self._query("SELECT MAX(seq) FROM records")[0][0] or 0
+        if lo is None or hi is None:
+            report["seconds"] = time.time() - t0
+            return report
+        blocks, anchor = [], GENESIS
+        for start, end, root, chain, _ in checkpoints:
+            if end >= lo and start <= hi:
+                blocks.append((self.path, start, end, anchor, root, chain))
+            anchor = chain
+        if head > sealed_to and hi > sealed_to:
+            blocks.append((self.path, sealed_to + 1, head, anchor, None, None))  # unsealed tail: chain only
+
+        if workers > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_verify_block, *zip(*blocks)))
+        else:
+            results = [_verify_block(*block) for block in blocks]
+        for n, bad_seq, error in results:
+            report["records"] += n
+            if error and report["ok"]:
+                report.update(ok=False, first_bad_seq=bad_seq, error=error)
+        report["seconds"] = time.time() - t0
+        return report
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+    def close(self):
+        if self._buffer:
+            self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_TRAIL = None
+
+
+def get_audit_trail() -> AuditTrail:
+    """Process-wide audit trail at AUDIT_DB_PATH (buffered records are flushed at exit)."""
+    global _TRAIL
+    if _TRAIL is None:
+        _TRAIL = AuditTrail(AUDIT_DB_PATH)
+        atexit.register(_TRAIL.close)
+    return _TRAIL
+
+
+if __name__ == "__main__":
+    with AuditTrail() as trail:
+        report = trail.verify()
+        status = "✅ Audit trail intact" if report["ok"] else f"❌ Audit trail broken at seq {report['first_bad_seq']}: {report['error']}"
+        print(f"{status} ({report['records']:,} records, {report['checkpoints']:,} checkpoints, {report['seconds']:.2f}s)")
+        print(f"🔗 Head: {trail.head()}")
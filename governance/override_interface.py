@@ -1,55 +1,81 @@
 import os
+import sys
 import pandas as pd
 
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datalake.lake import read_dataset, exists, partition_values
+from governance.override_store import OverrideStore, OVERRIDE_DB_PATH
+from governance.risk_screener import RiskScreener
+from governance.audit_trail import get_audit_trail
+
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-SIM_RUNS_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "simulation_runs.csv")
-OVERRIDE_LOG_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "override_log.csv")
+SIM_RUNS_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "simulation_runs.csv")  # legacy fallback
+OVERRIDE_LOG_PATH = OVERRIDE_DB_PATH
+LEGACY_OVERRIDE_CSV = os.path.join(PROJECT_ROOT, "data", "processed", "override_log.csv")
 
+_STORE = None
+_SCREENER = None
 
-def find_high_risk_bids(threshold_compliance: float = 0.6):
-    """Return bids with compliance below threshold for manual review."""
+
+def get_override_store() -> OverrideStore:
+    """Process-wide override store; a legacy override_log.csv is imported once into an empty store."""
+    global _STORE
+    if _STORE is None:
+        _STORE = OverrideStore(OVERRIDE_LOG_PATH)
+        if os.path.exists(LEGACY_OVERRIDE_CSV):
+            # Emptiness check and import in one transaction: concurrent first reviewers import once
+            n = _STORE.import_csv(LEGACY_OVERRIDE_CSV, only_if_empty=True)
+            if n:
+                print(f"✅ Imported {n} legacy overrides from {LEGACY_OVERRIDE_CSV}")
+    return _STORE
+
+
+def load_latest_run(columns=None) -> pd.DataFrame:
+    """Bids of the most recent simulation run (one run_id partition of the data lake; legacy CSV fallback)."""
+    if exists("simulation_runs"):
+        run_id = partition_values("simulation_runs", "run_id")[-1]
+        return read_dataset("simulation_runs", columns=columns, filters=[("run_id", "=", run_id)])
     if not os.path.exists(SIM_RUNS_PATH):
-        raise FileNotFoundError("❌ simulation_runs.csv not found. Run run_simulation.py first.")
-    
-    df = pd.read_csv(SIM_RUNS_PATH)
-    cols = df.columns.tolist()
-
-    # Normalize column names for easier use
-    df.rename(columns={
-        "agent_id": "agent",
-        "reward": "profit",
-        "cvar_95": "cvar"
-    }, inplace=True)
-
-    # 1. Generate compliance if missing
-    if "compliance" not in df.columns:
-        print("⚠️ 'compliance' column not found. Generating proxy compliance...")
-        if "cvar" in df.columns:
-            df["compliance"] = 1 - (df["cvar"] / (df["cvar"].max() + 1e-9))
-        else:
-            df["compliance"] = (df["profit"] - df["profit"].min()) / (
-                df["profit"].max() - df["profit"].min() + 1e-9
-            )
-
-    # 2. Generate synthetic bid_id if missing
-    if "bid_id" not in df.columns:
-        df["bid_id"] = df["episode"].astype(str) + "_" + df["agent"].astype(str) + "_" + df.index.astype(str)
-
-    risky_bids = df[df["compliance"] < threshold_compliance]
-    return risky_bids
-
-
-def override_policy(bid_ids, reason="Manual override due to risk"):
-    """Log a manual override for selected bid IDs."""
-    logs = [{"bid_id": bid, "override_reason": reason} for bid in bid_ids]
-    
-    log_df = pd.DataFrame(logs)
-    if os.path.exists(OVERRIDE_LOG_PATH):
-        existing = pd.read_csv(OVERRIDE_LOG_PATH)
-        log_df = pd.concat([existing, log_df], ignore_index=True)
-
-    log_df.to_csv(OVERRIDE_LOG_PATH, index=False)
-    print(f"✅ Overrides logged for {len(bid_ids)} bids at {OVERRIDE_LOG_PATH}")
+        raise FileNotFoundError("❌ simulation_runs not found. Run run_simulation.py first.")
+    return pd.read_csv(SIM_RUNS_PATH, usecols=columns)
+
+
+def get_risk_screener() -> RiskScreener:
+    """Process-wide incremental screener (latest data lake run; legacy CSV fallback)."""
+    global _SCREENER
+    if _SCREENER is None:
+        if not exists("simulation_runs") and not os.path.exists(SIM_RUNS_PATH):
+            raise FileNotFoundError("❌ simulation_runs not found. Run run_simulation.py first.")
+        _SCREENER = RiskScreener() if exists("simulation_runs") else RiskScreener(csv_path=SIM_RUNS_PATH)
+    return _SCREENER
+
+
+def find_high_risk_bids(threshold_compliance: float = 0.6):
+    """Return bids with compliance below threshold for manual review (only bids new since the last call are read)."""
+    screener = get_risk_screener()
+    screener.refresh()
+    return screener.high_risk(threshold_compliance)
+
+
+def override_policy(bid_ids, reason="Manual override due to risk", reviewer: str = None, action: str = None):
+    """Log a manual override for selected bid IDs (one atomic append; cost independent of history size)."""
+    n = get_override_store().append(bid_ids, reason=reason, reviewer=reviewer, action=action)
+    trail = get_audit_trail()
+    for bid in [bid_ids] if isinstance(bid_ids, str) else bid_ids:
+        trail.record("override", bid, {"reason": reason, "reviewer": reviewer, "action": action})
+    trail.flush()  # overrides are rare; make each one durable immediately
+    print(f"✅ Overrides logged for {n} bids at {OVERRIDE_LOG_PATH}")
+
+
+def is_overridden(bid_id) -> bool:
+    return get_override_store().is_overridden(bid_id)
+
+
+def load_overrides(bid_id=None, reviewer: str = None, since=None, until=None, limit: int = None) -> pd.DataFrame:
+    """Logged overrides, e.g. load_overrides(reviewer="jdoe", since="2025-08-01")."""
+    return get_override_store().history(bid_id, reviewer, since, until, limit)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+"""
+override_store.py
+
+Append-only store for manual governance overrides.
+- SQLite in WAL mode: readers never block the writer, concurrent reviewers
+  (Streamlit sessions, scripts) serialize their short write transactions
+- Each override is one appended row; a write costs the same whatever the
+  history size (no read-concatenate-rewrite of a CSV)
+- Indexed by bid_id, reviewer and timestamp, so "is this bid overridden?" and
+  reviewer / time-range queries are index lookups
+- Rows are never updated or deleted; the latest row per bid wins
+"""
+
+import os
+import sqlite3
+import threading
+import pandas as pd
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+OVERRIDE_DB_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "override_log.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS overrides (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    bid_id    TEXT NOT NULL,
+    reviewer  TEXT,
+    reason    TEXT,
+    action    TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_overrides_bid_id ON overrides (bid_id);
+CREATE INDEX IF NOT EXISTS idx_overrides_reviewer ON overrides (reviewer, timestamp);
+CREATE INDEX IF NOT EXISTS idx_overrides_timestamp ON overrides (timestamp);
+"""
+COLUMNS = ["id", "bid_id", "reviewer", "reason", "action", "timestamp"]
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _iso(value) -> str:
+    """ISO-8601 UTC text (sorts chronologically, so the timestamp index serves range queries)."""
+    ts = pd.Timestamp(value)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.isoformat(timespec="microseconds")
+
+
+class OverrideStore:
+    """
+    Indexed, append-only override log.
+
+    Args:
+        path: SQLite database file (created on first use).
+        timeout: seconds a writer waits for a concurrent writer's transaction.
+    """
+
+    def __init__(self, path: str = None, timeout: float = 30.0):
+        self.path = path or OVERRIDE_DB_PATH
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()  # one connection shared by the threads of this process
+        self._conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; no fsync per commit
+        self._conn.executescript(SCHEMA)
+
+    # -------------------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------------------
+    def append(self, bid_ids, reason: str = None, reviewer: str = None, action: str = None, timestamp=None) -> int:
+        """Append one override per bid id in a single atomic transaction; returns the number of rows."""
+        if isinstance(bid_ids, str):
+            bid_ids = [bid_ids]
+        ts = _utc_now() if timestamp is None else _iso(timestamp)
+        rows = [(str(bid), reviewer, reason, action, ts) for bid in bid_ids]
+        if not rows:
+            return 0
+        return self._insert(rows)
+
+    def _insert(self, rows, only_if_empty: bool = False) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")  # take the write lock up front (no upgrade deadlocks)
+            try:
+                # Checked under the write lock, so two concurrent first writers cannot both see an empty store
+                if only_if_empty and self._conn.execute("SELECT 1 FROM overrides LIMIT 1").fetchone():
+                    self._conn.execute("ROLLBACK")
+                    return 0
+                self._conn.executemany(
+                    "INSERT INTO overrides (bid_id, reviewer, reason, action, timestamp) VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def import_csv(self, csv_path: str, reviewer: str = None, only_if_empty: bool = False) -> int:
+        """
+        One-off import of a legacy override_log.csv (bid_id, override_reason[, timestamp]).
+        only_if_empty: import nothing (returns 0) unless the store is empty, checked atomically with the insert.
+        """
+        legacy = pd.read_csv(csv_path)
+        ts = legacy["timestamp"].map(_iso) if "timestamp" in legacy.columns else pd.Series(_utc_now(), index=legacy.index)
+        rows = list(zip(legacy["bid_id"].astype(str), [reviewer] * len(legacy),
+                        legacy.get("override_reason", pd.Series(None, index=legacy.index)), [None] * len(legacy), ts))
+        return self._insert(rows, only_if_empty=only_if_empty)
+
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def is_overridden(self, bid_id) -> bool:
+        return bool(self._query("SELECT 1 FROM overrides WHERE bid_id = ? LIMIT 1", (str(bid_id),)))
+
+    def overridden(self, bid_ids) -> set:
+        """Subset of bid_ids that have at least one override (index lookups in batches)."""
+        bid_ids = [str(b) for b in bid_ids]
+        found = set()
+        for i in range(0, len(bid_ids), 500):  # stay below SQLite's bound-parameter limit
+            batch = bid_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(r[0] for r in self._query(
+                f"SELECT DISTINCT bid_id FROM overrides WHERE bid_id IN ({placeholders})", batch))
+        return found
+
+    def latest(self, bid_id):
+        """Most recent override of a bid as a dict (None if never overridden)."""
+        rows = self._query(f"SELECT {', '.join(COLUMNS)} FROM overrides WHERE bid_id = ? ORDER BY id DESC LIMIT 1",
+                           (str(bid_id),))
+        return dict(zip(COLUMNS, rows[0])) if rows else None
+
+    def history(self, bid_id=None, reviewer: str = None, since=None, until=None, limit: int = None) -> pd.DataFrame:
+        """Overrides matching all given conditions, oldest first (each condition uses an index)."""
+        where, params = [], []
+        if bid_id is not None:
+            where.append("bid_id = ?")
+            params.append(str(bid_id))
+        if reviewer is not None:
+            where.append("reviewer = ?")
+            params.append(reviewer)
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(_iso(since))
+        if until is not None:
+            where.append("timestamp < ?")
+            params.append(_iso(until))
+        sql = f"SELECT {', '.join(COLUMNS)} FROM overrides"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if limit is not None:
+            # Latest `limit` rows, returned in chronological order
+            sql = f"SELECT * FROM ({sql} ORDER BY id DESC LIMIT {int(limit)}) ORDER BY id"
+        else:
+            sql += " ORDER BY id"
+        return pd.DataFrame(self._query(sql, params), columns=COLUMNS)
+
+    def count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM overrides")[0][0]
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
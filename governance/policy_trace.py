@@ -1,23 +1,36 @@
 import os
+import sys
 import pandas as pd
 import plotly.express as px
 
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datalake.lake import tail, exists
+from governance.audit_trail import get_audit_trail
+
 # -----------------------------
 # Paths
 # -----------------------------
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-SIM_RUNS_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "simulation_runs.csv")
+SIM_RUNS_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "simulation_runs.csv")  # legacy fallback
 
 
-def load_policy_traces(n_last: int = 200) -> pd.DataFrame:
+def load_policy_traces(n_last: int = 200, agent: str = None) -> pd.DataFrame:
     """
-    Load recent bids for governance visualization.
+    Load recent bids (optionally of one agent, e.g. "A3") for governance visualization.
+    From the data lake only the newest run partitions / matching row groups are read.
     Auto-generates compliance and bid_id if missing.
     """
-    if not os.path.exists(SIM_RUNS_PATH):
-        raise FileNotFoundError("❌ simulation_runs.csv not found. Run run_simulation.py first.")
-
-    df = pd.read_csv(SIM_RUNS_PATH)
+    filters = [("agent_id", "=", agent)] if agent else None
+    if exists("simulation_runs"):
+        df = tail("simulation_runs", n_last, filters)
+    elif os.path.exists(SIM_RUNS_PATH):
+        df = pd.read_csv(SIM_RUNS_PATH)
+        if agent:
+            df = df[df["agent_id"] == agent].reset_index(drop=True)
+    else:
+        raise FileNotFoundError("❌ simulation_runs not found. Run run_simulation.py first.")
     cols = df.columns.tolist()
 
     # 1. Normalize column names for consistency
@@ -50,6 +63,16 @@ def load_policy_traces(n_last: int = 200) -> pd.DataFrame:
     return df.tail(n_last)
 
 
+def audit_policy_traces(df: pd.DataFrame) -> int:
+    """
+    Append reviewed policy traces to the tamper-evident audit trail (one record per bid, batched).
+    """
+    trail = get_audit_trail()
+    trail.record_frame("policy_trace", df, id_column="bid_id")
+    trail.flush()
+    return len(df)
+
+
 def plot_policy_traces(df: pd.DataFrame):
     """
     Create a scatter plot of Profit vs Compliance for governance visualization.
@@ -73,5 +96,6 @@ def plot_policy_traces(df: pd.DataFrame):
 if __name__ == "__main__":
     df = load_policy_traces(200)
     print(f"✅ Loaded {len(df)} recent bids for policy trace visualization.")
+    print(f"🔏 Recorded {audit_policy_traces(df)} reviewed traces in the audit trail.")
     fig = plot_policy_traces(df)
     fig.show()
@@ -0,0 +1,180 @@
+"""
+risk_screener.py
+
+Incremental high-risk bid screening for governance review.
+- Keeps a watermark of what has been screened (processed part files of the
+  simulation_runs dataset, or a byte offset into a legacy CSV) and reads only
+  bids that arrived since the last refresh
+- Proxy compliance is monotone in one column, so bids are kept sorted by that
+  key once and "compliance < threshold" at any level is a binary search:
+    stored compliance:  compliance < t
+    CVaR proxy:         1 - cvar / max_cvar < t  <=>  cvar > (1 - t) * max_cvar   (max_cvar > 0)
+                                                  cvar < (1 - t) * max_cvar   (max_cvar < 0: cvar_95
+                                                  is a reward percentile and can be negative)
+    profit proxy:       (profit - min) / (max - min) < t  <=>  profit < min + t * (max - min)
+  Only the running maxima / minima change as bids arrive, never the order
+- Follows the latest simulation run (a new run_id starts a fresh screen)
+"""
+
+import io
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datalake.lake import open_dataset, partition_values, dataset_path
+
+RENAME = {"agent_id": "agent", "reward": "profit", "cvar_95": "cvar"}
+EPS = 1e-9
+CSV_HEAD_BYTES = 1 << 16  # leading bytes compared on refresh to detect a rewritten CSV
+
+
+class RiskScreener:
+    """
+    Incremental screen of one simulation run's bids.
+
+    Args:
+        run_id: run to screen (None = always the latest run in the data lake).
+        csv_path: screen a legacy simulation_runs.csv instead of the data lake.
+        path: simulation_runs dataset directory (default: data lake).
+    """
+
+    def __init__(self, run_id: str = None, csv_path: str = None, path: str = None):
+        self.fixed_run_id = run_id
+        self.csv_path = csv_path
+        self.path = path or dataset_path("simulation_runs")
+        self._reset(run_id)
+
+    def _reset(self, run_id=None):
+        self.run_id = run_id
+        self.mode = None  # "compliance" | "cvar" | "profit"
+        self._frames, self._rows = [], 0
+        self._frame = None
+        self._keys = np.empty(0)  # screening key, ascending
+        self._order = np.empty(0, dtype=np.int64)  # row position of each sorted key
+        self.key_min, self.key_max = np.inf, -np.inf
+        self._seen_parts = set()
+        self._csv_offset, self._csv_columns, self._csv_head = 0, None, b""
+
+    # -------------------------------------------------------------------------
+    # Ingest
+    # -------------------------------------------------------------------------
+    def refresh(self) -> int:
+        """Screen bids that arrived since the last refresh; returns how many were added."""
+        return self._refresh_csv() if self.csv_path else self._refresh_lake()
+
+    def _refresh_lake(self) -> int:
+        run_id = self.fixed_run_id
+        if run_id is None:
+            runs = partition_values("simulation_runs", "run_id", self.path)
+            if not runs:
+                return 0
+            run_id = runs[-1]
+        if run_id != self.run_id:
+            self._reset(run_id)
+
+        dataset = open_dataset("simulation_runs", self.path)
+        if dataset is None:
+            return 0
+        fragments = [f for f in dataset.get_fragments(filter=ds.field("run_id") == run_id)
+                     if f.path not in self._seen_parts]
+        added = 0
+        for fragment in sorted(fragments, key=lambda f: os.path.basename(f.path)):  # write order
+            added += self._add(fragment.to_table(schema=dataset.schema).to_pandas())
+            self._seen_parts.add(fragment.path)
+        return added
+
+    def _refresh_csv(self) -> int:
+        if not os.path.exists(self.csv_path):
+            return 0
+        with open(self.csv_path, "rb") as f:
+            # A rewritten (not appended) file invalidates the watermark
+            if os.path.getsize(self.csv_path) < self._csv_offset or f.read(len(self._csv_head)) != self._csv_head:
+                self._reset()
+            f.seek(self._csv_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # complete lines only; a row being written waits for the next refresh
+        if end == 0:
+            return 0
+        if self._csv_columns is None:
+            chunk = pd.read_csv(io.BytesIO(data[:end]))
+            self._csv_columns = list(chunk.columns)
+        else:
+            chunk = pd.read_csv(io.BytesIO(data[:end]), header=None, names=self._csv_columns)
+        self._csv_head = (self._csv_head + data[:end])[:CSV_HEAD_BYTES]
+        self._csv_offset += end
+        return self._add(chunk)
+
+    def _add(self, chunk: pd.DataFrame) -> int:
+        if chunk.empty:
+            return 0
+        chunk = chunk.rename(columns=RENAME).reset_index(drop=True)
+        if self.mode is None:
+            self.mode = "compliance" if "compliance" in chunk.columns else "cvar" if "cvar" in chunk.columns else "profit"
+            if self.mode != "compliance":
+                print(f"⚠️ 'compliance' column not found. Screening on proxy compliance from {self.mode}...")
+        if "bid_id" not in chunk.columns:
+            position = np.arange(self._rows, self._rows + len(chunk)).astype(str)
+            chunk["bid_id"] = chunk["episode"].astype(str) + "_" + chunk["agent"].astype(str) + "_" + position
+
+        keys = chunk[self.mode].to_numpy(dtype=np.float64)
+        self.key_min = min(self.key_min, keys.min())
+        self.key_max = max(self.key_max, keys.max())
+
+        # Merge the new (sorted) keys into the sorted index: O(n + m log m), no full re-sort
+        new_order = np.argsort(keys, kind="stable")
+        new_keys = keys[new_order]
+        at = np.searchsorted(self._keys, new_keys, side="right")
+        self._keys = np.insert(self._keys, at, new_keys)
+        self._order = np.insert(self._order, at, new_order + self._rows)
+
+        self._frames.append(chunk)
+        self._rows += len(chunk)
+        self._frame = None
+        return len(chunk)
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    def _risky_positions(self, threshold: float) -> np.ndarray:
+        """Row positions with compliance < threshold (binary search on the sorted keys)."""
+        if self.mode == "compliance":
+            return self._order[:np.searchsorted(self._keys, threshold, side="left")]
+        if self.mode == "cvar":
+            denominator = self.key_max + EPS
+            cutoff = (1.0 - threshold) * denominator
+            if denominator < 0:  # dividing by a negative maximum flips the inequality
+                return self._order[:np.searchsorted(self._keys, cutoff, side="left")]
+            return self._order[np.searchsorted(self._keys, cutoff, side="right"):]
+        cutoff = self.key_min + threshold * (self.key_max - self.key_min + EPS)
+        return self._order[:np.searchsorted(self._keys, cutoff, side="left")]
+
+    def count_below(self, threshold: float) -> int:
+        return len(self._risky_positions(threshold))
+
+    def compliance(self, values: np.ndarray) -> np.ndarray:
+        """Compliance of screening-key values under the current running extremes."""
+        if self.mode == "compliance":
+            return values
+        if self.mode == "cvar":
+            return 1 - values / (self.key_max + EPS)
+        return (values - self.key_min) / (self.key_max - self.key_min + EPS)
+
+    def high_risk(self, threshold: float = 0.6) -> pd.DataFrame:
+        """Screened bids with compliance below threshold, in arrival order."""
+        if self._frame is None:
+            self._frame = pd.concat(self._frames, ignore_index=True) if self._frames else pd.DataFrame()
+            self._frames = [self._frame] if self._frames else []
+        positions = np.sort(self._risky_positions(threshold))
+        risky = self._frame.iloc[positions].copy()
+        if self.mode != "compliance" and not risky.empty:
+            risky["compliance"] = self.compliance(risky[self.mode].to_numpy(dtype=np.float64))
+        return risky
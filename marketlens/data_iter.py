@@ -0,0 +1,113 @@
+"""
+data_iter.py
+
+Out-of-core MarketLens training data.
+- ParquetTreatyIter streams a (partitioned) Parquet treaty dataset batch by
+  batch through the persisted MarketLensFeaturizer into XGBoost's data-iterator
+  interface, so training never holds the full history in memory
+- Each batch is split into train / validation rows with a per-batch seeded RNG,
+  so the split is identical on every pass and for every target
+- build_external_dmatrices() returns ExtMemQuantileDMatrix pairs (pages cached
+  on disk); the validation matrix reuses the training quantile cuts
+"""
+
+import os
+import sys
+import numpy as np
+import pyarrow.dataset as ds
+import xgboost as xgb
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from marketlens.featurizer import MarketLensFeaturizer
+from marketlens.preprocess import transform_chunk
+
+TARGETS = ("acceptance", "expected_loss_ratio")
+
+
+class ParquetTreatyIter(xgb.DataIter):
+    """
+    XGBoost DataIter over a Parquet file or hive-partitioned dataset directory.
+
+    Args:
+        dataset_path: raw treaty Parquet file or directory (e.g. .../year=2024/part-0.parquet).
+        featurizer: persisted feature layout used for every batch.
+        target: "acceptance" or "expected_loss_ratio" (labels as derived by preprocess.py).
+        subset: "train", "val" or "all" rows of the per-batch split.
+        val_size: fraction of rows held out for validation.
+        batch_size: rows per batch handed to XGBoost.
+        cache_dir: where XGBoost stores external-memory pages.
+    """
+
+    def __init__(self, dataset_path: str, featurizer: MarketLensFeaturizer, target: str = "acceptance",
+                 subset: str = "train", val_size: float = 0.2, batch_size: int = 262_144,
+                 seed: int = 42, cache_dir: str = None, filter=None):
+        if target not in TARGETS:
+            raise ValueError(f"Unknown target '{target}'. Use one of {TARGETS}")
+        self.dataset = ds.dataset(dataset_path, format="parquet", partitioning="hive")
+        self.featurizer = featurizer
+        self.target = target
+        self.subset = subset
+        self.val_size = val_size
+        self.batch_size = batch_size
+        self.seed = seed
+        self.filter = filter
+        self.rows_seen = 0
+        self._batches = None
+        self._batch_index = 0
+
+        cache_prefix = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            cache_prefix = os.path.join(cache_dir, f"{target}-{subset}")
+        super().__init__(cache_prefix=cache_prefix)
+
+    def _row_mask(self, n_rows: int) -> np.ndarray:
+        if self.subset == "all":
+            return np.ones(n_rows, dtype=bool)
+        rng = np.random.default_rng([self.seed, self._batch_index])
+        is_val = rng.random(n_rows) < self.val_size
+        return is_val if self.subset == "val" else ~is_val
+
+    def reset(self):
+        self._batches = None
+        self._batch_index = 0
+        self.rows_seen = 0
+
+    def next(self, input_data) -> bool:
+        if self._batches is None:
+            self._batches = self.dataset.to_batches(batch_size=self.batch_size, filter=self.filter)
+        for batch in self._batches:
+            chunk = batch.to_pandas()
+            mask = self._row_mask(len(chunk))
+            self._batch_index += 1
+            if not mask.any():
+                continue
+            X, labels = transform_chunk(chunk[mask], self.featurizer)  # drops rows without a label
+            if X.empty:
+                continue
+            input_data(
+                data=X.to_numpy(dtype=np.float32),
+                label=labels[self.target].to_numpy(dtype=np.float32),
+                feature_names=self.featurizer.feature_names,
+            )
+            self.rows_seen += len(X)
+            return True
+        return False
+
+
+def build_external_dmatrices(dataset_path: str, featurizer: MarketLensFeaturizer, target: str,
+                             cache_dir: str, ref: xgb.DMatrix = None, val_size: float = 0.2,
+                             batch_size: int = 262_144, max_bin: int = 256, nthread: int = None, seed: int = 42):
+    """
+    (dtrain, dval) external-memory matrices for one target.
+    Pass ref (a training matrix of another target) to reuse its quantile cuts.
+    """
+    common = dict(featurizer=featurizer, target=target, val_size=val_size,
+                  batch_size=batch_size, seed=seed, cache_dir=cache_dir)
+    train_iter = ParquetTreatyIter(dataset_path, subset="train", **common)
+    dtrain = xgb.ExtMemQuantileDMatrix(train_iter, max_bin=max_bin, nthread=nthread, ref=ref)
+    val_iter = ParquetTreatyIter(dataset_path, subset="val", **common)
+    dval = xgb.ExtMemQuantileDMatrix(val_iter, max_bin=max_bin, nthread=nthread, ref=dtrain)
+    return dtrain, dval
@@ -1,9 +1,19 @@
 import os
+import sys
+import argparse
 import joblib
 import pandas as pd
 import shap
 import matplotlib.pyplot as plt
 
+# Add project root to Python path (run as python marketlens/fairness_audit.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from marketlens.featurizer import MarketLensFeaturizer
+from marketlens.shap_cache import get_shap_values
+from marketlens.fairness_metrics import group_fairness, fairness_summary, attributes_from_onehots
+from marketlens.preprocess import find_input_path, iter_treaty_chunks
+
 # -----------------------------
 # Project Paths
 # -----------------------------
@@ -14,10 +24,13 @@ LABELS_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "marketlens_labels
 
 MODEL_DIR = os.path.join(PROJECT_ROOT, "marketlens", "models")
 ACCEPTANCE_MODEL = os.path.join(MODEL_DIR, "xgb_acceptance.pkl")
+REINSURER_INFO_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "reinsurer_info.csv")
+FEATURIZER_PATH = os.path.join(MODEL_DIR, "marketlens_featurizer.json")
 
 # Primary outputs in models folder
 SHAP_PLOT_PATH = os.path.join(MODEL_DIR, "shap_summary.png")
 FAIRNESS_CSV_PATH = os.path.join(MODEL_DIR, "fairness_audit.csv")
+FAIRNESS_GROUPS_PATH = os.path.join(MODEL_DIR, "fairness_groups.csv")
 
 # Extra outputs for Streamlit demo
 DEMO_DIR = os.path.join(PROJECT_ROOT, "data", "demo")
@@ -31,25 +44,31 @@ def load_data_and_model():
     if not os.path.exists(FEATURES_PATH) or not os.path.exists(LABELS_PATH):
         raise FileNotFoundError("❌ Run marketlens/preprocess.py first to generate features and labels.")
 
+    featurizer = MarketLensFeaturizer.load(FEATURIZER_PATH)
     X = pd.read_parquet(FEATURES_PATH)
+    featurizer.check_columns(X.columns)
     y = pd.read_parquet(LABELS_PATH)
 
     if not os.path.exists(ACCEPTANCE_MODEL):
         raise FileNotFoundError("❌ Acceptance model not found. Run marketlens/train_marketlens.py first.")
 
     model_acceptance = joblib.load(ACCEPTANCE_MODEL)
-    return X, y, model_acceptance
+    return X, y, model_acceptance, featurizer
 
 
-def run_shap_explainability(model, X, max_display=15):
-    """Generates SHAP values and saves summary plots to both model dir and demo dir."""
+def run_shap_explainability(model, X, max_display=15, featurizer: MarketLensFeaturizer = None,
+                            sample_size=20_000, n_jobs=1, refresh=False):
+    """
+    Generates SHAP values and saves summary plots to both model dir and demo dir.
+    Values come from the SHAP cache (stratified sample of sample_size rows, None = all rows)
+    and are only recomputed when the model or the data changed.
+    """
     print("\n🔹 Running SHAP explainability...")
 
-    explainer = shap.TreeExplainer(model)
-    shap_values = explainer.shap_values(X)
+    cache = get_shap_values(model, X, featurizer, sample_size=sample_size, n_jobs=n_jobs, refresh=refresh)
 
     plt.figure()
-    shap.summary_plot(shap_values, X, show=False, max_display=max_display)
+    shap.summary_plot(cache.values, X.iloc[cache.rows], show=False, max_display=max_display)
     plt.tight_layout()
 
     # Save to both paths
@@ -57,30 +76,29 @@ def run_shap_explainability(model, X, max_display=15):
         plt.savefig(path, dpi=200)
         print(f"✅ SHAP summary plot saved to {path}")
 
-    return shap_values
+    return cache
 
 
-def run_fairness_audit(model, X):
+def run_fairness_audit(model, X, featurizer: MarketLensFeaturizer = None):
     """Computes group-level acceptance probabilities and saves results."""
     print("\n🔹 Running fairness audit...")
 
     # Model predictions
     pred_probs = model.predict_proba(X)[:, 1]
 
-    # Auto-detect group columns
-    group_cols = [c for c in X.columns if c.startswith("line_of_business_") or c.startswith("region_")]
-    if not group_cols:
+    # Group attributes recovered from the featurizer's one-hot blocks (prefix scan without one)
+    attributes = attributes_from_onehots(X, featurizer)
+    if attributes.empty:
         print("⚠️ No group columns found for fairness audit. Skipping.")
         return pd.DataFrame()
 
-    # Compute mean predictions per group
-    group_results = {}
-    for col in group_cols:
-        idx = X[col] == 1
-        if idx.sum() > 0:
-            group_results[col] = pred_probs[idx].mean()
-
-    fairness_df = pd.DataFrame(list(group_results.items()), columns=["group", "mean_acceptance_prob"])
+    # Mean predictions per single-attribute group (one grouped pass)
+    metrics = group_fairness(pred_probs, attributes, max_order=1)
+    metrics = metrics[metrics["group"] != "Unknown"]
+    fairness_df = pd.DataFrame({
+        "group": metrics["attributes"] + "_" + metrics["group"],
+        "mean_acceptance_prob": metrics["mean_pred"],
+    })
     fairness_df.sort_values("mean_acceptance_prob", ascending=False, inplace=True)
 
     # Save to both paths
@@ -94,17 +112,85 @@ def run_fairness_audit(model, X):
     return fairness_df
 
 
+def load_treaty_attributes(X: pd.DataFrame, input_path: str = None) -> pd.DataFrame:
+    """
+    treaty_type and incumbent_flag (joined from reinsurer_info.csv) of the treaties behind X, read in the
+    same streaming order as marketlens/preprocess.py. None if the rows cannot be aligned with X.
+    """
+    input_path = input_path or find_input_path()
+    label_cols = ["acceptance", "expected_loss_ratio"]
+    parts = []
+    for chunk in iter_treaty_chunks(input_path, columns=["treaty_type", "reinsurer_id"] + label_cols):
+        present = [c for c in label_cols if c in chunk.columns]
+        if present:  # rows transform_chunk drops for a missing label
+            chunk = chunk[chunk[present].notna().all(axis=1)]
+        parts.append(chunk.reindex(columns=["treaty_type", "reinsurer_id"]))
+    raw = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["treaty_type", "reinsurer_id"])
+    if len(raw) != len(X):
+        print(f"⚠️ {input_path} has {len(raw)} treaties but the features have {len(X)} rows; "
+              "treaty_type / incumbent_flag left out of the fairness intersections.")
+        return None
+
+    attributes = pd.DataFrame({"treaty_type": raw["treaty_type"].astype(object)}, index=X.index)
+    if os.path.exists(REINSURER_INFO_PATH):
+        info = pd.read_csv(REINSURER_INFO_PATH)
+        incumbent = info[info["entity_type"] == "reinsurer"].set_index("entity_id")["incumbent_flag"]
+        flag = raw["reinsurer_id"].astype(str).map(pd.to_numeric(incumbent, errors="coerce"))
+        attributes["incumbent_flag"] = flag.astype("Int64").astype(str).replace("<NA>", None).to_numpy()
+    return attributes
+
+
+def run_group_fairness(model, X, y=None, featurizer: MarketLensFeaturizer = None, attributes: pd.DataFrame = None,
+                       threshold=0.5, n_bootstrap=200):
+    """
+    Parity, equalized odds and calibration for all groups and intersections, with bootstrap CIs.
+    attributes: protected attribute columns aligned with X (default: recovered from the one-hots;
+    add e.g. treaty_type / incumbent_flag from the raw treaties when available).
+    """
+    print("\n🔹 Running group fairness metrics...")
+    if attributes is None:
+        attributes = attributes_from_onehots(X, featurizer)
+    labels = y["acceptance"].to_numpy() if y is not None and "acceptance" in y else None
+
+    pred_probs = model.predict_proba(X)[:, 1]
+    metrics = group_fairness(pred_probs, attributes, labels=labels, threshold=threshold, n_bootstrap=n_bootstrap)
+    metrics.to_csv(FAIRNESS_GROUPS_PATH, index=False)
+    print(f"✅ Group fairness metrics saved to {FAIRNESS_GROUPS_PATH} ({len(metrics)} groups)")
+    print("📊 Worst-case gaps by attribute combination:")
+    print(fairness_summary(metrics))
+    return metrics
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MarketLens SHAP explainability and fairness audit.")
+    parser.add_argument("--shap_sample", type=int, default=20_000,
+                        help="Stratified SHAP sample size (0 = all rows)")
+    parser.add_argument("--shap_jobs", type=int, default=1, help="Worker processes for SHAP chunks")
+    parser.add_argument("--bootstrap", type=int, default=200, help="Bootstrap replicates for fairness CIs")
+    parser.add_argument("--refresh_shap", action="store_true", help="Recompute SHAP values even if cached")
+    parser.add_argument("--input", type=str, default=None,
+                        help="Treaties the features were built from (default: as marketlens/preprocess.py)")
+    args = parser.parse_args()
+
     print("🚀 MarketLens Fairness Audit starting...")
 
-    X, y, model_acceptance = load_data_and_model()
+    X, y, model_acceptance, featurizer = load_data_and_model()
     print(f"✅ Loaded data: {X.shape}, labels: {y.shape}")
 
     # 1. SHAP explainability
-    run_shap_explainability(model_acceptance, X, max_display=15)
+    run_shap_explainability(model_acceptance, X, max_display=15, featurizer=featurizer,
+                            sample_size=args.shap_sample or None, n_jobs=args.shap_jobs, refresh=args.refresh_shap)
 
     # 2. Fairness audit
-    run_fairness_audit(model_acceptance, X)
+    run_fairness_audit(model_acceptance, X, featurizer)
+
+    # 3. Group & intersectional fairness metrics (LOB x region from the one-hots, plus treaty_type x
+    #    incumbent_flag from the raw treaties)
+    attributes = attributes_from_onehots(X, featurizer)
+    treaty_attributes = load_treaty_attributes(X, args.input)
+    if treaty_attributes is not None:
+        attributes = attributes.join(treaty_attributes)
+    run_group_fairness(model_acceptance, X, y, featurizer, attributes=attributes, n_bootstrap=args.bootstrap)
 
     print("\n🎉 Fairness audit complete! Review results in both `marketlens/models/` and `data/demo/`")
 
@@ -0,0 +1,258 @@
+"""
+fairness_metrics.py
+
+Vectorized group fairness metrics for MarketLens predictions.
+- Protected attributes (e.g. line_of_business, region, treaty_type, incumbent_flag)
+  are encoded as integer codes; one np.bincount pass over the finest
+  intersection builds a cube of sufficient statistics (counts, prediction sums,
+  positives, label / confusion counts)
+- Every single attribute and every intersection is a marginal of that cube, so
+  all groups are evaluated without another pass over the rows
+- Metrics: mean prediction, positive rate and demographic parity gap / ratio;
+  with labels also base rate, TPR / FPR with the equalized-odds gap, and
+  calibration gap (mean prediction - observed rate)
+- Bootstrap confidence intervals (positive rate, parity gap, TPR / FPR) are
+  drawn in batch at cell level, so they cost the same for a thousand rows or
+  millions; the mean prediction gets a normal-approximation interval
+"""
+
+import itertools
+import warnings
+import numpy as np
+import pandas as pd
+
+DEFAULT_ATTRIBUTES = ["line_of_business", "region", "treaty_type", "incumbent_flag"]
+
+
+# -----------------------------
+# Group Encoding
+# -----------------------------
+def encode_groups(attributes: pd.DataFrame):
+    """(codes (n, k) int64, {column: level labels}) with missing values as level 'Unknown'."""
+    codes, levels = [], {}
+    for col in attributes.columns:
+        col_codes, uniques = pd.factorize(attributes[col], sort=True)
+        labels = [str(u) for u in uniques]
+        if (col_codes < 0).any():
+            col_codes = np.where(col_codes < 0, len(labels), col_codes)
+            labels.append("Unknown")
+        codes.append(col_codes)
+        levels[col] = labels
+    return np.stack(codes, axis=1).astype(np.int64), levels
+
+
+def attributes_from_onehots(X: pd.DataFrame, featurizer=None, columns=None) -> pd.DataFrame:
+    """Recover categorical attribute columns from the featurizer's one-hot blocks ('Unknown' if none set)."""
+    if featurizer is not None:
+        categories = featurizer.categories
+    else:
+        categories = {}
+        for col in columns or DEFAULT_ATTRIBUTES:
+            cats = [c[len(col) + 1:] for c in X.columns if c.startswith(f"{col}_")]
+            if cats:
+                categories[col] = cats
+    out = {}
+    for col, cats in categories.items():
+        onehot = X[[f"{col}_{cat}" for cat in cats]].to_numpy()
+        labels = np.asarray(list(cats) + ["Unknown"], dtype=object)
+        out[col] = labels[np.where(onehot.any(axis=1), onehot.argmax(axis=1), len(cats))]
+    return pd.DataFrame(out, index=X.index)
+
+
+# -----------------------------
+# Sufficient Statistics
+# -----------------------------
+def _cube_stats(cell: np.ndarray, n_cells: int, pred: np.ndarray, positive: np.ndarray, labels=None) -> dict:
+    stats = {
+        "count": np.bincount(cell, minlength=n_cells).astype(np.float64),
+        "sum_pred": np.bincount(cell, weights=pred, minlength=n_cells),
+        "sum_pred_sq": np.bincount(cell, weights=pred * pred, minlength=n_cells),
+        "positives": np.bincount(cell, weights=positive, minlength=n_cells),
+    }
+    if labels is not None:
+        stats["label_pos"] = np.bincount(cell, weights=labels, minlength=n_cells)
+        stats["true_pos"] = np.bincount(cell, weights=positive * labels, minlength=n_cells)
+    return stats
+
+
+def _label_stats(stats: dict) -> dict:
+    """
+    Statistics restricted to labelled rows. Cubes built from fully labelled data omit
+    them (they equal count / positives / sum_pred); streaming cubes carry them because
+    outcomes are only known for part of the quotes.
+    """
+    return {
+        "labelled": stats.get("labelled", stats["count"]),
+        "labelled_positives": stats.get("labelled_positives", stats["positives"]),
+        "labelled_sum_pred": stats.get("labelled_sum_pred", stats["sum_pred"]),
+    }
+
+
+def _bootstrap_cube(stats: dict, n_bootstrap: int, seed: int) -> dict:
+    """
+    Poisson bootstrap of the count statistics, drawn per cell instead of per row.
+    With Poisson(1) row weights the weighted size of each (cell, predicted, label)
+    bucket is exactly Poisson(bucket size) and buckets are independent, so
+    replicates cost O(n_bootstrap x cells) regardless of the number of rows.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (n_bootstrap,) + stats["count"].shape
+    if "label_pos" in stats:
+        lab = _label_stats(stats)
+        tp = stats["true_pos"]
+        fp = lab["labelled_positives"] - tp
+        fn = stats["label_pos"] - tp
+        tn = lab["labelled"] - lab["labelled_positives"] - fn
+        un_pos = stats["positives"] - lab["labelled_positives"]
+        un_neg = stats["count"] - lab["labelled"] - un_pos
+        tp, fp, fn, tn, un_pos, un_neg = (rng.poisson(np.maximum(b, 0), size=shape).astype(np.float64)
+                                          for b in (tp, fp, fn, tn, un_pos, un_neg))
+        return {"count": tp + fp + fn + tn + un_pos + un_neg, "positives": tp + fp + un_pos,
+                "label_pos": tp + fn, "true_pos": tp, "labelled": tp + fp + fn + tn, "labelled_positives": tp + fp}
+    pos = rng.poisson(stats["positives"], size=shape).astype(np.float64)
+    neg = rng.poisson(stats["count"] - stats["positives"], size=shape).astype(np.float64)
+    return {"count": pos + neg, "positives": pos}
+
+
+def _ratio(num, den):
+    return np.divide(num, den, out=np.full(np.shape(num), np.nan), where=den > 0)
+
+
+def _normal_quantile(p: float) -> float:
+    from statistics import NormalDist
+    return NormalDist().inv_cdf(p)
+
+
+# -----------------------------
+# Fairness Engine
+# -----------------------------
+def group_fairness(
+    pred: np.ndarray,
+    attributes: pd.DataFrame,
+    labels: np.ndarray = None,
+    threshold: float = 0.5,
+    max_order: int = None,
+    n_bootstrap: int = 0,
+    ci: float = 0.95,
+    min_count: int = 1,
+    seed: int = 42,
+) -> pd.DataFrame:
+    """
+    Fairness metrics for every group of every attribute combination up to max_order
+    (None = all intersections).
+
+    Args:
+        pred: predicted acceptance probabilities.
+        attributes: one column per protected attribute (same rows as pred).
+        labels: observed binary outcomes (enables TPR/FPR, equalized odds and calibration).
+        threshold: probability at which a quote counts as predicted-accept.
+        n_bootstrap: replicates for confidence intervals (0 = none).
+    Returns: one row per (attributes, group) with metrics and gaps vs the whole book.
+    """
+    codes, levels = encode_groups(attributes)
+    cube = build_cube(codes, levels, pred, threshold, labels)
+    return cube_metrics(cube, levels, max_order=max_order, n_bootstrap=n_bootstrap, ci=ci,
+                        min_count=min_count, seed=seed)
+
+
+def build_cube(codes: np.ndarray, levels: dict, pred: np.ndarray, threshold: float = 0.5,
+               labels: np.ndarray = None) -> dict:
+    """One pass over the rows: sufficient statistics over the finest intersection, each shaped by level counts."""
+    pred = np.asarray(pred, dtype=np.float64)
+    positive = (pred >= threshold).astype(np.float64)
+    labels = None if labels is None else np.asarray(labels, dtype=np.float64)
+    dims = tuple(len(v) for v in levels.values())
+    cell = np.ravel_multi_index(codes.T, dims) if dims else np.zeros(len(pred), dtype=np.int64)
+    n_cells = int(np.prod(dims))
+    return {k: v.reshape(dims) for k, v in _cube_stats(cell, n_cells, pred, positive, labels).items()}
+
+
+def cube_metrics(cube: dict, levels: dict, max_order: int = None, n_bootstrap: int = 0, ci: float = 0.95,
+                 min_count: int = 1, seed: int = 42) -> pd.DataFrame:
+    """Fairness metrics for all groups / intersections from a cube of sufficient statistics."""
+    columns = list(levels)
+    dims = tuple(len(levels[c]) for c in columns)
+    has_labels = "label_pos" in cube
+    total = {k: v.sum() for k, v in cube.items()}
+    if total["count"] == 0:
+        return pd.DataFrame()
+    boot = _bootstrap_cube(cube, n_bootstrap, seed) if n_bootstrap else None
+
+    overall_rate = total["positives"] / total["count"]
+    if has_labels:
+        total.update({k: v.sum() for k, v in _label_stats(cube).items()})
+        overall_tpr = _ratio(total["true_pos"], total["label_pos"])
+        overall_fpr = _ratio(total["labelled_positives"] - total["true_pos"], total["labelled"] - total["label_pos"])
+    q = [(1 - ci) / 2 * 100, (1 + ci) / 2 * 100]
+    z = _normal_quantile((1 + ci) / 2)
+    if boot is not None:
+        cube_axes = tuple(range(1, len(dims) + 1))
+        boot_overall_rate = boot["positives"].sum(axis=cube_axes) / boot["count"].sum(axis=cube_axes)
+
+    frames = []
+    max_order = max_order or len(columns)
+    for order in range(1, max_order + 1):
+        for subset in itertools.combinations(range(len(columns)), order):
+            other = tuple(a for a in range(len(columns)) if a not in subset)
+            stat = {k: v.sum(axis=other).ravel() for k, v in cube.items()}
+            if has_labels:
+                stat.update(_label_stats(stat))
+            keep = stat["count"] >= max(min_count, 1)
+            names = [" | ".join(combo) for combo in itertools.product(*(levels[columns[a]] for a in subset))]
+
+            rate = stat["positives"] / np.maximum(stat["count"], 1)
+            mean_pred = stat["sum_pred"] / np.maximum(stat["count"], 1)
+            var_pred = np.maximum(stat["sum_pred_sq"] / np.maximum(stat["count"], 1) - mean_pred ** 2, 0)
+            half_width = z * np.sqrt(var_pred / np.maximum(stat["count"], 1))
+            frame = {
+                "attributes": " x ".join(columns[a] for a in subset),
+                "group": np.asarray(names, dtype=object),
+                "count": stat["count"].astype(np.int64),
+                "mean_pred": mean_pred,
+                "mean_pred_lo": mean_pred - half_width,
+                "mean_pred_hi": mean_pred + half_width,
+                "positive_rate": rate,
+                "parity_gap": rate - overall_rate,
+                "parity_ratio": _ratio(rate, np.full_like(rate, overall_rate)),
+            }
+            if has_labels:
+                base_rate = _ratio(stat["label_pos"], stat["labelled"])
+                tpr = _ratio(stat["true_pos"], stat["label_pos"])
+                fpr = _ratio(stat["labelled_positives"] - stat["true_pos"], stat["labelled"] - stat["label_pos"])
+                frame.update(
+                    labelled=stat["labelled"].astype(np.int64),
+                    base_rate=base_rate,
+                    tpr=tpr,
+                    fpr=fpr,
+                    equalized_odds_gap=np.fmax(np.abs(tpr - overall_tpr), np.abs(fpr - overall_fpr)),
+                    calibration_gap=_ratio(stat["labelled_sum_pred"], stat["labelled"]) - base_rate,
+                )
+            if boot is not None:
+                b = {k: v.sum(axis=tuple(a + 1 for a in other)).reshape(n_bootstrap, -1) for k, v in boot.items()}
+                b_rate = _ratio(b["positives"], b["count"])
+                replicates = [("positive_rate", b_rate), ("parity_gap", b_rate - boot_overall_rate[:, None])]
+                if has_labels:
+                    replicates += [
+                        ("tpr", _ratio(b["true_pos"], b["label_pos"])),
+                        ("fpr", _ratio(b["labelled_positives"] - b["true_pos"], b["labelled"] - b["label_pos"])),
+                    ]
+                for name, values in replicates:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter("ignore", RuntimeWarning)  # empty groups -> NaN bounds
+                        lo, hi = np.nanpercentile(values, q, axis=0)
+                    frame[f"{name}_lo"], frame[f"{name}_hi"] = lo, hi
+            frames.append(pd.DataFrame(frame)[keep])
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def fairness_summary(metrics: pd.DataFrame) -> pd.DataFrame:
+    """Per attribute combination: number of groups and worst-case gaps."""
+    agg = {"group": "count", "positive_rate": lambda s: s.max() - s.min(), "parity_ratio": "min"}
+    if "equalized_odds_gap" in metrics.columns:
+        agg.update(equalized_odds_gap="max", calibration_gap=lambda s: s.abs().max())
+    summary = metrics.groupby("attributes", sort=False).agg(agg)
+    return summary.rename(columns={
+        "group": "groups", "positive_rate": "max_parity_gap", "parity_ratio": "min_parity_ratio",
+        "equalized_odds_gap": "max_equalized_odds_gap", "calibration_gap": "max_abs_calibration_gap",
+    }).reset_index()
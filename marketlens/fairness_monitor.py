@@ -0,0 +1,296 @@
+"""
+fairness_monitor.py
+
+Streaming fairness monitoring for scored MarketLens quotes.
+- Keeps per-group sufficient statistics (counts, prediction sums, positives,
+  label / confusion counts) over the finest attribute intersection, in time
+  buckets (default: hourly), updated as quotes are scored
+- Any time window (e.g. last day / last 30 days) is the sum of its buckets, and
+  every group metric of fairness_metrics.py is computed from that cube, so live
+  fairness never requires re-scoring the book
+- Outcomes may be unknown (NaN labels): label metrics use labelled quotes only;
+  outcomes that arrive after scoring are attached with record_outcome(s), which
+  touches only the label statistics of the quote's original bucket
+- State is a compact .npz (only non-empty bucket x cell pairs, one float64 value
+  per statistic) that the Streamlit MarketLens tab reads directly
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from marketlens.fairness_metrics import cube_metrics, fairness_summary
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FAIRNESS_MONITOR_PATH = os.path.join(PROJECT_ROOT, "marketlens", "models", "fairness_monitor.npz")
+
+STATS = ("count", "sum_pred", "sum_pred_sq", "positives",
+         "labelled", "labelled_positives", "labelled_sum_pred", "label_pos", "true_pos")
+DEFAULT_EXTRA_LEVELS = {"treaty_type": ["Quota", "XoL"], "incumbent_flag": ["0", "1"]}
+
+
+def _level(value) -> str:
+    """Level label of a raw attribute value (1, 1.0 and "1" are the same level; missing is 'Unknown')."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "Unknown"
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    if isinstance(value, np.generic):
+        value = value.item()
+    return str(value)
+
+
+def _epoch_seconds(timestamps, n: int) -> np.ndarray:
+    if timestamps is None:
+        return np.full(n, time.time())
+    ts = np.asarray(timestamps)
+    if np.issubdtype(ts.dtype, np.number):
+        return np.broadcast_to(ts.astype(np.float64), (n,))
+    return np.broadcast_to(pd.to_datetime(ts).asi8 / 1e9, (n,))
+
+
+class FairnessMonitor:
+    """
+    Time-bucketed fairness counters.
+
+    Args:
+        levels: {attribute: known levels}; anything else (or missing) counts as 'Unknown'.
+        threshold: probability at which a quote counts as predicted-accept.
+        bucket_seconds: width of a time bucket.
+        max_buckets: oldest buckets beyond this are dropped (default: 90 days of hours); quotes
+            older than the retained window, and outcomes of quotes no longer retained, are not
+            counted (see `dropped`).
+        path / autosave_every: save state to path after every autosave_every updates (0 = manual save()).
+    """
+
+    def __init__(self, levels: dict, threshold: float = 0.5, bucket_seconds: int = 3600,
+                 max_buckets: int = 24 * 90, path: str = None, autosave_every: int = 0):
+        self.levels = {col: [_level(v) for v in vals if _level(v) != "Unknown"] + ["Unknown"]
+                       for col, vals in levels.items()}
+        self.threshold = threshold
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.path = path or FAIRNESS_MONITOR_PATH
+        self.autosave_every = autosave_every
+        self.buckets = {}  # bucket id -> (len(STATS), n_cells) float64
+        self._updates = 0
+        self.dropped = 0  # quotes / outcomes outside the retained bucket window
+        self._index = {col: {lvl: i for i, lvl in enumerate(vals)} for col, vals in self.levels.items()}
+        self.dims = tuple(len(v) for v in self.levels.values())
+        self.n_cells = int(np.prod(self.dims))
+        self._strides = np.cumprod((self.dims + (1,))[::-1])[::-1][1:]
+
+    @classmethod
+    def from_featurizer(cls, featurizer, extra_levels: dict = None, **kwargs) -> "FairnessMonitor":
+        """Monitor over the featurizer's categories plus treaty_type / incumbent_flag."""
+        levels = {**featurizer.categories, **(DEFAULT_EXTRA_LEVELS if extra_levels is None else extra_levels)}
+        return cls(levels, **kwargs)
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
+    def _cells(self, attributes: pd.DataFrame) -> np.ndarray:
+        cell = np.zeros(len(attributes), dtype=np.int64)
+        for (col, vals), stride in zip(self.levels.items(), self._strides):
+            if col in attributes.columns:
+                # Map the (few) distinct values, not every row; missing (-1) goes to 'Unknown'
+                raw_codes, uniques = pd.factorize(attributes[col])
+                index = self._index[col]
+                lookup = np.array([index.get(_level(u), len(vals) - 1) for u in uniques] + [len(vals) - 1],
+                                  dtype=np.int64)
+                codes = lookup[raw_codes]
+            else:
+                codes = np.full(len(attributes), len(vals) - 1, dtype=np.int64)
+            cell += codes * stride
+        return cell
+
+    def _cell_one(self, record: dict) -> int:
+        cell = 0
+        for (col, index), stride in zip(self._index.items(), self._strides):
+            cell += index.get(_level(record.get(col)), len(index) - 1) * stride
+        return cell
+
+    def _label_values(self, pred: np.ndarray, labels) -> tuple:
+        """(predicted-accept flags, label statistics STATS[4:] per quote)."""
+        positive = (pred >= self.threshold).astype(np.float64)
+        y = np.full(len(pred), np.nan) if labels is None else np.asarray(labels, dtype=np.float64)
+        labelled = ~np.isnan(y)
+        y = np.where(labelled, y, 0.0)
+        return positive, np.stack([labelled, positive * labelled, pred * labelled, y, positive * y])
+
+    def _accumulate(self, bucket: np.ndarray, cells: np.ndarray, values: np.ndarray, first_stat: int = 0):
+        """Add values (one row per statistic from first_stat on) into their bucket / cell."""
+        bucket_ids, local = np.unique(bucket, return_inverse=True)
+        key = local * self.n_cells + cells
+        size = len(bucket_ids) * self.n_cells
+        for s, row in enumerate(values, start=first_stat):
+            sums = np.bincount(key, weights=row, minlength=size).reshape(len(bucket_ids), self.n_cells)
+            for j, b in enumerate(bucket_ids):
+                self._bucket(int(b))[s] += sums[j]
+
+    def update(self, pred, attributes: pd.DataFrame, labels=None, timestamps=None):
+        """Add a batch of scored quotes (labels: 0/1, NaN = outcome unknown; see record_outcomes)."""
+        pred = np.asarray(pred, dtype=np.float64)
+        if len(pred) == 0:
+            return
+        positive, label_values = self._label_values(pred, labels)
+        values = np.vstack([np.stack([np.ones_like(pred), pred, pred * pred, positive]), label_values])
+
+        bucket = (_epoch_seconds(timestamps, len(pred)) // self.bucket_seconds).astype(np.int64)
+        cells = self._cells(attributes)
+
+        # Late outcomes / backfills older than the retained window are counted as dropped,
+        # before any bucket is touched (the update is all-or-nothing per row)
+        in_window = self._in_window(bucket)
+        if not in_window.all():
+            self.dropped += int((~in_window).sum())
+            bucket, cells, values = bucket[in_window], cells[in_window], values[:, in_window]
+            if len(bucket) == 0:
+                self._after_update()
+                return
+
+        self._accumulate(bucket, cells, values)
+        self._evict()
+        self._after_update()
+
+    def update_one(self, pred: float, record: dict, label=None, timestamp=None):
+        """Add one scored quote (dict of raw treaty fields) without pandas."""
+        cell = self._cell_one(record)
+        ts = time.time() if timestamp is None else float(_epoch_seconds([timestamp], 1)[0])
+        bucket_id = int(ts // self.bucket_seconds)
+        if not self._in_window(np.array([bucket_id]))[0]:
+            self.dropped += 1
+            self._after_update()
+            return
+        stats = self._bucket(bucket_id)
+        positive = float(pred >= self.threshold)
+        stats[:4, cell] += (1.0, pred, pred * pred, positive)
+        if label is not None and not np.isnan(label):
+            stats[4:, cell] += (1.0, positive, pred, label, positive * label)
+        self._evict()
+        self._after_update()
+
+    def record_outcomes(self, pred, attributes: pd.DataFrame, labels, timestamps):
+        """
+        Attach outcomes to quotes already counted by update() / update_one(). Only the label /
+        confusion statistics change, in the bucket of each quote's scoring timestamp (so count,
+        positives and sum_pred are not counted twice). Outcomes whose bucket is no longer
+        retained are counted as dropped; NaN labels are ignored.
+        """
+        pred = np.asarray(pred, dtype=np.float64)
+        if len(pred) == 0:
+            return
+        _, values = self._label_values(pred, labels)
+        bucket = (_epoch_seconds(timestamps, len(pred)) // self.bucket_seconds).astype(np.int64)
+        cells = self._cells(attributes)
+
+        existing = np.fromiter(self.buckets, dtype=np.int64, count=len(self.buckets))
+        retained = np.isin(bucket, existing)
+        if not retained.all():
+            self.dropped += int((values[0] * ~retained).sum())
+            bucket, cells, values = bucket[retained], cells[retained], values[:, retained]
+        if len(bucket):
+            self._accumulate(bucket, cells, values, first_stat=STATS.index("labelled"))
+        self._after_update()
+
+    def record_outcome(self, pred: float, record: dict, label, timestamp):
+        """Attach the outcome of one quote scored at `timestamp` (see record_outcomes)."""
+        if label is None or np.isnan(label):
+            return
+        bucket_id = int(_epoch_seconds([timestamp], 1)[0] // self.bucket_seconds)
+        if bucket_id not in self.buckets:
+            self.dropped += 1
+        else:
+            positive = float(pred >= self.threshold)
+            self.buckets[bucket_id][4:, self._cell_one(record)] += (1.0, positive, pred, label, positive * label)
+        self._after_update()
+
+    def _in_window(self, bucket: np.ndarray) -> np.ndarray:
+        """Rows whose bucket would survive eviction (the newest max_buckets of existing + new buckets)."""
+        if len(self.buckets) + len(bucket) <= self.max_buckets:
+            return np.ones(len(bucket), dtype=bool)
+        existing = np.fromiter(self.buckets, dtype=np.int64, count=len(self.buckets))
+        keep = np.union1d(existing, bucket)[-self.max_buckets:]
+        return bucket >= keep[0]
+
+    def _bucket(self, bucket_id: int) -> np.ndarray:
+        if bucket_id not in self.buckets:
+            self.buckets[bucket_id] = np.zeros((len(STATS), self.n_cells))
+        return self.buckets[bucket_id]
+
+    def _evict(self):
+        for old in sorted(self.buckets)[:-self.max_buckets]:
+            del self.buckets[old]
+
+    def _after_update(self):
+        self._updates += 1
+        if self.autosave_every and self._updates % self.autosave_every == 0:
+            self.save()
+
+    # -------------------------------------------------------------------------
+    # Views
+    # -------------------------------------------------------------------------
+    def cube(self, since=None, until=None, last=None) -> dict:
+        """Summed statistics over buckets in [since, until) or the last `last` (e.g. '1D', '30D')."""
+        if last is not None:
+            since = time.time() - pd.Timedelta(last).total_seconds()
+        lo = -np.inf if since is None else _epoch_seconds([since], 1)[0] // self.bucket_seconds
+        hi = np.inf if until is None else _epoch_seconds([until], 1)[0] / self.bucket_seconds
+        total = np.zeros((len(STATS), self.n_cells))
+        for b, stats in self.buckets.items():
+            if lo <= b < hi:
+                total += stats
+        cube = {name: total[i].reshape(self.dims) for i, name in enumerate(STATS)}
+        if not total[STATS.index("labelled")].any():
+            cube = {k: v for k, v in cube.items() if k not in STATS[4:]}
+        return cube
+
+    def view(self, since=None, until=None, last=None, **kwargs) -> pd.DataFrame:
+        """Group / intersection fairness metrics for a time window (kwargs: max_order, n_bootstrap, ...)."""
+        return cube_metrics(self.cube(since, until, last), self.levels, **kwargs)
+
+    def summary(self, since=None, until=None, last=None, **kwargs) -> pd.DataFrame:
+        metrics = self.view(since, until, last, **kwargs)
+        return fairness_summary(metrics) if not metrics.empty else metrics
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+    def save(self, path: str = None) -> str:
+        path = path or self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        bucket_ids = np.array(sorted(self.buckets), dtype=np.int64)
+        stats = np.stack([self.buckets[b] for b in bucket_ids]) if len(bucket_ids) else \
+            np.zeros((0, len(STATS), self.n_cells))
+        # Sparse: only (bucket, cell) pairs with any non-zero statistic are written
+        positions, cells = np.nonzero(stats.any(axis=1))
+        config = {"levels": self.levels, "threshold": self.threshold, "bucket_seconds": self.bucket_seconds,
+                  "max_buckets": self.max_buckets}
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, config=np.array(json.dumps(config)), bucket_ids=bucket_ids,
+                 positions=positions.astype(np.int32), cells=cells.astype(np.int32),
+                 values=stats[positions, :, cells], dropped=np.array(self.dropped))
+        os.replace(tmp, path)  # readers never see a half-written file
+        return path
+
+    @classmethod
+    def load(cls, path: str = None, **kwargs) -> "FairnessMonitor":
+        path = path or FAIRNESS_MONITOR_PATH
+        with np.load(path, allow_pickle=False) as data:
+            config = json.loads(str(data["config"]))
+            monitor = cls(config.pop("levels"), path=path, **{**config, **kwargs})
+            if "stats" in data.files:  # dense state written before the sparse format
+                stats = data["stats"].copy()
+            else:
+                stats = np.zeros((len(data["bucket_ids"]), len(STATS), monitor.n_cells))
+                stats[data["positions"], :, data["cells"]] = data["values"]
+            for b, bucket_stats in zip(data["bucket_ids"], stats):
+                monitor.buckets[int(b)] = bucket_stats
+            monitor.dropped = int(data["dropped"]) if "dropped" in data.files else 0
+        return monitor
@@ -0,0 +1,186 @@
+"""
+featurizer.py
+
+Serializable feature transform shared by MarketLens preprocessing, training,
+fairness audit and online scoring.
+- Holds the model's feature layout: numeric columns, one-hot category
+  vocabularies and optional derived ratios
+- Saved as JSON next to the models, so a new treaty is scored with exactly the
+  columns the boosters were trained on
+- transform() is vectorized for chunks/books; transform_records() / transform_one()
+  are pure-Python fast paths for online scoring (no pandas overhead)
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FEATURIZER_PATH = os.path.join(PROJECT_ROOT, "marketlens", "models", "marketlens_featurizer.json")
+
+DEFAULT_NUMERIC_COLS = ["limit", "premium", "attachment"]
+DEFAULT_CATEGORICAL_COLS = ["line_of_business", "region"]
+DEFAULT_RENAME_MAP = {"attachment_point": "attachment", "att_point": "attachment"}
+
+
+class MarketLensFeaturizer:
+    """
+    Feature layout: numeric columns (float32), derived ratios
+    {name: (numerator, denominator)} (0 where the denominator is 0) and
+    one-hot columns '<col>_<category>' (uint8; unseen categories are all zeros).
+    """
+
+    def __init__(
+        self,
+        numeric_cols: List[str] = None,
+        categories: Dict[str, List[str]] = None,
+        ratios: Dict[str, Tuple[str, str]] = None,
+        rename_map: Dict[str, str] = None,
+    ):
+        self.numeric_cols = list(numeric_cols or DEFAULT_NUMERIC_COLS)
+        self.categories = {col: list(cats) for col, cats in (categories or {}).items()}
+        self.ratios = {name: tuple(pair) for name, pair in (ratios or {}).items()}
+        self.rename_map = dict(DEFAULT_RENAME_MAP if rename_map is None else rename_map)
+        self._build_index()
+
+    def _build_index(self):
+        self.onehot_names = [f"{col}_{cat}" for col, cats in self.categories.items() for cat in cats]
+        self.feature_names = self.numeric_cols + list(self.ratios) + self.onehot_names
+        self.n_features = len(self.feature_names)
+        self._n_dense = len(self.numeric_cols) + len(self.ratios)
+        # (column, category) -> feature position, for the record fast path
+        self._onehot_index = {}
+        offset = self._n_dense
+        for col, cats in self.categories.items():
+            self._onehot_index[col] = {cat: offset + j for j, cat in enumerate(cats)}
+            offset += len(cats)
+
+    # -------------------------------------------------------------------------
+    # Fitting
+    # -------------------------------------------------------------------------
+    def fit(self, chunks, categorical_cols: List[str] = None):
+        """Collect sorted category vocabularies from a DataFrame or an iterable of chunks."""
+        categorical_cols = categorical_cols or DEFAULT_CATEGORICAL_COLS
+        if isinstance(chunks, pd.DataFrame):
+            chunks = [chunks]
+        seen = {}
+        for chunk in chunks:
+            for col in categorical_cols:
+                if col in chunk.columns:
+                    seen.setdefault(col, set()).update(chunk[col].dropna().astype(str).unique())
+        self.categories = {col: sorted(seen[col]) for col in categorical_cols if col in seen}
+        self._build_index()
+        return self
+
+    # -------------------------------------------------------------------------
+    # Vectorized Transform
+    # -------------------------------------------------------------------------
+    def _numeric(self, df: pd.DataFrame, col: str) -> np.ndarray:
+        if col not in df.columns:
+            return np.zeros(len(df), dtype=np.float32)
+        return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float32)
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Feature frame with compact dtypes (float32 numerics, uint8 one-hots)."""
+        df = df.rename(columns=self.rename_map)
+        columns = {col: self._numeric(df, col) for col in self.numeric_cols}
+        for name, (num, den) in self.ratios.items():
+            num_v, den_v = self._numeric(df, num), self._numeric(df, den)
+            columns[name] = np.divide(num_v, den_v, out=np.zeros_like(num_v), where=den_v != 0)
+        for col, cats in self.categories.items():
+            values = df[col].astype(str) if col in df.columns else pd.Series(index=df.index, dtype=str)
+            codes = pd.Categorical(values, categories=cats).codes  # -1 for unknown / missing
+            onehot = (codes[:, None] == np.arange(len(cats))[None, :]).astype(np.uint8)
+            for j, cat in enumerate(cats):
+                columns[f"{col}_{cat}"] = onehot[:, j]
+        return pd.DataFrame(columns, index=df.index)
+
+    def transform_array(self, df: pd.DataFrame) -> np.ndarray:
+        """Dense float32 matrix in feature_names order (model input)."""
+        return self.transform(df).to_numpy(dtype=np.float32)
+
+    # -------------------------------------------------------------------------
+    # Record Fast Path
+    # -------------------------------------------------------------------------
+    def _to_float(self, value) -> float:
+        if value is None or value == "":
+            return np.nan
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def transform_records(self, records: List[dict]) -> np.ndarray:
+        """(n, n_features) float32 matrix from a list of treaty dicts, without pandas."""
+        out = np.zeros((len(records), self.n_features), dtype=np.float32)
+        rename = self.rename_map
+        for i, record in enumerate(records):
+            if rename:
+                record = {rename.get(k, k): v for k, v in record.items()}
+            row = out[i]
+            for j, col in enumerate(self.numeric_cols):
+                row[j] = self._to_float(record.get(col, 0.0))
+            j = len(self.numeric_cols)
+            for num, den in self.ratios.values():
+                num_v, den_v = self._to_float(record.get(num, 0.0)), self._to_float(record.get(den, 0.0))
+                row[j] = num_v / den_v if den_v else 0.0
+                j += 1
+            for col, index in self._onehot_index.items():
+                pos = index.get(str(record.get(col)))
+                if pos is not None:
+                    row[pos] = 1.0
+        return out
+
+    def transform_one(self, record: dict) -> np.ndarray:
+        """(1, n_features) float32 row for a single treaty."""
+        return self.transform_records([record])
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+    def to_dict(self) -> dict:
+        return {
+            "numeric_cols": self.numeric_cols,
+            "ratios": {name: list(pair) for name, pair in self.ratios.items()},
+            "categories": self.categories,
+            "rename_map": self.rename_map,
+            "feature_names": self.feature_names,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "MarketLensFeaturizer":
+        featurizer = cls(
+            numeric_cols=state["numeric_cols"],
+            categories=state.get("categories"),
+            ratios=state.get("ratios"),
+            rename_map=state.get("rename_map"),
+        )
+        if state.get("feature_names") and state["feature_names"] != featurizer.feature_names:
+            raise ValueError("❌ Featurizer file is inconsistent: stored feature_names do not match the layout.")
+        return featurizer
+
+    def save(self, path: str = None):
+        path = path or FEATURIZER_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"✅ Featurizer saved to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: str = None) -> "MarketLensFeaturizer":
+        path = path or FEATURIZER_PATH
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"❌ Featurizer not found at {path}. Run marketlens/preprocess.py first.")
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def check_columns(self, columns) -> None:
+        """Raise if a feature table does not match this layout (e.g. stale preprocessing)."""
+        if list(columns) != self.feature_names:
+            raise ValueError(
+                f"❌ Feature columns {list(columns)} do not match the featurizer layout {self.feature_names}. "
+                "Re-run marketlens/preprocess.py."
+            )
@@ -1,6 +1,27 @@
+"""
+preprocess.py
+
+Streaming feature/label preprocessing for MarketLens.
+- Reads treaties from Parquet (row-group batches) or CSV (chunks), so memory
+  stays constant however large the treaty set is
+- Ratios, labels and one-hots are vectorized column ops (no row-wise apply)
+- The feature layout (MarketLensFeaturizer) is fitted once and persisted as JSON
+  next to the models, so feature columns stay stable across runs and datasets
+- Features are written with compact dtypes: float32 numerics, uint8 one-hots
+"""
+
 import os
+import sys
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import OneHotEncoder
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add project root to Python path (run as python marketlens/preprocess.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from marketlens.featurizer import MarketLensFeaturizer, FEATURIZER_PATH, DEFAULT_CATEGORICAL_COLS
+from datalake.lake import dataset_path, iter_batches, open_dataset, exists as dataset_exists
 
 # -----------------------------
 # Paths
@@ -9,6 +30,15 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
 DATA_RAW = os.path.join(PROJECT_ROOT, "data", "raw", "treaties_raw.csv")
 DATA_PROCESSED = os.path.join(PROJECT_ROOT, "data", "processed", "treaties_synthetic.csv")
+# The partitioned data lake dataset, then Parquet copies, are preferred over the CSVs when present
+DATA_LAKE_TREATIES = dataset_path("treaties")
+INPUT_CANDIDATES = [
+    DATA_LAKE_TREATIES,
+    os.path.splitext(DATA_PROCESSED)[0] + ".parquet",
+    DATA_PROCESSED,
+    os.path.splitext(DATA_RAW)[0] + ".parquet",
+    DATA_RAW,
+]
 
 FEATURES_OUT = os.path.join(PROJECT_ROOT, "data", "processed", "marketlens_features.parquet")
 LABELS_OUT = os.path.join(PROJECT_ROOT, "data", "processed", "marketlens_labels.parquet")
@@ -18,85 +48,147 @@ DEMO_DIR = os.path.join(PROJECT_ROOT, "data", "demo")
 os.makedirs(DEMO_DIR, exist_ok=True)
 DEMO_FEATURES = os.path.join(DEMO_DIR, "sample_marketlens.parquet")
 DEMO_LABELS = os.path.join(DEMO_DIR, "sample_marketlens_labels.parquet")
+N_DEMO = 1000
 
+CATEGORICAL_COLS = DEFAULT_CATEGORICAL_COLS
 
-def preprocess_marketlens():
-    """Load treaty data, generate features & labels, and save parquet files for MarketLens."""
-    # -----------------------------
-    # 1. Load Data
-    # -----------------------------
-    if os.path.exists(DATA_PROCESSED):
-        df = pd.read_csv(DATA_PROCESSED)
-        print(f"✅ Loaded {len(df)} synthetic treaties from {DATA_PROCESSED}")
-    elif os.path.exists(DATA_RAW):
-        df = pd.read_csv(DATA_RAW)
-        print(f"✅ Loaded {len(df)} raw treaties from {DATA_RAW}")
+
+# -----------------------------
+# Chunked Input
+# -----------------------------
+def iter_treaty_chunks(path: str, batch_size: int = 65_536, columns=None):
+    """Yield DataFrame chunks of a Parquet or CSV treaty file, or a partitioned treaties dataset directory."""
+    if os.path.isdir(path):
+        dataset = open_dataset("treaties", path)
+        if dataset is not None and columns is not None:
+            columns = [c for c in columns if c in dataset.schema.names]
+        yield from iter_batches("treaties", columns=columns, batch_size=batch_size, path=path)
+    elif path.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(path)
+        if columns is not None:
+            columns = [c for c in columns if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
     else:
-        raise FileNotFoundError(f"No treaty data found at {DATA_PROCESSED} or {DATA_RAW}")
+        usecols = (lambda c: c in columns) if columns is not None else None
+        yield from pd.read_csv(path, chunksize=batch_size, usecols=usecols)
 
-    # -----------------------------
-    # 2. Auto-detect/rename columns
-    # -----------------------------
-    # Ensure numeric columns
-    expected_numeric = ["limit", "premium", "attachment"]
-    rename_map = {"attachment_point": "attachment", "att_point": "attachment"}
-    df.rename(columns=rename_map, inplace=True)
 
-    for col in expected_numeric:
-        if col not in df.columns:
-            print(f"⚠️ Column '{col}' not found. Creating dummy zeros.")
-            df[col] = 0.0
+def find_input_path() -> str:
+    for path in INPUT_CANDIDATES:
+        if os.path.isfile(path) or dataset_exists("treaties", path):
+            return path
+    raise FileNotFoundError(f"No treaty data found at {DATA_PROCESSED} or {DATA_RAW}")
 
-    # -----------------------------
-    # 3. Generate Features
-    # -----------------------------
-    # Encode line_of_business and region if present
-    cat_cols = [c for c in ["line_of_business", "region"] if c in df.columns]
-    encoder = OneHotEncoder(sparse_output=False, handle_unknown="ignore")
 
-    X_cat = pd.DataFrame()
-    if cat_cols:
-        X_cat = pd.DataFrame(
-            encoder.fit_transform(df[cat_cols]),
-            columns=encoder.get_feature_names_out(cat_cols)
-        )
+# -----------------------------
+# Featurizer (persisted feature layout)
+# -----------------------------
+def fit_featurizer(input_path: str, batch_size: int = 65_536, save_path: str = None) -> MarketLensFeaturizer:
+    """Fit category vocabularies in one streaming pass and save the featurizer next to the models."""
+    featurizer = MarketLensFeaturizer().fit(
+        iter_treaty_chunks(input_path, batch_size, columns=CATEGORICAL_COLS), CATEGORICAL_COLS
+    )
+    featurizer.save(save_path or FEATURIZER_PATH)
+    return featurizer
 
-    X_num = df[expected_numeric].copy()
-    X = pd.concat([X_num, X_cat], axis=1)
 
-    # -----------------------------
-    # 4. Generate Labels
-    # -----------------------------
-    if "acceptance" not in df.columns:
-        print("⚠️ 'acceptance' not found. Generating synthetic labels...")
-        df["acceptance"] = (df["premium"] / (df["limit"] + 1e-6)).apply(lambda x: 1 if x < 0.8 else 0)
+# -----------------------------
+# Vectorized Features & Labels
+# -----------------------------
+def transform_chunk(chunk: pd.DataFrame, featurizer: MarketLensFeaturizer):
+    """Return (features, labels) for one chunk of treaties; rows without a usable label are dropped."""
+    X = featurizer.transform(chunk)
+
+    # Raw treaties leave limit empty for Quota rows; derive labels as for cleaned data (missing -> 0)
+    premium = np.nan_to_num(X["premium"].to_numpy(dtype=np.float64))
+    limit = np.nan_to_num(X["limit"].to_numpy(dtype=np.float64))
+    if "acceptance" in chunk.columns:
+        acceptance = chunk["acceptance"].to_numpy()
+    else:
+        acceptance = (premium / (limit + 1e-6) < 0.8).astype(np.uint8)
+    if "expected_loss_ratio" in chunk.columns:
+        loss_ratio = chunk["expected_loss_ratio"].to_numpy(dtype=np.float32)
+    else:
+        loss_ratio = np.clip(limit / (premium + 1e-6) * 0.05, 0, 3.0).astype(np.float32)
 
-    if "expected_loss_ratio" not in df.columns:
-        print("⚠️ 'expected_loss_ratio' not found. Generating synthetic ratios...")
-        df["expected_loss_ratio"] = (df["limit"] / (df["premium"] + 1e-6)) * 0.05
-        df["expected_loss_ratio"] = df["expected_loss_ratio"].clip(0, 3.0)
+    labels = pd.DataFrame({"acceptance": acceptance, "expected_loss_ratio": loss_ratio}, index=chunk.index)
+    valid = labels.notna().all(axis=1).to_numpy()
+    if not valid.all():
+        X, labels = X[valid], labels[valid]
+    return X, labels
 
-    labels = df[["acceptance", "expected_loss_ratio"]]
 
+def preprocess_marketlens(input_path: str = None, batch_size: int = 65_536, refit_featurizer: bool = False):
+    """Stream treaty data, generate features & labels, and save parquet files for MarketLens."""
     # -----------------------------
-    # 5. Save Outputs
+    # 1. Locate Data & Featurizer
     # -----------------------------
-    os.makedirs(os.path.dirname(FEATURES_OUT), exist_ok=True)
-    X.to_parquet(FEATURES_OUT, index=False)
-    labels.to_parquet(LABELS_OUT, index=False)
+    input_path = input_path or find_input_path()
+    print(f"✅ Streaming treaties from {input_path} (batch_size={batch_size})")
 
-    print(f"✅ Features saved to {FEATURES_OUT} ({X.shape})")
-    print(f"✅ Labels saved to {LABELS_OUT} ({labels.shape})")
+    if refit_featurizer or not os.path.exists(FEATURIZER_PATH):
+        featurizer = fit_featurizer(input_path, batch_size)
+    else:
+        featurizer = MarketLensFeaturizer.load(FEATURIZER_PATH)
+        print(f"✅ Loaded featurizer from {FEATURIZER_PATH}")
 
     # -----------------------------
-    # 6. Demo Subset for Streamlit
+    # 2. Transform & Write Chunks
     # -----------------------------
-    X_demo = X.sample(min(1000, len(X)), random_state=42)
-    y_demo = labels.loc[X_demo.index]
+    os.makedirs(os.path.dirname(FEATURES_OUT), exist_ok=True)
+    feature_writer, label_writer = None, None
+    demo_keys, demo_X, demo_y = None, None, None
+    rng = np.random.default_rng(42)
+    n_rows, warned = 0, set()
+
+    try:
+        for chunk in iter_treaty_chunks(input_path, batch_size):
+            renamed = chunk.rename(columns=featurizer.rename_map).columns
+            missing = {col for col in featurizer.numeric_cols if col not in renamed} - warned
+            for col in sorted(missing):
+                print(f"⚠️ Column '{col}' not found. Creating dummy zeros.")
+            warned |= missing
+
+            X, labels = transform_chunk(chunk, featurizer)
+            X_table = pa.Table.from_pandas(X, preserve_index=False)
+            y_table = pa.Table.from_pandas(labels, preserve_index=False)
+            if feature_writer is None:
+                feature_writer = pq.ParquetWriter(FEATURES_OUT, X_table.schema)
+                label_writer = pq.ParquetWriter(LABELS_OUT, y_table.schema)
+            feature_writer.write_table(X_table)
+            label_writer.write_table(y_table)
+            n_rows += len(X)
+
+            # Demo subset: keep the N_DEMO rows with the smallest random keys (uniform sample, bounded memory)
+            keys = rng.random(len(X))
+            if demo_keys is None:
+                demo_keys, demo_X, demo_y = keys, X, labels
+            else:
+                demo_keys = np.concatenate([demo_keys, keys])
+                demo_X = pd.concat([demo_X, X], ignore_index=True)
+                demo_y = pd.concat([demo_y, labels], ignore_index=True)
+            keep = np.argsort(demo_keys, kind="stable")[:N_DEMO]
+            demo_keys = demo_keys[keep]
+            demo_X = demo_X.iloc[keep].reset_index(drop=True)
+            demo_y = demo_y.iloc[keep].reset_index(drop=True)
+    finally:
+        if feature_writer is not None:
+            feature_writer.close()
+            label_writer.close()
+
+    if feature_writer is None:
+        raise ValueError(f"❌ No rows found in {input_path}")
+
+    print(f"✅ Features saved to {FEATURES_OUT} ({n_rows}, {demo_X.shape[1]})")
+    print(f"✅ Labels saved to {LABELS_OUT} ({n_rows}, {demo_y.shape[1]})")
 
-    X_demo.to_parquet(DEMO_FEATURES, index=False)
-    y_demo.to_parquet(DEMO_LABELS, index=False)
-    print(f"🎯 Demo subset saved:\n   - {DEMO_FEATURES} ({X_demo.shape})\n   - {DEMO_LABELS} ({y_demo.shape})")
+    # -----------------------------
+    # 3. Demo Subset for Streamlit
+    # -----------------------------
+    demo_X.to_parquet(DEMO_FEATURES, index=False)
+    demo_y.to_parquet(DEMO_LABELS, index=False)
+    print(f"🎯 Demo subset saved:\n   - {DEMO_FEATURES} ({demo_X.shape})\n   - {DEMO_LABELS} ({demo_y.shape})")
 
 
 if __name__ == "__main__":
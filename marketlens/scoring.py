@@ -0,0 +1,340 @@
+"""
+scoring.py
+
+Batch and low-latency scoring of treaties with the trained MarketLens models.
+- MarketLensScorer loads the JSON boosters (xgb_acceptance.json, xgb_lossratio.json)
+  and the persisted MarketLensFeaturizer once, then scores acceptance likelihood
+  and expected loss ratio together
+- Batch API (whole books): Booster.inplace_predict on a float32 NumPy matrix,
+  multi-threaded, no DMatrix construction
+- Single-treaty API (pricing desk, while typing): trees are compiled into flat
+  NumPy arrays and all trees are walked at once, level by level, which avoids
+  the per-call setup cost of XGBoost prediction for tiny inputs (identity, logistic
+  and log links; other objectives and multi-output models use inplace_predict)
+- Per-treaty explanations use the booster's native TreeSHAP (pred_contribs /
+  pred_interactions), so no shap / matplotlib import is needed; explaining a
+  quote takes about 1-2 ms, roughly 5-10x the cost of scoring it (~0.2 ms), and
+  approx=True (path-based attributions) is the option for latency-critical paths
+- An optional FairnessMonitor is updated with every scored quote (live fairness);
+  the process-wide get_scorer() attaches the persisted monitor the dashboard reads
+  and the governance audit trail, which records every explain_one() result
+- Latencies of every call are recorded and reported as p50 / p99
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from collections import defaultdict, deque
+
+# Add project root to Python path (run as python marketlens/scoring.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from marketlens.featurizer import MarketLensFeaturizer
+from marketlens.fairness_monitor import FairnessMonitor, FAIRNESS_MONITOR_PATH
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODEL_DIR = os.path.join(PROJECT_ROOT, "marketlens", "models")
+ACCEPTANCE_JSON = os.path.join(MODEL_DIR, "xgb_acceptance.json")
+LOSS_JSON = os.path.join(MODEL_DIR, "xgb_lossratio.json")
+FEATURIZER_PATH = os.path.join(MODEL_DIR, "marketlens_featurizer.json")
+MONITOR_AUTOSAVE_EVERY = 100  # scored calls between saves of the live-fairness state
+
+
+# -----------------------------
+# Compiled Trees (small-batch fast path)
+# -----------------------------
+# Objectives the compiled walker reproduces exactly (inverse link applied to the summed margin)
+IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:squaredlogerror", "reg:pseudohubererror", "reg:absoluteerror",
+                       "reg:quantileerror", "binary:logitraw"}
+LOGISTIC_OBJECTIVES = {"binary:logistic", "reg:logistic"}
+LOG_LINK_OBJECTIVES = {"count:poisson", "reg:gamma", "reg:tweedie"}
+
+
+class _CompiledTrees:
+    """
+    Numerical-split tree ensemble flattened into 1-D NumPy arrays (node id =
+    tree * max_nodes + node). Leaves point to themselves, so predict_margin walks
+    every tree in lockstep for a fixed number of steps (the maximum depth).
+    """
+
+    def __init__(self, booster: xgb.Booster):
+        model = json.loads(booster.save_raw("json"))["learner"]
+        objective = model["objective"]["name"]
+        if objective not in IDENTITY_OBJECTIVES | LOGISTIC_OBJECTIVES | LOG_LINK_OBJECTIVES:
+            raise ValueError(f"Objective '{objective}' is not supported by the compiled scorer")
+        params = model["learner_model_param"]
+        if int(params.get("num_class", 0)) > 1 or int(params.get("num_target", 1)) > 1:
+            raise ValueError("Multi-class / multi-target models are not supported by the compiled scorer")
+        if model["gradient_booster"]["name"] != "gbtree":
+            raise ValueError(f"Booster '{model['gradient_booster']['name']}' is not supported by the compiled scorer")
+        trees = model["gradient_booster"]["model"]["trees"]
+        if any(any(t["split_type"]) for t in trees):
+            raise ValueError("Categorical splits are not supported by the compiled scorer")
+
+        n_trees = len(trees)
+        max_nodes = max(len(t["left_children"]) for t in trees)
+        size = n_trees * max_nodes
+        self.left = np.arange(size, dtype=np.intp)
+        self.right = np.arange(size, dtype=np.intp)
+        self.feature = np.zeros(size, dtype=np.intp)
+        self.threshold = np.zeros(size, dtype=np.float32)  # leaf value at leaves
+        self.default_left = np.zeros(size, dtype=bool)
+        depth = np.zeros(size, dtype=np.int32)
+        for i, t in enumerate(trees):
+            base = i * max_nodes
+            left = np.asarray(t["left_children"])
+            internal = np.flatnonzero(left != -1)
+            self.left[base + internal] = base + left[internal]
+            self.right[base + internal] = base + np.asarray(t["right_children"])[internal]
+            n = len(left)
+            self.feature[base:base + n] = t["split_indices"]
+            self.threshold[base:base + n] = t["split_conditions"]
+            self.default_left[base:base + n] = t["default_left"]
+            for node in internal:  # parents precede children in XGBoost's node order
+                depth[base + left[node]] = depth[base + node] + 1
+                depth[base + t["right_children"][node]] = depth[base + node] + 1
+        self.max_depth = int(depth.max())
+        self.roots = np.arange(n_trees, dtype=np.intp) * max_nodes
+
+        # Intercept in margin space (base_score is stored in output space: a probability / a mean)
+        base_score = float(str(params["base_score"]).strip("[]"))
+        self.link = "logistic" if objective in LOGISTIC_OBJECTIVES else "log" if objective in LOG_LINK_OBJECTIVES \
+            else "identity"
+        if self.link == "logistic":
+            self.base_margin = np.log(base_score / (1 - base_score))
+        elif self.link == "log":
+            self.base_margin = np.log(base_score)
+        else:
+            self.base_margin = base_score
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        has_nan = np.isnan(X).any()
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            value = X[rows, self.feature[node]]
+            go_left = value < self.threshold[node]
+            if has_nan:
+                go_left = np.where(np.isnan(value), self.default_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.threshold[node].sum(axis=1, dtype=np.float32) + np.float32(self.base_margin)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        margin = self.predict_margin(X)
+        if self.link == "logistic":
+            return 1.0 / (1.0 + np.exp(-margin))
+        return np.exp(margin) if self.link == "log" else margin
+
+
+# -----------------------------
+# Scorer
+# -----------------------------
+class MarketLensScorer:
+    """
+    Score acceptance likelihood and expected loss ratio.
+
+    Args:
+        model_dir: folder with xgb_acceptance.json, xgb_lossratio.json and marketlens_featurizer.json.
+        nthread: threads for batch prediction (0 = all cores).
+        fast_path_max_rows: inputs up to this many rows use the compiled trees.
+        timing_window: number of recent calls kept per API for p50/p99.
+        monitor: FairnessMonitor updated with the acceptance likelihood of every scored treaty.
+        audit_trail: governance AuditTrail receiving every explain_one() result ("explanation" records).
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR, nthread: int = 0,
+                 fast_path_max_rows: int = 16, timing_window: int = 10_000, monitor=None, audit_trail=None):
+        self.featurizer = MarketLensFeaturizer.load(os.path.join(model_dir, os.path.basename(FEATURIZER_PATH)))
+        self.acceptance = xgb.Booster(model_file=os.path.join(model_dir, os.path.basename(ACCEPTANCE_JSON)))
+        self.loss_ratio = xgb.Booster(model_file=os.path.join(model_dir, os.path.basename(LOSS_JSON)))
+        for name, booster in [("acceptance", self.acceptance), ("loss_ratio", self.loss_ratio)]:
+            booster.set_param({"nthread": nthread})
+            if booster.feature_names and booster.feature_names != self.featurizer.feature_names:
+                raise ValueError(f"❌ {name} model features {booster.feature_names} do not match the featurizer.")
+
+        self.fast_path_max_rows = fast_path_max_rows
+        self._acceptance_fast = self._compile(self.acceptance)
+        self._loss_fast = self._compile(self.loss_ratio)
+        self._timings = defaultdict(lambda: deque(maxlen=timing_window))
+        self.monitor = monitor
+        self.audit_trail = audit_trail
+
+    @staticmethod
+    def _compile(booster: xgb.Booster):
+        """Compiled trees, or None (inplace_predict for every input) if the model is not supported."""
+        try:
+            return _CompiledTrees(booster)
+        except ValueError as e:
+            print(f"⚠️ {e}; single-treaty scoring falls back to inplace_predict.")
+            return None
+
+    def _predict_small(self, X: np.ndarray):
+        acceptance = self._acceptance_fast.predict(X) if self._acceptance_fast else self.acceptance.inplace_predict(X)
+        loss_ratio = self._loss_fast.predict(X) if self._loss_fast else self.loss_ratio.inplace_predict(X)
+        return acceptance, loss_ratio
+
+    # -------------------------------------------------------------------------
+    # Prediction
+    # -------------------------------------------------------------------------
+    def predict_matrix(self, X: np.ndarray):
+        """(acceptance_likelihood, expected_loss_ratio) arrays for a float32 feature matrix."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.shape[1] != self.featurizer.n_features:
+            raise ValueError(f"❌ Expected {self.featurizer.n_features} features, got {X.shape[1]}")
+        if len(X) <= self.fast_path_max_rows:
+            return self._predict_small(X)
+        return self.acceptance.inplace_predict(X), self.loss_ratio.inplace_predict(X)
+
+    def score_batch(self, treaties) -> pd.DataFrame:
+        """Score a book of treaties (DataFrame of raw fields, list of dicts or feature matrix)."""
+        start = time.perf_counter()
+        if isinstance(treaties, pd.DataFrame):
+            X = self.featurizer.transform_array(treaties)
+        elif isinstance(treaties, np.ndarray):
+            X = treaties
+        else:
+            X = self.featurizer.transform_records(list(treaties))
+        acceptance, loss_ratio = self.predict_matrix(X)
+        result = pd.DataFrame({"acceptance_likelihood": acceptance, "expected_loss_ratio": loss_ratio})
+        self._timings["batch"].append(time.perf_counter() - start)
+        if self.monitor is not None and not isinstance(treaties, np.ndarray):
+            raw = treaties if isinstance(treaties, pd.DataFrame) else pd.DataFrame(list(treaties))
+            self.monitor.update(acceptance, raw)
+        return result
+
+    def score_one(self, treaty: dict) -> dict:
+        """Score a single treaty dict (raw fields, e.g. premium / limit / region) with minimal latency."""
+        start = time.perf_counter()
+        x = self.featurizer.transform_one(treaty)
+        acceptance, loss_ratio = self._predict_small(x)
+        acceptance, loss_ratio = acceptance[0], loss_ratio[0]
+        self._timings["single"].append(time.perf_counter() - start)
+        if self.monitor is not None:
+            self.monitor.update_one(float(acceptance), treaty)
+        return {"acceptance_likelihood": float(acceptance), "expected_loss_ratio": float(loss_ratio)}
+
+    # -------------------------------------------------------------------------
+    # Explanations (native TreeSHAP)
+    # -------------------------------------------------------------------------
+    def contributions(self, X: np.ndarray, model: str = "acceptance", interactions: bool = False,
+                      approx: bool = False) -> np.ndarray:
+        """
+        Exact SHAP values from the booster: (n, n_features + 1) with the bias in the last column,
+        or (n, n_features + 1, n_features + 1) with interactions=True. Acceptance is in log-odds.
+        approx=True uses path-based (Saabas) attributions, several times faster per row.
+        """
+        booster = self.acceptance if model == "acceptance" else self.loss_ratio
+        dmatrix = xgb.DMatrix(np.ascontiguousarray(X, dtype=np.float32), feature_names=self.featurizer.feature_names)
+        if interactions:
+            return booster.predict(dmatrix, pred_interactions=True, approx_contribs=approx)
+        return booster.predict(dmatrix, pred_contribs=True, approx_contribs=approx)
+
+    def explain_batch(self, treaties, model: str = "acceptance") -> pd.DataFrame:
+        """Per-treaty feature contributions (one column per feature plus 'bias') for a book of treaties."""
+        start = time.perf_counter()
+        if isinstance(treaties, pd.DataFrame):
+            X = self.featurizer.transform_array(treaties)
+        elif isinstance(treaties, np.ndarray):
+            X = treaties
+        else:
+            X = self.featurizer.transform_records(list(treaties))
+        contrib = self.contributions(X, model)
+        result = pd.DataFrame(contrib, columns=self.featurizer.feature_names + ["bias"])
+        self._timings["explain_batch"].append(time.perf_counter() - start)
+        return result
+
+    def explain_one(self, treaty: dict, top_k: int = 5, model: str = "acceptance", approx: bool = False) -> dict:
+        """
+        Score one treaty and return its top_k feature contributions, largest |contribution| first,
+        e.g. for ClauseExplainer.explain_with_drivers().
+        """
+        start = time.perf_counter()
+        x = self.featurizer.transform_one(treaty)
+        contrib = self.contributions(x, model, approx=approx)[0]
+        order = np.argsort(-np.abs(contrib[:-1]))[:top_k]
+        acceptance, loss_ratio = self._predict_small(x)
+        result = {
+            "acceptance_likelihood": float(acceptance[0]),
+            "expected_loss_ratio": float(loss_ratio[0]),
+            "model": model,
+            "base_value": float(contrib[-1]),
+            "contributions": [
+                {"feature": self.featurizer.feature_names[j], "value": float(x[0, j]), "contribution": float(contrib[j])}
+                for j in order
+            ],
+        }
+        self._timings["explain_single"].append(time.perf_counter() - start)
+        if self.audit_trail is not None:
+            self.audit_trail.record("explanation", treaty.get("treaty_id"),
+                                    {"source": "marketlens", "treaty": treaty, **result})
+        return result
+
+    # -------------------------------------------------------------------------
+    # Timings
+    # -------------------------------------------------------------------------
+    def timings(self) -> pd.DataFrame:
+        """p50 / p99 latency (ms) of recent calls per API."""
+        rows = []
+        for api, values in self._timings.items():
+            ms = np.asarray(values) * 1e3
+            rows.append({"api": api, "calls": len(ms), "p50_ms": np.percentile(ms, 50), "p99_ms": np.percentile(ms, 99)})
+        return pd.DataFrame(rows, columns=["api", "calls", "p50_ms", "p99_ms"])
+
+
+_DEFAULT_SCORER = None
+
+
+def _load_monitor(featurizer: MarketLensFeaturizer) -> FairnessMonitor:
+    """Persisted live-fairness monitor (new if none exists), saved periodically and at exit."""
+    if os.path.exists(FAIRNESS_MONITOR_PATH):
+        monitor = FairnessMonitor.load(FAIRNESS_MONITOR_PATH, autosave_every=MONITOR_AUTOSAVE_EVERY)
+    else:
+        monitor = FairnessMonitor.from_featurizer(featurizer, path=FAIRNESS_MONITOR_PATH,
+                                                  autosave_every=MONITOR_AUTOSAVE_EVERY)
+    atexit.register(monitor.save)
+    return monitor
+
+
+def get_scorer() -> MarketLensScorer:
+    """Process-wide scorer (models are loaded once) feeding the persisted FairnessMonitor and audit trail."""
+    global _DEFAULT_SCORER
+    if _DEFAULT_SCORER is None:
+        from governance.audit_trail import get_audit_trail
+        scorer = MarketLensScorer(audit_trail=get_audit_trail())
+        scorer.monitor = _load_monitor(scorer.featurizer)
+        _DEFAULT_SCORER = scorer
+    return _DEFAULT_SCORER
+
+
+def score_treaties(treaties) -> pd.DataFrame:
+    """
+    Score treaties (DataFrame or list of dicts with raw treaty fields).
+    Returns: DataFrame with acceptance_likelihood and expected_loss_ratio per treaty.
+    """
+    return get_scorer().score_batch(treaties)
+
+
+if __name__ == "__main__":
+    scorer = get_scorer()
+    treaty = {
+        "treaty_type": "XoL", "line_of_business": "Property", "region": "US",
+        "premium": 4_500_000, "attachment_point": 15_000_000, "limit": 50_000_000,
+    }
+    print(scorer.score_one(treaty))
+    print(scorer.explain_one(treaty, top_k=3))
+
+    demo_path = os.path.join(PROJECT_ROOT, "data", "demo", "sample_treaties.csv")
+    if os.path.exists(demo_path):
+        book = pd.read_csv(demo_path)
+        for _ in range(20):
+            scorer.score_batch(book)
+        for record in book.head(1000).to_dict("records"):
+            scorer.score_one(record)
+            scorer.explain_one(record)
+    print("⏱️ Scoring latency:\n", scorer.timings())
@@ -0,0 +1,202 @@
+"""
+shap_cache.py
+
+Sampled, parallel and cached SHAP values for the MarketLens acceptance model.
+- SHAP is computed on a stratified sample (line of business x region) instead of
+  the whole book, optionally in row chunks across worker processes
+- Values are cached as float32 in a .npz keyed by model hash + data fingerprint,
+  so re-running the audit (or opening the dashboard) on the same model and data
+  never recomputes them
+- The cache serves per-treaty explanations and the summary plot / dashboard
+  feature importance
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SHAP_CACHE_DIR = os.path.join(PROJECT_ROOT, "marketlens", "models", "shap_cache")
+# Pointer to the most recent cache file (read by the dashboard)
+SHAP_CACHE_LATEST = os.path.join(SHAP_CACHE_DIR, "latest.json")
+
+STRATA_PREFIXES = ("line_of_business_", "region_")
+
+
+# -----------------------------
+# Cache Keys
+# -----------------------------
+def model_hash(model) -> str:
+    """SHA-256 of the serialized booster (XGBoost sklearn wrapper or Booster)."""
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    return hashlib.sha256(bytes(booster.save_raw("json"))).hexdigest()
+
+
+def data_fingerprint(X: pd.DataFrame) -> str:
+    """SHA-256 of column names and row hashes (vectorized; order-sensitive)."""
+    digest = hashlib.sha256("|".join(map(str, X.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# -----------------------------
+# Stratified Sample
+# -----------------------------
+def stratum_codes(X: pd.DataFrame, featurizer=None) -> np.ndarray:
+    """Integer stratum per row from the one-hot blocks (LOB x region; unseen category = own level)."""
+    if featurizer is not None:
+        blocks = [[f"{col}_{cat}" for cat in cats] for col, cats in featurizer.categories.items()]
+    else:
+        blocks = [[c for c in X.columns if c.startswith(prefix)] for prefix in STRATA_PREFIXES]
+    codes = np.zeros(len(X), dtype=np.int64)
+    for cols in blocks:
+        if not cols:
+            continue
+        onehot = X[cols].to_numpy()
+        level = np.where(onehot.any(axis=1), onehot.argmax(axis=1), len(cols))
+        codes = codes * (len(cols) + 1) + level
+    return codes
+
+
+def stratified_sample(X: pd.DataFrame, n: int, featurizer=None, min_per_stratum: int = 20,
+                      seed: int = 42) -> np.ndarray:
+    """
+    Row positions of a stratified sample of about n rows: each stratum contributes
+    proportionally to its size, but at least min_per_stratum rows (or all of them).
+    """
+    if n >= len(X):
+        return np.arange(len(X))
+    codes = stratum_codes(X, featurizer)
+    _, inverse, sizes = np.unique(codes, return_inverse=True, return_counts=True)
+    quota = np.minimum(sizes, np.maximum(np.round(sizes * n / len(X)), min_per_stratum)).astype(np.int64)
+
+    # Random order, then grouped by stratum: the first quota rows of each stratum are kept
+    order = np.random.default_rng(seed).permutation(len(X))
+    order = order[np.argsort(inverse[order], kind="stable")]
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.arange(len(X)) - starts[inverse[order]]
+    return np.sort(order[rank < quota[inverse[order]]])
+
+
+# -----------------------------
+# SHAP Computation
+# -----------------------------
+_EXPLAINER = None
+
+
+def _init_explainer(model):
+    global _EXPLAINER
+    import shap
+    _EXPLAINER = shap.TreeExplainer(model)
+
+
+def _shap_chunk(X_chunk: pd.DataFrame) -> np.ndarray:
+    values = _EXPLAINER.shap_values(X_chunk)
+    if isinstance(values, list):  # older shap: one array per class
+        values = values[-1]
+    return np.asarray(values, dtype=np.float32)
+
+
+def compute_shap_values(model, X: pd.DataFrame, n_jobs: int = 1, chunk_size: int = 20_000):
+    """(shap_values float32 (n, n_features), expected_value) computed in row chunks, in parallel if n_jobs > 1."""
+    chunks = [X.iloc[i:i + chunk_size] for i in range(0, len(X), chunk_size)]
+    _init_explainer(model)  # also provides expected_value
+    if n_jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_explainer, initargs=(model,)) as pool:
+            parts = list(pool.map(_shap_chunk, chunks))
+    else:
+        parts = [_shap_chunk(chunk) for chunk in chunks]
+    return np.concatenate(parts), float(np.ravel(_EXPLAINER.expected_value)[-1])
+
+
+# -----------------------------
+# Cache
+# -----------------------------
+class ShapCache:
+    """
+    SHAP values of a model on (a sample of) a feature table.
+
+    Attributes:
+        values: float32 (n_sampled, n_features) SHAP values (log-odds for the classifier).
+        rows: positions of the sampled rows in the feature table.
+        feature_names, expected_value, path.
+    """
+
+    def __init__(self, values: np.ndarray, rows: np.ndarray, feature_names, expected_value: float, path: str = None):
+        self.values = values
+        self.rows = rows
+        self.feature_names = list(feature_names)
+        self.expected_value = expected_value
+        self.path = path
+        self._row_lookup = {int(r): i for i, r in enumerate(rows)}
+
+    @classmethod
+    def load(cls, path: str) -> "ShapCache":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["values"], data["rows"], data["feature_names"].tolist(),
+                       float(data["expected_value"]), path)
+
+    @classmethod
+    def load_latest(cls, cache_dir: str = None):
+        """Most recently computed or reused cache (None if no audit has been run)."""
+        latest = os.path.join(cache_dir, os.path.basename(SHAP_CACHE_LATEST)) if cache_dir else SHAP_CACHE_LATEST
+        if not os.path.exists(latest):
+            return None
+        with open(latest) as f:
+            path = os.path.join(os.path.dirname(latest), json.load(f)["file"])
+        return cls.load(path) if os.path.exists(path) else None
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, values=self.values.astype(np.float32), rows=self.rows.astype(np.int64),
+                 feature_names=np.array(self.feature_names), expected_value=np.float32(self.expected_value))
+        self.mark_latest(path)
+
+    def mark_latest(self, path: str):
+        """Point latest.json (read by the dashboard) at this cache file; the .npz itself is not rewritten."""
+        with open(os.path.join(os.path.dirname(path), os.path.basename(SHAP_CACHE_LATEST)), "w") as f:
+            json.dump({"file": os.path.basename(path), "rows": len(self.rows)}, f)
+        self.path = path
+
+    def importance(self) -> pd.DataFrame:
+        """Mean |SHAP| per feature, descending."""
+        mean_abs = np.abs(self.values).mean(axis=0)
+        return (pd.DataFrame({"feature": self.feature_names, "mean_abs_shap": mean_abs})
+                .sort_values("mean_abs_shap", ascending=False, ignore_index=True))
+
+    def explain(self, row: int, top_k: int = None) -> pd.DataFrame:
+        """Per-feature contributions of one treaty (row position in the feature table), largest first."""
+        if row not in self._row_lookup:
+            raise KeyError(f"Row {row} is not in the SHAP sample (recompute with sample_size=None to cover all rows).")
+        contrib = self.values[self._row_lookup[row]]
+        order = np.argsort(-np.abs(contrib))[:top_k]
+        return pd.DataFrame({"feature": np.asarray(self.feature_names)[order], "shap_value": contrib[order]})
+
+
+def get_shap_values(model, X: pd.DataFrame, featurizer=None, sample_size: int = 20_000, n_jobs: int = 1,
+                    chunk_size: int = 20_000, cache_dir: str = None, refresh: bool = False,
+                    seed: int = 42) -> ShapCache:
+    """
+    Cached SHAP values for model on X (stratified sample of sample_size rows; None = all rows).
+    The cache file is keyed by model hash + data fingerprint + sample parameters.
+    """
+    cache_dir = cache_dir or SHAP_CACHE_DIR
+    sample_tag = "all" if sample_size is None else f"s{sample_size}-{seed}"
+    key = f"{model_hash(model)[:16]}_{data_fingerprint(X)[:16]}_{sample_tag}"
+    path = os.path.join(cache_dir, f"shap_{key}.npz")
+
+    if os.path.exists(path) and not refresh:
+        cache = ShapCache.load(path)
+        print(f"✅ Loaded cached SHAP values from {path} ({len(cache.rows)} rows)")
+        cache.mark_latest(path)
+        return cache
+
+    rows = np.arange(len(X)) if sample_size is None else stratified_sample(X, sample_size, featurizer, seed=seed)
+    values, expected_value = compute_shap_values(model, X.iloc[rows], n_jobs=n_jobs, chunk_size=chunk_size)
+    cache = ShapCache(values, rows, X.columns, expected_value)
+    cache.save(path)
+    print(f"💾 SHAP values cached to {path} ({len(rows)} of {len(X)} rows)")
+    return cache
@@ -1,11 +1,21 @@
 import os
+import sys
+import json
+import time
+import argparse
 import joblib
+import numpy as np
 import pandas as pd
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score, mean_squared_error
 from math import sqrt
 
+# Add project root to Python path (run as python marketlens/train_marketlens.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from marketlens.featurizer import MarketLensFeaturizer
+
 # -----------------------------
 # Project Paths
 # -----------------------------
@@ -23,23 +33,36 @@ os.makedirs(DEMO_DIR, exist_ok=True)
 ACCEPTANCE_MODEL_PKL = os.path.join(MODEL_DIR, "xgb_acceptance.pkl")
 LOSS_MODEL_PKL = os.path.join(MODEL_DIR, "xgb_lossratio.pkl")
 
-# Optional JSON boosters for model inspection
+# JSON boosters (model inspection and marketlens/scoring.py)
 ACCEPTANCE_JSON = os.path.join(MODEL_DIR, "xgb_acceptance.json")
 LOSS_JSON = os.path.join(MODEL_DIR, "xgb_lossratio.json")
 
+# Feature layout the models are trained on (written by preprocess.py)
+FEATURIZER_PATH = os.path.join(MODEL_DIR, "marketlens_featurizer.json")
+
 # Demo copies for Streamlit
 ACCEPTANCE_MODEL_PKL_DEMO = os.path.join(DEMO_DIR, "xgb_acceptance.pkl")
 
+# Timing / memory / early-stopping report of the last hist training run
+TRAINING_REPORT = os.path.join(MODEL_DIR, "training_report.json")
+# One JSON line per incremental update (warm start or fallback retrain)
+UPDATE_LOG = os.path.join(MODEL_DIR, "update_log.jsonl")
+
+# Best configurations found by tune_marketlens.py (used by --mode hist --tuned)
+TUNING_BEST = os.path.join(MODEL_DIR, "tuning_best.json")
+
 
 # -----------------------------
 # Load Data
 # -----------------------------
 def load_data():
-    """Load preprocessed features and labels for MarketLens."""
+    """Load preprocessed features and labels for MarketLens (features checked against the featurizer)."""
     if not os.path.exists(FEATURES_PATH) or not os.path.exists(LABELS_PATH):
         raise FileNotFoundError("❌ Preprocessed features/labels not found. Run preprocess.py first.")
 
+    featurizer = MarketLensFeaturizer.load(FEATURIZER_PATH)
     X = pd.read_parquet(FEATURES_PATH)
+    featurizer.check_columns(X.columns)
     y = pd.read_parquet(LABELS_PATH)
 
     if "acceptance" not in y.columns or "expected_loss_ratio" not in y.columns:
@@ -113,8 +136,489 @@ def train_xgb_models():
     print("\n🎉 Training complete! Models are ready for SHAP, fairness audit, and MarketLens dashboard.")
 
 
+# -----------------------------
+# Fast Training (hist + early stopping)
+# -----------------------------
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _save_models(acceptance_booster: xgb.Booster, loss_booster: xgb.Booster):
+    """Save JSON boosters plus sklearn-wrapped pickles for SHAP / fairness audit / demo."""
+    acceptance_booster.save_model(ACCEPTANCE_JSON)
+    loss_booster.save_model(LOSS_JSON)
+
+    clf = xgb.XGBClassifier()
+    clf.load_model(ACCEPTANCE_JSON)
+    reg = xgb.XGBRegressor()
+    reg.load_model(LOSS_JSON)
+    joblib.dump(clf, ACCEPTANCE_MODEL_PKL)
+    joblib.dump(clf, ACCEPTANCE_MODEL_PKL_DEMO)
+    joblib.dump(reg, LOSS_MODEL_PKL)
+    print(f"💾 Models saved to {ACCEPTANCE_JSON}, {LOSS_JSON} (+ pickles) and demo copy to {ACCEPTANCE_MODEL_PKL_DEMO}")
+
+
+def train_xgb_models_hist(
+    nthread: int = None,
+    num_boost_round: int = 2000,
+    early_stopping_rounds: int = 50,
+    learning_rate: float = 0.05,
+    max_depth: int = 6,
+    max_bin: int = 256,
+    val_size: float = 0.2,
+    seed: int = 42,
+    acceptance_params: dict = None,
+    loss_params: dict = None,
+    data: tuple = None,
+):
+    """
+    Train both MarketLens models with tree_method="hist".
+    - One shared train/validation split and one QuantileDMatrix pair for both
+      targets (the quantile sketch is built once; only labels are swapped)
+    - Early stopping on the validation set (AUC / RMSE)
+    - Explicit nthread (default: all cores)
+    - acceptance_params / loss_params override the shared booster params per
+      model (e.g. the configurations found by tune_marketlens.py)
+    - data: (X, y_accept, y_loss) to train on instead of the preprocessed files
+    Returns: report dict with metrics, best iterations, timings and peak memory.
+    """
+    print("🚀 Training MarketLens models (hist, early stopping)...")
+    nthread = nthread or os.cpu_count()
+    timings = {}
+
+    t0 = time.perf_counter()
+    X, y_accept, y_loss = data if data is not None else load_data()
+    X = np.asarray(X, dtype=np.float32)
+    feature_names = MarketLensFeaturizer.load(FEATURIZER_PATH).feature_names
+    y_accept = np.asarray(y_accept, dtype=np.float32)
+    y_loss = np.asarray(y_loss, dtype=np.float32)
+    timings["load_s"] = time.perf_counter() - t0
+
+    # Single shared split
+    t0 = time.perf_counter()
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_val = int(len(X) * val_size)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+    dtrain = xgb.QuantileDMatrix(X[train_idx], label=y_accept[train_idx], feature_names=feature_names,
+                                 max_bin=max_bin, nthread=nthread)
+    dval = xgb.QuantileDMatrix(X[val_idx], label=y_accept[val_idx], feature_names=feature_names,
+                               ref=dtrain, nthread=nthread)
+    timings["dmatrix_s"] = time.perf_counter() - t0
+
+    base_params = {
+        "tree_method": "hist",
+        "max_bin": max_bin,
+        "nthread": nthread,
+        "max_depth": max_depth,
+        "learning_rate": learning_rate,
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "seed": seed,
+    }
+
+    # -----------------------------
+    # 1. Acceptance Model
+    # -----------------------------
+    t0 = time.perf_counter()
+    acceptance = xgb.train(
+        {**base_params, **(acceptance_params or {}), "objective": "binary:logistic", "eval_metric": "auc"},
+        dtrain, num_boost_round=num_boost_round, evals=[(dval, "val")],
+        early_stopping_rounds=early_stopping_rounds, verbose_eval=False,
+    )
+    timings["acceptance_train_s"] = time.perf_counter() - t0
+    auc = roc_auc_score(y_accept[val_idx], acceptance.predict(dval, iteration_range=(0, acceptance.best_iteration + 1)))
+    print(f"✅ Acceptance Model AUC: {auc:.4f} (best iteration {acceptance.best_iteration})")
+
+    # -----------------------------
+    # 2. Loss Ratio Model (same matrices, new labels)
+    # -----------------------------
+    dtrain.set_label(y_loss[train_idx])
+    dval.set_label(y_loss[val_idx])
+    t0 = time.perf_counter()
+    loss = xgb.train(
+        {**base_params, **(loss_params or {}), "objective": "reg:squarederror", "eval_metric": "rmse"},
+        dtrain, num_boost_round=num_boost_round, evals=[(dval, "val")],
+        early_stopping_rounds=early_stopping_rounds, verbose_eval=False,
+    )
+    timings["loss_train_s"] = time.perf_counter() - t0
+    rmse = sqrt(mean_squared_error(y_loss[val_idx], loss.predict(dval, iteration_range=(0, loss.best_iteration + 1))))
+    print(f"✅ Loss Ratio Model RMSE: {rmse:.4f} (best iteration {loss.best_iteration})")
+
+    # Keep only the trees up to the best iteration
+    acceptance = acceptance[: acceptance.best_iteration + 1]
+    loss = loss[: loss.best_iteration + 1]
+    _save_models(acceptance, loss)
+
+    report = {
+        "mode": "hist",
+        "rows": len(X),
+        "features": len(feature_names),
+        "nthread": nthread,
+        "acceptance_auc": auc,
+        "acceptance_best_iteration": acceptance.num_boosted_rounds() - 1,
+        "loss_rmse": rmse,
+        "loss_best_iteration": loss.num_boosted_rounds() - 1,
+        **timings,
+        "total_s": sum(timings.values()),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    with open(TRAINING_REPORT, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"⏱️ Training report ({TRAINING_REPORT}):\n{json.dumps(report, indent=2)}")
+    return report
+
+
+# -----------------------------
+# Out-of-core Training (partitioned Parquet)
+# -----------------------------
+def train_xgb_models_external(
+    dataset_path: str,
+    cache_dir: str = None,
+    nthread: int = None,
+    num_boost_round: int = 2000,
+    early_stopping_rounds: int = 50,
+    learning_rate: float = 0.05,
+    max_depth: int = 6,
+    max_bin: int = 256,
+    val_size: float = 0.2,
+    batch_size: int = 262_144,
+    seed: int = 42,
+):
+    """
+    Train both MarketLens models from a raw treaty Parquet dataset that does not fit in RAM.
+    Batches are streamed through the persisted featurizer into ExtMemQuantileDMatrix
+    (pages cached under cache_dir); the loss-ratio matrices reuse the acceptance quantile cuts.
+    """
+    import gc
+    import shutil
+    import tempfile
+    from marketlens.data_iter import build_external_dmatrices
+
+    print(f"🚀 Training MarketLens models out-of-core from {dataset_path}...")
+    nthread = nthread or os.cpu_count()
+    featurizer = MarketLensFeaturizer.load(FEATURIZER_PATH)
+    own_cache = cache_dir is None
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix="marketlens_extmem_")
+    timings = {}
+
+    base_params = {
+        "tree_method": "hist",
+        "max_bin": max_bin,
+        "nthread": nthread,
+        "max_depth": max_depth,
+        "learning_rate": learning_rate,
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "seed": seed,
+    }
+    common = dict(cache_dir=cache_dir, val_size=val_size, batch_size=batch_size,
+                  max_bin=max_bin, nthread=nthread, seed=seed)
+
+    dtrain = dval = dtrain_loss = dval_loss = None
+    try:
+        # 1. Acceptance Model
+        t0 = time.perf_counter()
+        dtrain, dval = build_external_dmatrices(dataset_path, featurizer, "acceptance", **common)
+        timings["acceptance_dmatrix_s"] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        acceptance = xgb.train(
+            {**base_params, "objective": "binary:logistic", "eval_metric": "auc"},
+            dtrain, num_boost_round=num_boost_round, evals=[(dval, "val")],
+            early_stopping_rounds=early_stopping_rounds, verbose_eval=False,
+        )
+        timings["acceptance_train_s"] = time.perf_counter() - t0
+        # Keep only the trees up to the best iteration, then score exactly the model that is saved
+        best = acceptance.best_iteration
+        acceptance = acceptance[: best + 1]
+        auc = float(acceptance.eval(dval, "val").split(":")[-1])
+        print(f"✅ Acceptance Model AUC: {auc:.4f} (best iteration {best})")
+
+        # 2. Loss Ratio Model (quantile cuts shared with the acceptance matrix)
+        t0 = time.perf_counter()
+        dtrain_loss, dval_loss = build_external_dmatrices(dataset_path, featurizer, "expected_loss_ratio",
+                                                          ref=dtrain, **common)
+        timings["loss_dmatrix_s"] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        loss = xgb.train(
+            {**base_params, "objective": "reg:squarederror", "eval_metric": "rmse"},
+            dtrain_loss, num_boost_round=num_boost_round, evals=[(dval_loss, "val")],
+            early_stopping_rounds=early_stopping_rounds, verbose_eval=False,
+        )
+        timings["loss_train_s"] = time.perf_counter() - t0
+        best = loss.best_iteration
+        loss = loss[: best + 1]
+        rmse = float(loss.eval(dval_loss, "val").split(":")[-1])
+        print(f"✅ Loss Ratio Model RMSE: {rmse:.4f} (best iteration {best})")
+        rows = dtrain.num_row() + dval.num_row()
+    finally:
+        # Release the external-memory matrices (and the page files they hold open) before
+        # deleting their cache; XGBoost otherwise finds the pages gone when it frees them
+        dtrain = dval = dtrain_loss = dval_loss = None
+        gc.collect()
+        if own_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    _save_models(acceptance, loss)
+
+    report = {
+        "mode": "external_memory",
+        "dataset": dataset_path,
+        "rows": rows,
+        "features": featurizer.n_features,
+        "nthread": nthread,
+        "acceptance_auc": auc,
+        "acceptance_best_iteration": acceptance.num_boosted_rounds() - 1,
+        "loss_rmse": rmse,
+        "loss_best_iteration": loss.num_boosted_rounds() - 1,
+        **timings,
+        "total_s": sum(timings.values()),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    with open(TRAINING_REPORT, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"⏱️ Training report ({TRAINING_REPORT}):\n{json.dumps(report, indent=2)}")
+    return report
+
+
+# -----------------------------
+# Incremental Updates (new bids)
+# -----------------------------
+def _load_new_treaties(new_data_path: str, featurizer: MarketLensFeaturizer):
+    """Features and labels of newly arrived raw treaties (Parquet or CSV), via the persisted featurizer."""
+    from marketlens.preprocess import iter_treaty_chunks, transform_chunk
+
+    parts, n_rows = [], 0
+    for chunk in iter_treaty_chunks(new_data_path):
+        n_rows += len(chunk)
+        parts.append(transform_chunk(chunk, featurizer))  # NaN numerics -> derived labels; unlabeled rows dropped
+    X = pd.concat([p[0] for p in parts], ignore_index=True) if parts else pd.DataFrame()
+    if X.empty:
+        raise ValueError(f"❌ No labeled rows found in {new_data_path}")
+    if len(X) < n_rows:
+        print(f"⚠️ Dropped {n_rows - len(X)} of {n_rows} new rows without a usable label.")
+    labels = pd.concat([p[1] for p in parts], ignore_index=True)
+    return X, labels["acceptance"], labels["expected_loss_ratio"]
+
+
+def _log_update(report: dict):
+    with open(UPDATE_LOG, "a") as f:
+        f.write(json.dumps(report) + "\n")
+    print(f"⏱️ Update report (appended to {UPDATE_LOG}):\n{json.dumps(report, indent=2)}")
+
+
+def update_xgb_models(
+    new_data_path: str,
+    nthread: int = None,
+    update_rounds: int = 100,
+    early_stopping_rounds: int = 20,
+    learning_rate: float = 0.02,
+    max_depth: int = 6,
+    max_bin: int = 256,
+    val_size: float = 0.2,
+    min_val_rows: int = 50,
+    auc_tolerance: float = 0.02,
+    rmse_tolerance: float = 0.10,
+    max_trees: int = 3000,
+    seed: int = 42,
+):
+    """
+    Continue training the saved boosters on newly arrived treaties instead of rebuilding.
+    - Drift check: the current models are scored on held-out new rows and compared with
+      the baseline of the last full training run (training_report.json). An AUC drop
+      above auc_tolerance or a relative RMSE increase above rmse_tolerance triggers a
+      full hist retrain on the preprocessed history plus the new rows
+    - Otherwise both boosters are warm-started (xgb_model=) with at most update_rounds
+      new trees, early-stopped on the new held-out rows; an update that does not
+      improve the held-out score is discarded
+    - Ensembles above max_trees are also rebuilt by a full retrain, which bounds
+      prediction latency as updates accumulate
+    - Batches whose held-out rows are fewer than min_val_rows or contain a single
+      acceptance class cannot be scored (AUC is undefined) and are skipped; the saved
+      models are left unchanged
+    Returns: report dict (also appended to update_log.jsonl).
+    """
+    print(f"🚀 Updating MarketLens models with new treaties from {new_data_path}...")
+    nthread = nthread or os.cpu_count()
+    timings = {}
+
+    t0 = time.perf_counter()
+    featurizer = MarketLensFeaturizer.load(FEATURIZER_PATH)
+    X_new, y_accept_new, y_loss_new = _load_new_treaties(new_data_path, featurizer)
+    X = X_new.to_numpy(dtype=np.float32)
+    y_accept = y_accept_new.to_numpy(dtype=np.float32)
+    y_loss = y_loss_new.to_numpy(dtype=np.float32)
+    acceptance = xgb.Booster(model_file=ACCEPTANCE_JSON)
+    loss = xgb.Booster(model_file=LOSS_JSON)
+    for booster in (acceptance, loss):
+        booster.set_param({"nthread": nthread})
+    timings["load_s"] = time.perf_counter() - t0
+
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_val = max(int(len(X) * val_size), 1)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+
+    skip = None
+    if n_val < min_val_rows:
+        skip = f"{n_val} held-out rows (min_val_rows={min_val_rows})"
+    elif len(np.unique(y_accept[val_idx])) < 2:
+        skip = "held-out rows contain a single acceptance class"
+    if skip:
+        print(f"⚠️ Cannot validate an update on {len(X)} new rows: {skip}. Skipping; the saved models are unchanged.")
+        report = {"new_data": new_data_path, "new_rows": len(X), "mode": "skipped", "reasons": [skip]}
+        report.update(**timings, total_s=sum(timings.values()), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        _log_update(report)
+        return report
+
+    # -----------------------------
+    # 1. Drift Check
+    # -----------------------------
+    baseline = {}
+    if os.path.exists(TRAINING_REPORT):
+        with open(TRAINING_REPORT) as f:
+            baseline = json.load(f)
+    X_val = X[val_idx]
+    auc_before = roc_auc_score(y_accept[val_idx], acceptance.inplace_predict(X_val))
+    rmse_before = sqrt(mean_squared_error(y_loss[val_idx], loss.inplace_predict(X_val)))
+
+    reasons = []
+    if "acceptance_auc" not in baseline:
+        print(f"⚠️ No baseline metrics in {TRAINING_REPORT}; skipping the drift check.")
+    else:
+        if baseline["acceptance_auc"] - auc_before > auc_tolerance:
+            reasons.append(f"acceptance AUC {auc_before:.4f} vs baseline {baseline['acceptance_auc']:.4f}")
+        if rmse_before > baseline["loss_rmse"] * (1 + rmse_tolerance):
+            reasons.append(f"loss RMSE {rmse_before:.4f} vs baseline {baseline['loss_rmse']:.4f}")
+    if max(acceptance.num_boosted_rounds(), loss.num_boosted_rounds()) + update_rounds > max_trees:
+        reasons.append(f"ensemble would exceed max_trees={max_trees}")
+
+    report = {
+        "new_data": new_data_path,
+        "new_rows": len(X),
+        "baseline_acceptance_auc": baseline.get("acceptance_auc"),
+        "baseline_loss_rmse": baseline.get("loss_rmse"),
+        "acceptance_auc_before": auc_before,
+        "loss_rmse_before": rmse_before,
+    }
+
+    # -----------------------------
+    # 2a. Fallback: Full Retrain
+    # -----------------------------
+    if reasons:
+        print(f"⚠️ Drift detected ({'; '.join(reasons)}). Falling back to a full retrain.")
+        t0 = time.perf_counter()
+        X_hist, y_accept_hist, y_loss_hist = load_data()
+        data = (
+            np.vstack([X_hist.to_numpy(dtype=np.float32), X]),
+            np.concatenate([y_accept_hist.to_numpy(dtype=np.float32), y_accept]),
+            np.concatenate([y_loss_hist.to_numpy(dtype=np.float32), y_loss]),
+        )
+        full = train_xgb_models_hist(nthread=nthread, max_depth=max_depth, max_bin=max_bin, seed=seed, data=data)
+        timings["full_retrain_s"] = time.perf_counter() - t0
+        report.update(mode="full_retrain", reasons=reasons, acceptance_auc=full["acceptance_auc"],
+                      loss_rmse=full["loss_rmse"], acceptance_trees=full["acceptance_best_iteration"] + 1,
+                      loss_trees=full["loss_best_iteration"] + 1)
+        report.update(**timings, total_s=sum(timings.values()), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        _log_update(report)
+        return report
+
+    # -----------------------------
+    # 2b. Warm Start on New Rows
+    # -----------------------------
+    t0 = time.perf_counter()
+    dtrain = xgb.QuantileDMatrix(X[train_idx], label=y_accept[train_idx], feature_names=featurizer.feature_names,
+                                 max_bin=max_bin, nthread=nthread)
+    dval = xgb.QuantileDMatrix(X_val, label=y_accept[val_idx], feature_names=featurizer.feature_names,
+                               ref=dtrain, max_bin=max_bin, nthread=nthread)
+    base_params = {
+        "tree_method": "hist",
+        "max_bin": max_bin,
+        "nthread": nthread,
+        "max_depth": max_depth,
+        "learning_rate": learning_rate,
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "seed": seed,
+    }
+    timings["dmatrix_s"] = time.perf_counter() - t0
+
+    updated = {}
+    for name, booster, labels, params in [
+        ("acceptance", acceptance, y_accept, {"objective": "binary:logistic", "eval_metric": "auc"}),
+        ("loss", loss, y_loss, {"objective": "reg:squarederror", "eval_metric": "rmse"}),
+    ]:
+        dtrain.set_label(labels[train_idx])
+        dval.set_label(labels[val_idx])
+        t0 = time.perf_counter()
+        model = xgb.train({**base_params, **params}, dtrain, num_boost_round=update_rounds, evals=[(dval, "val")],
+                          early_stopping_rounds=early_stopping_rounds, verbose_eval=False, xgb_model=booster)
+        timings[f"{name}_update_s"] = time.perf_counter() - t0
+        # Keep the old trees plus only the new trees up to the best held-out score
+        updated[name] = model[: model.best_iteration + 1]
+
+    # New trees that do not beat the current model on the held-out rows are discarded
+    auc_after = roc_auc_score(y_accept[val_idx], updated["acceptance"].inplace_predict(X_val))
+    if auc_after < auc_before:
+        updated["acceptance"], auc_after = acceptance, auc_before
+    rmse_after = sqrt(mean_squared_error(y_loss[val_idx], updated["loss"].inplace_predict(X_val)))
+    if rmse_after > rmse_before:
+        updated["loss"], rmse_after = loss, rmse_before
+    report["acceptance_trees_added"] = updated["acceptance"].num_boosted_rounds() - acceptance.num_boosted_rounds()
+    report["loss_trees_added"] = updated["loss"].num_boosted_rounds() - loss.num_boosted_rounds()
+    print(f"✅ Acceptance AUC on new rows: {auc_before:.4f} -> {auc_after:.4f} "
+          f"(+{report['acceptance_trees_added']} trees)")
+    print(f"✅ Loss Ratio RMSE on new rows: {rmse_before:.4f} -> {rmse_after:.4f} (+{report['loss_trees_added']} trees)")
+    _save_models(updated["acceptance"], updated["loss"])
+
+    report.update(mode="warm_start", acceptance_auc=auc_after, loss_rmse=rmse_after,
+                  acceptance_trees=updated["acceptance"].num_boosted_rounds(),
+                  loss_trees=updated["loss"].num_boosted_rounds())
+    report.update(**timings, total_s=sum(timings.values()), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    _log_update(report)
+    return report
+
+
 # -----------------------------
 # Main
 # -----------------------------
 if __name__ == "__main__":
-    train_xgb_models()
+    parser = argparse.ArgumentParser(description="Train MarketLens acceptance and loss-ratio models.")
+    parser.add_argument("--mode", choices=["default", "hist", "external", "update"], default="default",
+                        help="'hist': histogram trees, early stopping, shared QuantileDMatrix; "
+                             "'external': out-of-core training from --dataset; "
+                             "'update': continue training the saved models on --new_data")
+    parser.add_argument("--nthread", type=int, default=None, help="Threads for hist/external/update mode (default: all cores)")
+    parser.add_argument("--dataset", type=str, default=None,
+                        help="Raw treaty Parquet file or partitioned directory (external mode)")
+    parser.add_argument("--cache_dir", type=str, default=None, help="External-memory page cache (default: temp dir)")
+    parser.add_argument("--new_data", type=str, default=None,
+                        help="Raw Parquet/CSV of newly arrived treaties (update mode)")
+    parser.add_argument("--tuned", action="store_true",
+                        help="Hist mode: use the best configurations saved by marketlens/tune_marketlens.py")
+    args = parser.parse_args()
+
+    if args.mode == "hist":
+        tuned = {}
+        if args.tuned:
+            with open(TUNING_BEST) as f:
+                # The shared QuantileDMatrix keeps one max_bin; early stopping still picks the rounds
+                tuned = {target: {k: v for k, v in config.items()
+                                  if k not in ("max_bin", "num_boost_round", "cv_score", "metric")}
+                         for target, config in json.load(f).items()}
+        train_xgb_models_hist(nthread=args.nthread, acceptance_params=tuned.get("acceptance"),
+                              loss_params=tuned.get("expected_loss_ratio"))
+    elif args.mode == "external":
+        if not args.dataset:
+            parser.error("--dataset is required for --mode external")
+        train_xgb_models_external(args.dataset, cache_dir=args.cache_dir, nthread=args.nthread)
+    elif args.mode == "update":
+        if not args.new_data:
+            parser.error("--new_data is required for --mode update")
+        update_xgb_models(args.new_data, nthread=args.nthread)
+    else:
+        train_xgb_models()
@@ -0,0 +1,252 @@
+"""
+tune_marketlens.py
+
+Parallel cross-validated hyperparameter search for the MarketLens models.
+- Random search or successive halving over SEARCH_SPACE
+- k-fold CV with early stopping; trials run in a process pool, each worker
+  limited to nthread threads so workers x threads <= cores (no oversubscription)
+- Fold QuantileDMatrix objects are built once per worker and reused by every
+  trial (and both targets; only labels are swapped)
+- Every trial is recorded with its CV score and wall-clock time; the best
+  configuration per target is saved for train_marketlens.py --mode hist --tuned
+- A time budget stops scheduling new trials once exhausted
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Add project root to Python path (run as python marketlens/tune_marketlens.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from marketlens.train_marketlens import load_data, MODEL_DIR, TUNING_BEST
+
+TUNING_RESULTS = os.path.join(MODEL_DIR, "tuning_results.csv")
+
+# (low, high, "log" | "linear" | "int") ranges or explicit choices (lists)
+SEARCH_SPACE = {
+    "max_depth": (3, 10, "int"),
+    "learning_rate": (0.01, 0.3, "log"),
+    "subsample": (0.5, 1.0, "linear"),
+    "colsample_bytree": (0.5, 1.0, "linear"),
+    "min_child_weight": (1.0, 20.0, "log"),
+    "reg_lambda": (0.1, 10.0, "log"),
+    "max_bin": [64, 128, 256],
+}
+
+TARGETS = {
+    # target: (objective, eval_metric, maximize)
+    "acceptance": ("binary:logistic", "auc", True),
+    "expected_loss_ratio": ("reg:squarederror", "rmse", False),
+}
+
+
+def sample_configs(n_trials: int, seed: int = 42, space: dict = None):
+    """Draw n_trials random configurations from the search space."""
+    space = space or SEARCH_SPACE
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(n_trials):
+        config = {}
+        for name, spec in space.items():
+            if isinstance(spec, list):
+                config[name] = spec[rng.integers(len(spec))]
+            else:
+                low, high, scale = spec
+                if scale == "int":
+                    config[name] = int(rng.integers(low, high + 1))
+                elif scale == "log":
+                    config[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                else:
+                    config[name] = float(rng.uniform(low, high))
+        configs.append(config)
+    return configs
+
+
+# -----------------------------------------------------------------------------
+# Worker
+# -----------------------------------------------------------------------------
+_WORKER = {}
+
+
+def _init_worker(X, labels, n_folds, seed, nthread):
+    """Runs once per worker process: pin thread count and keep the data for fold caching."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(nthread)
+    order = np.random.default_rng(seed).permutation(len(X))
+    _WORKER.update(X=X, labels=labels, folds=np.array_split(order, n_folds), nthread=nthread, cache={})
+
+
+def _fold_dmatrices(fold: int, max_bin: int):
+    """(dtrain, dval) for a fold, built on first use and cached for the worker's lifetime."""
+    import xgboost as xgb
+    key = (fold, max_bin)
+    if key not in _WORKER["cache"]:
+        folds = _WORKER["folds"]
+        val_idx = folds[fold]
+        train_idx = np.concatenate([f for i, f in enumerate(folds) if i != fold])
+        X = _WORKER["X"]
+        dtrain = xgb.QuantileDMatrix(X[train_idx], max_bin=max_bin, nthread=_WORKER["nthread"])
+        dval = xgb.QuantileDMatrix(X[val_idx], ref=dtrain, max_bin=max_bin, nthread=_WORKER["nthread"])
+        _WORKER["cache"][key] = (dtrain, dval, train_idx, val_idx)
+    return _WORKER["cache"][key]
+
+
+def _run_trial(trial_id: int, target: str, config: dict, num_boost_round: int, early_stopping_rounds: int):
+    """k-fold CV of one configuration on one target."""
+    import xgboost as xgb
+    objective, metric, maximize = TARGETS[target]
+    start = time.perf_counter()
+    labels = _WORKER["labels"][target]
+    params = {
+        "objective": objective, "eval_metric": metric, "tree_method": "hist",
+        "nthread": _WORKER["nthread"], **config,
+    }
+
+    scores, iterations = [], []
+    for fold in range(len(_WORKER["folds"])):
+        dtrain, dval, train_idx, val_idx = _fold_dmatrices(fold, config.get("max_bin", 256))
+        dtrain.set_label(labels[train_idx])
+        dval.set_label(labels[val_idx])
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round, evals=[(dval, "val")],
+                            early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+        scores.append(booster.best_score)
+        iterations.append(booster.best_iteration + 1)
+
+    return {
+        "trial_id": trial_id,
+        "target": target,
+        **config,
+        "num_boost_round": num_boost_round,
+        f"cv_{metric}": float(np.mean(scores)),
+        f"cv_{metric}_std": float(np.std(scores)),
+        "score": float(np.mean(scores)) if maximize else -float(np.mean(scores)),  # higher is better
+        "best_iteration": int(np.mean(iterations)),
+        "wall_s": time.perf_counter() - start,
+        "worker_pid": os.getpid(),
+    }
+
+
+# -----------------------------------------------------------------------------
+# Search
+# -----------------------------------------------------------------------------
+def _run_batch(pool, jobs, deadline):
+    """Submit _run_trial argument tuples, collect results until all are done or the deadline passes."""
+    pending = {pool.submit(_run_trial, *job): job for job in jobs}
+    results = []
+    while pending:
+        timeout = None if deadline is None else max(deadline - time.time(), 0)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            for future in pending:
+                future.cancel()  # not-yet-started trials are dropped; running ones finish
+            print(f"⚠️ Time budget exhausted; {len(pending)} trials not completed.")
+            break
+        for future in done:
+            pending.pop(future)
+            results.append(future.result())
+    return results
+
+
+def tune_marketlens(
+    targets=("acceptance", "expected_loss_ratio"),
+    n_trials: int = 20,
+    strategy: str = "random",
+    n_folds: int = 3,
+    max_workers: int = None,
+    time_budget_s: float = None,
+    num_boost_round: int = 1000,
+    min_boost_round: int = 50,
+    eta: int = 3,
+    early_stopping_rounds: int = 30,
+    seed: int = 42,
+) -> pd.DataFrame:
+    """
+    Search hyperparameters for each target and save results + best configurations.
+    strategy="halving": all configs start with min_boost_round rounds; the best 1/eta
+    of each rung continue with eta x more rounds until num_boost_round.
+    Returns: table of all completed trials.
+    """
+    X, y_accept, y_loss = load_data()
+    X = X.to_numpy(dtype=np.float32)
+    labels = {"acceptance": y_accept.to_numpy(dtype=np.float32),
+              "expected_loss_ratio": y_loss.to_numpy(dtype=np.float32)}
+
+    cores = os.cpu_count() or 1
+    max_workers = max_workers or cores
+    nthread = max(1, cores // max_workers)
+    deadline = time.time() + time_budget_s if time_budget_s else None
+    configs = sample_configs(n_trials, seed)
+    print(f"🎬 Tuning {list(targets)}: {n_trials} configs ({strategy}), {n_folds}-fold CV, "
+          f"{max_workers} workers x {nthread} threads")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(X, labels, n_folds, seed, nthread)) as pool:
+        for target in targets:
+            if strategy == "halving":
+                survivors = list(enumerate(configs))
+                rounds = min_boost_round
+                while survivors:
+                    rung = _run_batch(pool, [(i, target, c, rounds, early_stopping_rounds) for i, c in survivors], deadline)
+                    for r in rung:
+                        r["rung_rounds"] = rounds
+                    results.extend(rung)
+                    if rounds >= num_boost_round or len(rung) <= 1:
+                        break
+                    keep = {r["trial_id"] for r in sorted(rung, key=lambda r: -r["score"])[:max(1, len(rung) // eta)]}
+                    survivors = [(i, c) for i, c in survivors if i in keep]
+                    rounds = min(rounds * eta, num_boost_round)
+            else:
+                jobs = [(i, target, c, num_boost_round, early_stopping_rounds) for i, c in enumerate(configs)]
+                results.extend(_run_batch(pool, jobs, deadline))
+
+    results_df = pd.DataFrame(results)
+    if results_df.empty:
+        print("⚠️ No trials completed within the time budget.")
+        return results_df
+
+    results_df.to_csv(TUNING_RESULTS, index=False)
+    best = {}
+    for target, group in results_df.groupby("target"):
+        top = group.sort_values(["score", "num_boost_round"], ascending=[False, False]).iloc[0]
+        best[target] = {
+            **{name: top[name].item() if hasattr(top[name], "item") else top[name] for name in SEARCH_SPACE},
+            "num_boost_round": int(top["best_iteration"]),
+            "cv_score": float(top["score"]) if TARGETS[target][2] else -float(top["score"]),
+            "metric": TARGETS[target][1],
+        }
+    with open(TUNING_BEST, "w") as f:
+        json.dump(best, f, indent=2)
+
+    print(f"✅ Trials saved to {TUNING_RESULTS} ({len(results_df)} rows, total worker time "
+          f"{results_df['wall_s'].sum():.1f}s)")
+    print(f"🏆 Best configurations saved to {TUNING_BEST}:\n{json.dumps(best, indent=2)}")
+    return results_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search for MarketLens.")
+    parser.add_argument("--trials", type=int, default=20, help="Number of sampled configurations")
+    parser.add_argument("--strategy", choices=["random", "halving"], default="random")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--time_budget", type=float, default=None, help="Seconds before scheduling stops")
+    parser.add_argument("--target", choices=["acceptance", "expected_loss_ratio", "both"], default="both")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tune_marketlens(
+        targets=TARGETS if args.target == "both" else (args.target,),
+        n_trials=args.trials,
+        strategy=args.strategy,
+        n_folds=args.folds,
+        max_workers=args.workers,
+        time_budget_s=args.time_budget,
+        seed=args.seed,
+    )
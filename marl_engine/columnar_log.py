@@ -0,0 +1,201 @@
+"""
+columnar_log.py
+
+Columnar step/episode logging for long MARL runs.
+- Rows are written into preallocated NumPy column buffers (no list-of-dict accumulation)
+- Full buffers are flushed as Parquet part files with a fixed schema
+- Each part is renamed into place atomically, so readers (e.g. the dashboard)
+  can load partial results while training is still running
+"""
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, Optional
+
+# -----------------------------------------------------------------------------
+# Standard Schemas
+# -----------------------------------------------------------------------------
+# Episode-level KPIs (scripts/03_run_simulation.py, dashboard learning curves)
+EPISODE_SCHEMA = {
+    "round": "int64",
+    "avg_profit": "float64",
+    "win_rate": "float64",
+    "cvar_95": "float64",
+    "timestamp": "datetime64[us]",
+}
+
+# Per-step, per-agent outcomes from TreatyBiddingEnv
+STEP_SCHEMA = {
+    "round": "int64",
+    "step": "int32",
+    "agent": "int32",
+    "action": "float32",
+    "reward": "float32",
+    "cvar_95": "float64",
+}
+
+# Per-bid rows of the legacy simulation (simulation_runs)
+BID_SCHEMA = {
+    "episode": "int64",
+    "agent_id": "str",
+    "action": "float64",
+    "reward": "float64",
+    "cvar_95": "float64",
+}
+
+
+def _arrow_type(dtype: str) -> pa.DataType:
+    if dtype == "str":
+        return pa.string()
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _fill_value(dtype: str):
+    if dtype == "str":
+        return None
+    kind = np.dtype(dtype).kind
+    if kind == "f":
+        return np.nan
+    if kind == "M":
+        return np.datetime64("NaT")
+    return 0
+
+
+class ColumnarLogger:
+    """
+    Append-only columnar logger with bounded memory.
+
+    Args:
+        output_dir: Parquet dataset directory (part-00000.parquet, ...).
+                    None keeps flushed chunks in memory (small runs / tests).
+        schema: {column: dtype} with NumPy dtype strings or "str".
+        chunk_size: rows per buffer / part file.
+        overwrite: remove an existing file or dataset at output_dir first.
+    """
+
+    def __init__(self, output_dir: Optional[str], schema: Dict[str, str],
+                 chunk_size: int = 65_536, overwrite: bool = True):
+        self.output_dir = output_dir
+        self.schema = dict(schema)
+        self.chunk_size = chunk_size
+        self.arrow_schema = pa.schema([(name, _arrow_type(dtype)) for name, dtype in self.schema.items()])
+
+        self._buffers = {
+            name: np.empty(chunk_size, dtype=object if dtype == "str" else dtype)
+            for name, dtype in self.schema.items()
+        }
+        self._n = 0
+        self._parts = 0
+        self._tables = []
+        self.rows_written = 0
+
+        if output_dir:
+            if overwrite and os.path.isdir(output_dir):
+                shutil.rmtree(output_dir)
+            elif overwrite and os.path.exists(output_dir):
+                os.remove(output_dir)
+            os.makedirs(output_dir, exist_ok=True)
+            self._parts = len([f for f in os.listdir(output_dir) if f.startswith("part-")])
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+    def log(self, **row):
+        """Log one row. Missing columns get NaN/NaT/0/None; unknown columns raise."""
+        unknown = set(row) - set(self.schema)
+        if unknown:
+            raise KeyError(f"Columns not in logger schema: {sorted(unknown)}")
+
+        i = self._n
+        for name, dtype in self.schema.items():
+            self._buffers[name][i] = row.get(name, _fill_value(dtype))
+        self._n += 1
+        if self._n == self.chunk_size:
+            self.flush()
+
+    def log_batch(self, **columns):
+        """Log many rows at once from equal-length arrays (or scalars to broadcast)."""
+        unknown = set(columns) - set(self.schema)
+        if unknown:
+            raise KeyError(f"Columns not in logger schema: {sorted(unknown)}")
+
+        lengths = {len(v) for v in columns.values() if np.ndim(v) > 0}
+        if len(lengths) > 1:
+            raise ValueError(f"Batch columns have different lengths: {sorted(lengths)}")
+        n = lengths.pop() if lengths else 1
+
+        offset = 0
+        while offset < n:
+            take = min(n - offset, self.chunk_size - self._n)
+            dst = slice(self._n, self._n + take)
+            for name, dtype in self.schema.items():
+                value = columns.get(name, _fill_value(dtype))
+                if np.ndim(value) > 0:
+                    value = np.asarray(value)[offset:offset + take]
+                self._buffers[name][dst] = value
+            self._n += take
+            offset += take
+            if self._n == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """Write buffered rows as one part file (or in-memory table)."""
+        if self._n == 0:
+            return
+        arrays = [
+            pa.array(self._buffers[name][:self._n], type=self.arrow_schema.field(name).type)
+            for name in self.schema
+        ]
+        table = pa.Table.from_arrays(arrays, schema=self.arrow_schema)
+
+        if self.output_dir:
+            name = f"part-{self._parts:05d}.parquet"
+            tmp_path = os.path.join(self.output_dir, f".{name}.tmp")  # hidden from dataset readers
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, os.path.join(self.output_dir, name))
+        else:
+            self._tables.append(table)
+
+        self._parts += 1
+        self.rows_written += self._n
+        self._n = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+    def to_pandas(self) -> pd.DataFrame:
+        """Return everything logged so far (flushes first)."""
+        self.flush()
+        if self.output_dir:
+            return read_log(self.output_dir, self.schema)
+        if not self._tables:
+            return self.arrow_schema.empty_table().to_pandas()
+        return pa.concat_tables(self._tables).to_pandas()
+
+
+def read_log(output_dir: str, schema: Dict[str, str] = None, columns=None) -> pd.DataFrame:
+    """
+    Read a columnar log, including one that is still being written.
+    Returns an empty frame (with schema columns, if given) when no part exists yet.
+    """
+    parts = []
+    if os.path.isdir(output_dir):
+        parts = sorted(f for f in os.listdir(output_dir) if f.startswith("part-") and f.endswith(".parquet"))
+    if not parts:
+        return pd.DataFrame(columns=columns or list(schema or []))
+
+    paths = [os.path.join(output_dir, f) for f in parts]
+    return pq.ParquetDataset(paths).read(columns=columns).to_pandas()
@@ -5,6 +5,7 @@ Multi-Agent Treaty Bidding Environment for Transparent Market Platform.
 - Compatible with Gymnasium / PettingZoo style
 - Supports Centralized Training with Decentralized Execution (CTDE)
 - Generates KPIs for CVaR-aware training
+- Keeps a mergeable quantile sketch of all rewards in the episode (info["reward_sketch"])
 """
 
 import numpy as np
@@ -12,6 +13,8 @@ import gymnasium as gym
 from gymnasium import spaces
 from typing import Dict, List, Tuple
 
+from marl_engine.quantile_sketch import KLLSketch
+
 
 class TreatyBiddingEnv(gym.Env):
     """
@@ -56,6 +59,7 @@ class TreatyBiddingEnv(gym.Env):
         self.current_step = 0
         self.agent_states = np.zeros((num_agents, obs_dim), dtype=np.float32)
         self.agent_profits = np.zeros(num_agents, dtype=np.float32)
+        self.reward_sketch = KLLSketch(seed=0)
 
     # -------------------------------------------------------------------------
     # Core Gym Methods
@@ -65,6 +69,8 @@ class TreatyBiddingEnv(gym.Env):
         super().reset(seed=seed)
         self.current_step = 0
         self.agent_profits = np.zeros(self.num_agents, dtype=np.float32)
+        # Own RNG, seeded from the reset seed (0 if none) so the env's market draws are unchanged
+        self.reward_sketch = KLLSketch(seed=0 if seed is None else seed)
 
         # Initialize market state (random treaty features)
         self.agent_states = self._sample_initial_state()
@@ -87,8 +93,10 @@ class TreatyBiddingEnv(gym.Env):
         # Simulate treaty outcome
         rewards, info = self._simulate_market(actions)
 
-        # Update profits
+        # Update profits and the episode's reward distribution
         self.agent_profits += rewards
+        self.reward_sketch.update(rewards)
+        info["reward_sketch"] = self.reward_sketch
 
         # Generate next observation
         self.agent_states = self._sample_next_state()
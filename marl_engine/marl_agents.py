@@ -84,3 +84,140 @@ class RandomAgent(BiddingAgent):
 
     def act(self, state_row):
         return super().act(state_row)
+
+
+class PopulationAgent:
+    """
+    Population of K heuristic bidding agents stored as arrays.
+    Vectorized counterpart of BiddingAgent / MAPPOAgent: one call produces
+    bids for every agent across a batch of treaties, so market simulations
+    with hundreds of reinsurers run at NumPy speed.
+    """
+    def __init__(self, agent_ids, risk_aversion=0.1, multiplier_low=0.8, multiplier_high=1.2,
+                 seed=None, buffer_capacity: int = 4096):
+        self.ids = np.asarray(agent_ids)
+        k = len(self.ids)
+        self.risk_aversion = np.broadcast_to(np.asarray(risk_aversion, dtype=np.float64), (k,)).copy()
+        self.low = np.broadcast_to(np.asarray(multiplier_low, dtype=np.float64), (k,)).copy()
+        self.high = np.broadcast_to(np.asarray(multiplier_high, dtype=np.float64), (k,)).copy()
+        self.rng = np.random.default_rng(seed)
+        if buffer_capacity <= 0:
+            raise ValueError(f"buffer_capacity must be positive, got {buffer_capacity}")
+
+        # Experience buffer: one row per (step, agent, treaty), grown by doubling
+        self._capacity = buffer_capacity
+        self._size = 0
+        self._buffer = self._empty_buffer(buffer_capacity)
+
+    @classmethod
+    def from_agents(cls, agents, seed=None):
+        """Build a population from BiddingAgent instances (keeps their ids, risk and bounds)."""
+        bounds = np.array([a.policy_params["premium_multiplier"] for a in agents], dtype=np.float64)
+        return cls(
+            [a.id for a in agents],
+            risk_aversion=[a.risk_aversion for a in agents],
+            multiplier_low=bounds[:, 0],
+            multiplier_high=bounds[:, 1],
+            seed=seed,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _per_agent(self, values, ndim):
+        """Reshape a (K,) parameter so it broadcasts against a (K, ...) array."""
+        return values.reshape((-1,) + (1,) * (ndim - 1))
+
+    def _agent_first(self, values, ndim):
+        """Align per-agent values (scalar, (K,) or (K, ...)) on the leading axis of an ndim array."""
+        values = np.asarray(values)
+        if values.ndim == 1 and ndim > 1:
+            return self._per_agent(values, ndim)
+        return values
+
+    # -------------------------------------------------------------------------
+    # Acting
+    # -------------------------------------------------------------------------
+    def act(self, states):
+        """
+        Premium multipliers for all agents and treaties.
+        states: batch of treaty rows (DataFrame/array) or an int number of treaties.
+        Returns: array of shape (K, n_treaties).
+        """
+        n = states if isinstance(states, (int, np.integer)) else len(states)
+        u = self.rng.random((len(self), n))
+        return self.low[:, None] + (self.high - self.low)[:, None] * u
+
+    def bid(self, premiums):
+        """Quoted premiums (K, n_treaties) = multiplier * treaty premium."""
+        premiums = np.asarray(premiums, dtype=np.float64)
+        return self.act(len(premiums)) * premiums[None, :]
+
+    # -------------------------------------------------------------------------
+    # Evaluation
+    # -------------------------------------------------------------------------
+    def evaluate(self, reward, cvar_95):
+        """
+        Batched risk-adjusted reward: reward - risk_aversion * cvar_95.
+        reward/cvar_95 have the agent axis first: (K,) or (K, n_treaties).
+        """
+        reward = np.asarray(reward, dtype=np.float64)
+        cvar_95 = np.asarray(cvar_95, dtype=np.float64)
+        ndim = max(reward.ndim, cvar_95.ndim, 1)
+        return (self._agent_first(reward, ndim)
+                - self._per_agent(self.risk_aversion, ndim) * self._agent_first(cvar_95, ndim))
+
+    def compute_risk_adjusted_reward(self, reward, cvar_95):
+        """CVaR-aware reward shaping for the whole population."""
+        return self.evaluate(reward, cvar_95)
+
+    # -------------------------------------------------------------------------
+    # Experience Buffer
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _empty_buffer(capacity):
+        return {
+            "step": np.empty(capacity, dtype=np.int64),
+            "agent": np.empty(capacity, dtype=np.int32),
+            "action": np.empty(capacity, dtype=np.float64),
+            "reward": np.empty(capacity, dtype=np.float64),
+            "cvar_95": np.empty(capacity, dtype=np.float64),
+            "done": np.empty(capacity, dtype=bool),
+        }
+
+    def store_experience(self, step, actions, rewards, cvar_95, done):
+        """
+        Store one step for all agents: actions are (K,) or (K, n_treaties);
+        rewards/cvar_95/done are scalars, (K,) per agent, or the shape of actions.
+        """
+        actions = np.asarray(actions, dtype=np.float64)
+        shape = actions.shape
+        n = actions.size
+
+        needed = self._size + n
+        if needed > self._capacity:
+            while self._capacity < needed:
+                self._capacity *= 2
+            grown = self._empty_buffer(self._capacity)
+            for name, arr in self._buffer.items():
+                grown[name][:self._size] = arr[:self._size]
+            self._buffer = grown
+
+        agent_idx = np.broadcast_to(self._per_agent(np.arange(len(self), dtype=np.int32), len(shape)), shape)
+        dst = slice(self._size, needed)
+        self._buffer["step"][dst] = step
+        self._buffer["agent"][dst] = agent_idx.ravel()
+        self._buffer["action"][dst] = actions.ravel()
+        ndim = len(shape)
+        self._buffer["reward"][dst] = np.broadcast_to(self._agent_first(rewards, ndim), shape).ravel()
+        self._buffer["cvar_95"][dst] = np.broadcast_to(self._agent_first(cvar_95, ndim), shape).ravel()
+        self._buffer["done"][dst] = np.broadcast_to(self._agent_first(done, ndim), shape).ravel()
+        self._size = needed
+
+    def experience(self):
+        """Stored experience as a dict of column arrays (views, no copy)."""
+        return {name: arr[:self._size] for name, arr in self._buffer.items()}
+
+    def update_policy(self):
+        """Heuristic population has no learned policy; clear the buffer like MAPPOAgent."""
+        self._size = 0
@@ -0,0 +1,156 @@
+"""
+quantile_sketch.py
+
+Streaming quantile sketch (KLL) for tail-risk statistics in bounded memory.
+- update() accepts scalars or whole arrays (vectorized compaction)
+- quantile() answers any rank query with error ~ O(1/k) of the stream size
+- var() / cvar() give tail risk at any alpha, for rewards (lower tail) or losses (upper tail)
+- merge() combines sketches from rollout workers, episodes or result files
+- to_json() / from_json() store a sketch in a result file column
+- memory is O(k log(n/k)) regardless of how many values were seen
+"""
+
+import json
+import numpy as np
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch.
+    Level h holds items that each represent 2**h original values; a level that
+    outgrows its capacity is sorted and every other item (random offset) is
+    promoted to the next level.
+    """
+
+    def __init__(self, k: int = 200, seed: int = None):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Add a scalar or an array of values (NaNs are ignored)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.n += values.size
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                even = len(items) - len(items) % 2
+                offset = self._rng.integers(2)
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[offset:even:2]])
+                self.levels[level] = items[even:]  # odd item stays behind
+                level = 0  # capacities shift when the sketch grows; rescan
+                continue
+            level += 1
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lv), 2.0 ** h) for h, lv in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        """Approximate q-quantile(s), q in [0, 1]."""
+        if self.n == 0:
+            return np.nan
+        items, weights = self._weighted_items()
+        cum = np.cumsum(weights)
+        idx = np.searchsorted(cum, np.asarray(q, dtype=np.float64) * cum[-1], side="left")
+        result = items[np.clip(idx, 0, len(items) - 1)]
+        return float(result) if np.ndim(result) == 0 else result
+
+    def var(self, alpha: float = 0.95, tail: str = "lower") -> float:
+        """
+        Value at Risk at confidence alpha.
+        tail="lower": (1 - alpha) quantile (rewards / profits, as env cvar_95).
+        tail="upper": alpha quantile (losses).
+        """
+        return self.quantile(1 - alpha if tail == "lower" else alpha)
+
+    def cvar(self, alpha: float = 0.95, tail: str = "lower") -> float:
+        """Conditional VaR: weighted mean of the worst (1 - alpha) share of the stream."""
+        if self.n == 0:
+            return np.nan
+        items, weights = self._weighted_items()
+        if tail == "upper":
+            items, weights = items[::-1], weights[::-1]
+        target = max((1 - alpha) * weights.sum(), weights[0] * 1e-9)
+        # Whole items until the target weight is reached, then a fraction of the next
+        taken = np.minimum(weights, np.maximum(target - (np.cumsum(weights) - weights), 0.0))
+        return float((items * taken).sum() / taken.sum())
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold another sketch into this one (in place); the result summarizes both streams."""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    # -------------------------------------------------------------------------
+    # Serialization
+    # -------------------------------------------------------------------------
+    def to_dict(self) -> dict:
+        return {
+            "k": self.k,
+            "n": int(self.n),
+            "min": float(self.min) if self.n else None,
+            "max": float(self.max) if self.n else None,
+            "levels": [lv.tolist() for lv in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict, seed: int = None) -> "KLLSketch":
+        sketch = cls(k=state["k"], seed=seed)
+        sketch.n = state["n"]
+        if sketch.n:
+            sketch.min, sketch.max = state["min"], state["max"]
+        sketch.levels = [np.asarray(lv, dtype=np.float64) for lv in state["levels"]] or [np.empty(0)]
+        return sketch
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload: str, seed: int = None) -> "KLLSketch":
+        return cls.from_dict(json.loads(payload), seed=seed)
+
+    def __len__(self):
+        return self.n
+
+
+def merge_sketches(sketches, k: int = 200) -> KLLSketch:
+    """Merge an iterable of KLLSketch objects or their JSON strings (None / NaN entries are skipped)."""
+    merged = KLLSketch(k=k, seed=0)
+    for sketch in sketches:
+        if isinstance(sketch, str):
+            sketch = KLLSketch.from_json(sketch)
+        if isinstance(sketch, KLLSketch):
+            merged.merge(sketch)
+    return merged
@@ -0,0 +1,207 @@
+"""
+stress_scenarios.py
+
+Declarative stress scenario library for MARL simulation results.
+- Scenarios are declared once (kind + parameters + optional row filters such as
+  region / line_of_business) and stored in a registry
+- Parameter grids expand a registered scenario into many variants
+- run_scenario_grid evaluates every scenario against a results table in one
+  vectorized pass over row chunks, so memory stays bounded
+"""
+
+import itertools
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from marl_engine.stress_tests import DEFAULT_SCENARIO_PARAMS
+
+SCENARIO_KINDS = ("catastrophe", "capital_squeeze", "market_downturn")
+
+# Parameter defaults per kind: the built-in scenario severities of stress_tests.py, plus
+# correlation 0 (independent downturn shocks per row)
+KIND_DEFAULTS = {
+    **DEFAULT_SCENARIO_PARAMS,
+    "market_downturn": {**DEFAULT_SCENARIO_PARAMS["market_downturn"], "correlation": 0.0},
+}
+
+
+@dataclass(frozen=True)
+class StressScenario:
+    """
+    A named stress scenario.
+    kind: "catastrophe" (reward *= 1 - severity), "capital_squeeze"
+          (cvar_95 *= multiplier) or "market_downturn" (reward *= 1 + shock,
+          shocks share a common factor with weight `correlation`).
+    filters: {column: value or list of values}; only matching rows are stressed.
+    """
+    name: str
+    kind: str
+    params: Dict = field(default_factory=dict)
+    filters: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.kind not in SCENARIO_KINDS:
+            raise ValueError(f"Unknown scenario kind '{self.kind}'. Use one of {SCENARIO_KINDS}")
+        unknown = set(self.params) - set(KIND_DEFAULTS[self.kind])
+        if unknown:
+            raise KeyError(f"Unknown parameters for {self.kind}: {sorted(unknown)}")
+
+    def param(self, key):
+        return self.params.get(key, KIND_DEFAULTS[self.kind][key])
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+SCENARIO_REGISTRY: Dict[str, StressScenario] = {}
+
+
+def register_scenario(scenario: StressScenario, overwrite: bool = False) -> StressScenario:
+    """Add a scenario to the registry."""
+    if scenario.name in SCENARIO_REGISTRY and not overwrite:
+        raise KeyError(f"Scenario '{scenario.name}' already registered")
+    SCENARIO_REGISTRY[scenario.name] = scenario
+    return scenario
+
+
+def get_scenario(name: str) -> StressScenario:
+    if name not in SCENARIO_REGISTRY:
+        raise KeyError(f"Scenario '{name}' not registered. Available: {sorted(SCENARIO_REGISTRY)}")
+    return SCENARIO_REGISTRY[name]
+
+
+def scenario_grid(name: str, grid: Dict[str, List]) -> List[StressScenario]:
+    """
+    Expand a registered scenario over a grid of parameters and/or filter values.
+    Keys that are parameters of the scenario kind vary parameters; any other key
+    is treated as a filter column (e.g. {"severity": [0.3, 0.6], "region": ["US", "EU"]}).
+    """
+    base = get_scenario(name)
+    keys = sorted(grid)
+    variants = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params, filters = dict(base.params), dict(base.filters)
+        for key, value in zip(keys, values):
+            (params if key in KIND_DEFAULTS[base.kind] else filters)[key] = value
+        label = ",".join(f"{k}={v}" for k, v in zip(keys, values))
+        variants.append(StressScenario(f"{base.name}[{label}]", base.kind, params, filters))
+    return variants
+
+
+# Built-in scenarios: the three legacy stress tests plus regional / correlated variants
+for _kind, _params in DEFAULT_SCENARIO_PARAMS.items():
+    register_scenario(StressScenario(_kind, _kind, dict(_params)))
+register_scenario(StressScenario("us_property_cat", "catastrophe", {"severity": 0.8},
+                                 {"region": "US", "line_of_business": "Property"}))
+register_scenario(StressScenario("apac_cat", "catastrophe", {"severity": 0.7}, {"region": "APAC"}))
+register_scenario(StressScenario("correlated_downturn", "market_downturn",
+                                 {"volatility": 0.3, "drift": -0.15, "correlation": 0.6}))
+
+
+# -----------------------------
+# Vectorized Runner
+# -----------------------------
+def _filter_masks(chunk: pd.DataFrame, scenarios: List[StressScenario]):
+    """Row masks for each distinct filter set: (n_filter_sets, n_rows) plus index per scenario."""
+    keys, index = [], []
+    for sc in scenarios:
+        key = tuple(sorted((col, tuple(np.atleast_1d(v))) for col, v in sc.filters.items()))
+        if key not in keys:
+            keys.append(key)
+        index.append(keys.index(key))
+
+    masks = np.ones((len(keys), len(chunk)), dtype=bool)
+    for k, key in enumerate(keys):
+        for col, values in key:
+            if col not in chunk.columns:
+                raise KeyError(f"Scenario filter column '{col}' not in results table")
+            masks[k] &= chunk[col].isin(values).to_numpy()
+    return masks, np.asarray(index, dtype=np.intp)
+
+
+def run_scenario_grid(
+    results_df: pd.DataFrame,
+    scenarios: List[StressScenario] = None,
+    seed: int = 42,
+    max_cells: int = 5_000_000,
+) -> pd.DataFrame:
+    """
+    Evaluate scenarios against results_df (columns reward, cvar_95 and any filter columns).
+    Defaults to every registered scenario applicable to the table's columns.
+    Rows are processed in chunks of max_cells // n_scenarios so at most max_cells
+    stressed values are held at once. Returns a tidy table with one row per scenario.
+    """
+    if scenarios is None:
+        # Registered scenarios whose filter columns exist in this table
+        scenarios = [sc for sc in SCENARIO_REGISTRY.values() if set(sc.filters) <= set(results_df.columns)]
+    if not scenarios:  # nothing to evaluate: no pass over the rows, same columns, no rows
+        results_df = results_df.iloc[:0]
+    n_sc = len(scenarios)
+    kinds = np.array([sc.kind for sc in scenarios])
+    is_cat = kinds == "catastrophe"
+    is_squeeze = kinds == "capital_squeeze"
+    is_down = kinds == "market_downturn"
+
+    severity = np.array([sc.param("severity") if c else 0.0 for sc, c in zip(scenarios, is_cat)])
+    multiplier = np.array([sc.param("multiplier") if c else 1.0 for sc, c in zip(scenarios, is_squeeze)])
+    volatility = np.array([sc.param("volatility") if c else 0.0 for sc, c in zip(scenarios, is_down)])
+    drift = np.array([sc.param("drift") if c else 0.0 for sc, c in zip(scenarios, is_down)])
+    rho = np.array([sc.param("correlation") if c else 0.0 for sc, c in zip(scenarios, is_down)])
+
+    rng = np.random.default_rng(seed)
+    common = rng.normal(size=n_sc)  # market-wide factor per scenario
+
+    stats = {
+        "rows": np.zeros(n_sc), "affected_rows": np.zeros(n_sc),
+        "sum_reward": np.zeros(n_sc), "sum_base_reward": np.zeros(n_sc),
+        "min_reward": np.full(n_sc, np.inf), "sum_cvar": np.zeros(n_sc),
+        "max_cvar": np.full(n_sc, -np.inf), "sum_risk_adj": np.zeros(n_sc),
+    }
+
+    chunk_rows = max(1, max_cells // max(n_sc, 1))
+    for start in range(0, len(results_df), chunk_rows):
+        chunk = results_df.iloc[start:start + chunk_rows]
+        reward = chunk["reward"].to_numpy(dtype=np.float64)[None, :]
+        cvar_95 = chunk["cvar_95"].to_numpy(dtype=np.float64)[None, :]
+
+        masks, mask_index = _filter_masks(chunk, scenarios)
+        mask = masks[mask_index]  # (n_scenarios, n_rows)
+
+        shocks = drift[:, None] + volatility[:, None] * (
+            np.sqrt(rho)[:, None] * common[:, None]
+            + np.sqrt(1 - rho)[:, None] * rng.normal(size=mask.shape)
+        )
+        reward_mult = (1 - severity)[:, None] * (1 + shocks)
+        stressed_reward = reward * np.where(mask, reward_mult, 1.0)
+        stressed_cvar = cvar_95 * np.where(mask, multiplier[:, None], 1.0)
+
+        stats["rows"] += mask.shape[1]
+        stats["affected_rows"] += mask.sum(axis=1)
+        stats["sum_reward"] += stressed_reward.sum(axis=1)
+        stats["sum_base_reward"] += reward.sum()
+        stats["min_reward"] = np.minimum(stats["min_reward"], stressed_reward.min(axis=1))
+        stats["sum_cvar"] += stressed_cvar.sum(axis=1)
+        stats["max_cvar"] = np.maximum(stats["max_cvar"], stressed_cvar.max(axis=1))
+        stats["sum_risk_adj"] += (stressed_reward / (stressed_cvar + 1e-6)).sum(axis=1)
+
+    rows = np.maximum(stats["rows"], 1)
+    return pd.DataFrame({
+        "scenario": [sc.name for sc in scenarios],
+        "kind": kinds,
+        "filters": [",".join(f"{k}={v}" for k, v in sorted(sc.filters.items())) for sc in scenarios],
+        "severity": severity,
+        "multiplier": multiplier,
+        "volatility": volatility,
+        "drift": drift,
+        "correlation": rho,
+        "rows": stats["rows"].astype(int),
+        "affected_rows": stats["affected_rows"].astype(int),
+        "mean_reward": stats["sum_reward"] / rows,
+        "min_reward": stats["min_reward"],
+        "reward_change": stats["sum_reward"] - stats["sum_base_reward"],
+        "mean_cvar": stats["sum_cvar"] / rows,
+        "max_cvar": stats["max_cvar"],
+        "mean_risk_adj_return": stats["sum_risk_adj"] / rows,
+    })
@@ -1,6 +1,15 @@
 import numpy as np
 import pandas as pd
 
+from marl_engine.quantile_sketch import KLLSketch
+
+# Default severities of the built-in scenarios (see stress_scenarios.py for grids)
+DEFAULT_SCENARIO_PARAMS = {
+    "catastrophe": {"severity": 0.5},
+    "capital_squeeze": {"multiplier": 1.3},
+    "market_downturn": {"volatility": 0.3, "drift": -0.1},
+}
+
 def catastrophe_shock(profit, severity: float = 0.5):
     """
     Simulate a catastrophe event that reduces profit.
@@ -17,48 +26,286 @@ def capital_squeeze(cvar_95, multiplier: float = 1.3):
     return cvar_95 * multiplier
 
 
-def market_downturn(profit, volatility: float = 0.3):
+def market_downturn(profit, volatility: float = 0.3, rng: np.random.Generator = None, drift: float = -0.1):
     """
     Simulate market downturn with random negative shock.
     volatility: standard deviation for Gaussian drop.
+    profit may be a scalar or an array; one shock is drawn per element.
     """
-    shock = np.random.normal(loc=-0.1, scale=volatility)
+    rng = rng if rng is not None else np.random.default_rng()
+    shock = rng.normal(loc=drift, scale=volatility, size=np.shape(profit))
     return profit * (1 + shock)
 
 
-def run_stress_tests(results_df: pd.DataFrame):
+def _resolve_params(params: dict = None) -> dict:
+    return {kind: {**p, **(params or {}).get(kind, {})} for kind, p in DEFAULT_SCENARIO_PARAMS.items()}
+
+
+def _apply_stress(stress_df: pd.DataFrame, params: dict, rng: np.random.Generator) -> pd.DataFrame:
+    """Add stressed columns to stress_df in place (vectorized over its rows)."""
+    reward = stress_df["reward"].to_numpy(dtype=np.float64)
+    cvar_95 = stress_df["cvar_95"].to_numpy(dtype=np.float64)
+
+    # Scenario 1: Catastrophe Shock (default 50% profit loss)
+    stress_df["reward_cat"] = catastrophe_shock(reward, params["catastrophe"]["severity"])
+
+    # Scenario 2: Capital Squeeze (default CVaR +30%)
+    stress_df["cvar_squeeze"] = capital_squeeze(cvar_95, params["capital_squeeze"]["multiplier"])
+
+    # Scenario 3: Market Downturn (one shock per bid)
+    downturn = params["market_downturn"]
+    stress_df["reward_downturn"] = market_downturn(
+        reward, downturn["volatility"], rng=rng, drift=downturn["drift"]
+    )
+
+    # Compute Risk-Adjusted Return under stress
+    stress_df["risk_adj_return"] = stress_df["reward_cat"] / (stress_df["cvar_squeeze"] + 1e-6)
+    return stress_df
+
+
+def run_stress_tests(results_df: pd.DataFrame, seed: int = None, params: dict = None):
     """
     Apply multiple stress scenarios to simulation results.
     Input: DataFrame with columns [reward, cvar_95]
+    params: optional overrides of DEFAULT_SCENARIO_PARAMS, e.g. {"catastrophe": {"severity": 0.7}}
     Returns: DataFrame with stressed metrics
     """
-    stress_df = results_df.copy()
+    return _apply_stress(results_df.copy(), _resolve_params(params), np.random.default_rng(seed))
 
-    # Scenario 1: Catastrophe Shock (50% profit loss)
-    stress_df["reward_cat"] = stress_df["reward"].apply(lambda x: catastrophe_shock(x, 0.5))
 
-    # Scenario 2: Capital Squeeze (CVaR +30%)
-    stress_df["cvar_squeeze"] = stress_df["cvar_95"].apply(lambda x: capital_squeeze(x, 1.3))
+# -----------------------------
+# Streaming Summaries
+# -----------------------------
+# (reward column, cvar column) per scenario in the wide output of run_stress_tests
+STRESS_SCENARIO_COLUMNS = {
+    "baseline": ("reward", "cvar_95"),
+    "catastrophe": ("reward_cat", "cvar_95"),
+    "capital_squeeze": ("reward", "cvar_squeeze"),
+    "market_downturn": ("reward_downturn", "cvar_95"),
+    "catastrophe+capital_squeeze": ("reward_cat", "cvar_squeeze"),
+}
 
-    # Scenario 3: Market Downturn
-    stress_df["reward_downturn"] = stress_df["reward"].apply(lambda x: market_downturn(x, 0.3))
 
-    # Compute Risk-Adjusted Return under stress
-    stress_df["risk_adj_return"] = stress_df["reward_cat"] / (stress_df["cvar_squeeze"] + 1e-6)
+class StreamingStressSummary:
+    """
+    Incrementally maintained per-scenario statistics over stressed result chunks:
+    counts, sums, minima/maxima and a KLL sketch of stressed rewards for VaR/CVaR.
+    Memory does not grow with the number of rows; summaries from workers merge().
+    """
 
-    return stress_df
+    def __init__(self, tail_alpha: float = 0.95, sketch_k: int = 200):
+        self.tail_alpha = tail_alpha
+        self.episodes = set()
+        self.stats = {
+            name: {
+                "rows": 0, "sum_reward": 0.0, "min_reward": np.inf, "reward_change": 0.0,
+                "sum_cvar": 0.0, "max_cvar": -np.inf, "sum_risk_adj": 0.0,
+                "sketch": KLLSketch(k=sketch_k, seed=0),
+            }
+            for name in STRESS_SCENARIO_COLUMNS
+        }
 
+    def update(self, stress_df: pd.DataFrame):
+        """Fold one chunk of run_stress_tests output into the summary."""
+        if len(stress_df) == 0:
+            return self
+        base = stress_df["reward"].to_numpy(dtype=np.float64)
+        for name, (reward_col, cvar_col) in STRESS_SCENARIO_COLUMNS.items():
+            reward = stress_df[reward_col].to_numpy(dtype=np.float64)
+            cvar = stress_df[cvar_col].to_numpy(dtype=np.float64)
+            st = self.stats[name]
+            st["rows"] += len(reward)
+            st["sum_reward"] += reward.sum()
+            st["min_reward"] = min(st["min_reward"], reward.min())
+            st["reward_change"] += (reward - base).sum()
+            st["sum_cvar"] += cvar.sum()
+            st["max_cvar"] = max(st["max_cvar"], cvar.max())
+            st["sum_risk_adj"] += (reward / (cvar + 1e-6)).sum()
+            st["sketch"].update(reward)
+        if "episode" in stress_df.columns:
+            self.episodes.update(stress_df["episode"].unique().tolist())
+        return self
 
-def summarize_stress_results(stress_df: pd.DataFrame):
+    def merge(self, other: "StreamingStressSummary"):
+        """Combine with a summary built by another worker over different rows."""
+        for name, st in self.stats.items():
+            ot = other.stats[name]
+            for key in ("rows", "sum_reward", "reward_change", "sum_cvar", "sum_risk_adj"):
+                st[key] += ot[key]
+            st["min_reward"] = min(st["min_reward"], ot["min_reward"])
+            st["max_cvar"] = max(st["max_cvar"], ot["max_cvar"])
+            st["sketch"].merge(ot["sketch"])
+        self.episodes |= other.episodes
+        return self
+
+    def to_frame(self) -> pd.DataFrame:
+        """Tidy per-scenario table."""
+        pct = int(round(self.tail_alpha * 100))
+        rows = []
+        for name, st in self.stats.items():
+            n = max(st["rows"], 1)
+            rows.append({
+                "scenario": name,
+                "rows": st["rows"],
+                "mean_reward": st["sum_reward"] / n,
+                "min_reward": st["min_reward"],
+                f"reward_var_{pct}": st["sketch"].var(self.tail_alpha),
+                f"reward_cvar_{pct}": st["sketch"].cvar(self.tail_alpha),
+                "reward_change": st["reward_change"],
+                "mean_cvar": st["sum_cvar"] / n,
+                "max_cvar": st["max_cvar"],
+                "mean_risk_adj_return": st["sum_risk_adj"] / n,
+                "episodes": len(self.episodes) if self.episodes else None,
+                "reward_sketch": st["sketch"].to_json(),
+            })
+        return pd.DataFrame(rows)
+
+
+def _iter_parquet_chunks(path: str, batch_size: int, columns=None):
+    """Yield DataFrame chunks from a Parquet file or dataset directory (row-group streaming)."""
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(path, format="parquet")
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        yield batch.to_pandas()
+
+
+def run_stress_tests_streaming(
+    results_path: str,
+    output_path: str = None,
+    seed: int = None,
+    params: dict = None,
+    batch_size: int = 65_536,
+    tail_alpha: float = 0.95,
+    run_id: str = None,
+) -> StreamingStressSummary:
+    """
+    Stream simulation results from Parquet in chunks, stress each chunk and
+    update the summary incrementally. Stressed rows are optionally written to
+    output_path (one Parquet row group per chunk). Memory is bounded by batch_size.
+    With run_id, stressed chunks are instead appended to the partitioned
+    simulation_stressed dataset of the data lake (at output_path if given).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from datalake.lake import write_dataset
+
+    params = _resolve_params(params)
+    rng = np.random.default_rng(seed)
+    summary = StreamingStressSummary(tail_alpha=tail_alpha)
+    writer = None
+    try:
+        for chunk in _iter_parquet_chunks(results_path, batch_size):
+            stressed = _apply_stress(chunk, params, rng)
+            summary.update(stressed)
+            if run_id is not None:
+                write_dataset(stressed.assign(run_id=run_id), "simulation_stressed", path=output_path)
+            elif output_path:
+                table = pa.Table.from_pandas(stressed, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return summary
+
+
+def summarize_stress_results(stress_df) -> pd.DataFrame:
     """
     Aggregate stress test results for dashboard or reporting.
+    Returns a tidy table with one row per scenario. Accepts the wide output of
+    run_stress_tests, the (already tidy) output of stress_scenarios.run_scenario_grid,
+    a StreamingStressSummary, or a path to stressed results in Parquet (streamed
+    in chunks, so any size works in bounded memory).
+    """
+    if isinstance(stress_df, StreamingStressSummary):
+        return stress_df.to_frame()
+    if isinstance(stress_df, str):
+        summary = StreamingStressSummary()
+        for chunk in _iter_parquet_chunks(stress_df, 65_536):
+            summary.update(chunk)
+        return summary.to_frame()
+    if "scenario" in stress_df.columns:
+        return stress_df.reset_index(drop=True)
+    return StreamingStressSummary().update(stress_df).to_frame()
+
+
+# -----------------------------
+# Monte Carlo Stress Engine
+# -----------------------------
+def _lower_tail(values: np.ndarray, alpha: float):
+    """Row-wise VaR (lower (1-alpha) quantile) and CVaR (mean at or below VaR) of a 2-D array."""
+    var = np.quantile(values, 1 - alpha, axis=1)
+    in_tail = values <= var[:, None]
+    cvar = (values * in_tail).sum(axis=1) / np.maximum(in_tail.sum(axis=1), 1)
+    return var, cvar
+
+
+def run_monte_carlo_stress(
+    results_df: pd.DataFrame,
+    n_scenarios: int = 1000,
+    cat_probability: float = 0.1,
+    cat_severity: float = 0.5,
+    squeeze_multiplier: float = 1.3,
+    volatility: float = 0.3,
+    drift: float = -0.1,
+    alpha: float = 0.95,
+    seed: int = 42,
+    chunk_size: int = 1000,
+) -> pd.DataFrame:
     """
-    summary = {
-        "mean_reward_post_cat": stress_df["reward_cat"].mean(),
-        "mean_reward_downturn": stress_df["reward_downturn"].mean(),
-        "mean_cvar_squeezed": stress_df["cvar_squeeze"].mean(),
-        "mean_risk_adj_return": stress_df["risk_adj_return"].mean(),
-        "max_cvar_squeezed": stress_df["cvar_squeeze"].max(),
-        "episodes": stress_df["episode"].nunique() if "episode" in stress_df.columns else None
+    Evaluate thousands of stochastic stress scenarios over all bids at once.
+
+    Each scenario draws one portfolio-wide catastrophe event (probability
+    cat_probability, profit loss cat_severity) and a market-downturn shock per bid.
+    Shocks for a block of scenarios form an (n_scenarios, n_rows) matrix drawn
+    from a seeded Generator and applied with broadcast NumPy ops; chunk_size
+    scenarios are held in memory at a time. The result is identical for any
+    chunk_size given the same seed.
+
+    Returns: one row per scenario with the mean, VaR and CVaR of stressed rewards,
+    the portfolio total, and the mean risk-adjusted return.
+    """
+    reward = results_df["reward"].to_numpy(dtype=np.float64)
+    cvar_95 = results_df["cvar_95"].to_numpy(dtype=np.float64)
+    squeezed = capital_squeeze(cvar_95, squeeze_multiplier)
+
+    rng = np.random.default_rng(seed)
+    cat_hit = rng.random(n_scenarios) < cat_probability
+
+    frames = []
+    for start in range(0, n_scenarios, chunk_size):
+        stop = min(start + chunk_size, n_scenarios)
+        shocks = rng.normal(loc=drift, scale=volatility, size=(stop - start, len(reward)))
+        cat_factor = np.where(cat_hit[start:stop], 1 - cat_severity, 1.0)[:, None]
+
+        stressed = reward[None, :] * cat_factor * (1 + shocks)
+        var, cvar = _lower_tail(stressed, alpha)
+
+        frames.append(pd.DataFrame({
+            "scenario": np.arange(start, stop),
+            "cat_event": cat_hit[start:stop],
+            "mean_reward": stressed.mean(axis=1),
+            "total_reward": stressed.sum(axis=1),
+            f"reward_var_{int(alpha * 100)}": var,
+            f"reward_cvar_{int(alpha * 100)}": cvar,
+            "mean_risk_adj_return": (stressed / (squeezed[None, :] + 1e-6)).mean(axis=1),
+        }))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_monte_carlo(scenario_df: pd.DataFrame, alpha: float = 0.95):
+    """
+    Distributional summary across Monte Carlo scenarios (portfolio total reward).
+    """
+    totals = scenario_df["total_reward"].to_numpy()
+    var, cvar = _lower_tail(totals[None, :], alpha)
+    return {
+        "scenarios": len(scenario_df),
+        "mean_total_reward": totals.mean(),
+        f"var_{int(alpha * 100)}_total_reward": var[0],
+        f"cvar_{int(alpha * 100)}_total_reward": cvar[0],
+        "prob_portfolio_loss": (totals < 0).mean(),
+        "cat_event_rate": scenario_df["cat_event"].mean(),
     }
-    return summary
@@ -0,0 +1,294 @@
+"""
+sweep.py
+
+Parallel hyperparameter sweeps for MAPPO treaty bidding simulations.
+- Expands a parameter grid (risk_aversion, clip_ratio, gamma, lam, num_agents, ...)
+- Gives every run an independent seed derived from np.random.SeedSequence
+- Fans runs out over a process pool
+- Writes per-run results to a Parquet dataset partitioned by run_id
+- Resumes: runs with a _SUCCESS marker are skipped, failed runs are retried
+- Stores a reward quantile sketch per run; sketches merge into sweep-wide VaR/CVaR
+"""
+
+import os
+import json
+import hashlib
+import itertools
+import traceback
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from marl_engine.columnar_log import ColumnarLogger, EPISODE_SCHEMA
+from marl_engine.quantile_sketch import KLLSketch, merge_sketches
+
+# -----------------------------------------------------------------------------
+# Defaults
+# -----------------------------------------------------------------------------
+DEFAULT_CONFIG = {
+    "num_agents": 3,
+    "obs_dim": 6,
+    "max_steps": 20,
+    "num_episodes": 10,
+    "train_epochs": 2,
+    "gamma": 0.99,
+    "lam": 0.95,
+    "clip_ratio": 0.2,
+    "risk_aversion": 0.0,
+}
+
+SUCCESS_MARKER = "_SUCCESS"
+STATUS_FILE = "_sweep_status.csv"
+SKETCH_FILE = "_reward_sketch.json"  # "_" prefix: ignored by Parquet dataset readers
+
+
+# -----------------------------------------------------------------------------
+# Single MAPPO Run
+# -----------------------------------------------------------------------------
+def run_mappo_simulation(
+    num_agents: int = 3,
+    obs_dim: int = 6,
+    max_steps: int = 20,
+    num_episodes: int = 10,
+    train_epochs: int = 2,
+    gamma: float = 0.99,
+    lam: float = 0.95,
+    clip_ratio: float = 0.2,
+    risk_aversion: float = 0.0,
+    seed: int = 42,
+    verbose: bool = True,
+    episode_logger: ColumnarLogger = None,
+    step_logger: ColumnarLogger = None,
+    reward_sketch: KLLSketch = None,
+) -> pd.DataFrame:
+    """
+    Run MAPPO training/simulation in the TreatyBiddingEnv for one configuration.
+    risk_aversion penalizes the per-step CVaR in the rewards stored for PPO updates.
+    episode_logger (EPISODE_SCHEMA) / step_logger (STEP_SCHEMA) stream KPIs to
+    Parquet; without an episode_logger the KPIs are buffered in memory.
+    reward_sketch, if given, accumulates every step reward of the run (KLLSketch).
+    Returns: DataFrame of episode-level KPIs.
+    """
+    import torch
+    from marl_engine.envs.treaty_env import TreatyBiddingEnv
+    from marl_engine.agents.mappo_agent import MAPPOAgent
+
+    torch.manual_seed(seed)
+    action_dim = 1  # Each agent outputs a single bid
+    env = TreatyBiddingEnv(num_agents=num_agents, obs_dim=obs_dim, max_steps=max_steps, random_seed=seed)
+    agent = MAPPOAgent(
+        num_agents=num_agents, obs_dim=obs_dim, action_dim=action_dim,
+        gamma=gamma, lam=lam, clip_ratio=clip_ratio, device="cpu"
+    )
+
+    if episode_logger is None:
+        episode_logger = ColumnarLogger(None, EPISODE_SCHEMA, chunk_size=max(num_episodes, 1))
+    agent_index = np.arange(num_agents, dtype=np.int32)
+
+    for episode in range(1, num_episodes + 1):
+        obs, info = env.reset()
+        terminated, truncated = False, False
+
+        while not (terminated or truncated):
+            # (num_agents, action_dim) -> one bid per agent for the env
+            actions = agent.select_actions(obs).reshape(num_agents)
+            next_obs, rewards, terminated, truncated, info = env.step(actions)
+
+            # CVaR-aware reward shaping
+            shaped = rewards - risk_aversion * abs(info["cvar_95"])
+            agent.store_transition(obs, actions, shaped, next_obs, terminated)
+            obs = next_obs
+
+            if step_logger is not None:
+                step_logger.log_batch(
+                    round=episode, step=info["step"], agent=agent_index,
+                    action=actions, reward=rewards, cvar_95=info["cvar_95"]
+                )
+
+        agent.update(epochs=train_epochs)
+        if reward_sketch is not None:
+            reward_sketch.merge(env.reward_sketch)
+
+        episode_logger.log(
+            round=episode,
+            avg_profit=info.get("avg_profit", np.nan),
+            win_rate=info.get("win_rate", np.nan),
+            cvar_95=info.get("cvar_95", np.nan),
+            timestamp=datetime.utcnow()
+        )
+
+        if verbose:
+            print(f"[EP {episode}] Profit={info.get('avg_profit', 0):.2f} | WinRate={info.get('win_rate', 0):.2f}")
+
+    return episode_logger.to_pandas()
+
+
+# -----------------------------------------------------------------------------
+# Grid & Seeds
+# -----------------------------------------------------------------------------
+def expand_grid(grid: Dict[str, List], base_config: Dict = None) -> List[Dict]:
+    """
+    Expand {param: [values]} into a list of full run configs (cartesian product).
+    Parameters not in the grid are taken from base_config / DEFAULT_CONFIG.
+    Values are coerced to the default's type so 0 and 0.0 give the same run.
+    """
+    base = {**DEFAULT_CONFIG, **(base_config or {})}
+    unknown = set(grid) - set(base)
+    if unknown:
+        raise KeyError(f"Unknown sweep parameters: {sorted(unknown)}")
+
+    keys = sorted(grid)
+    configs = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        overrides = {k: type(base[k])(v) for k, v in zip(keys, values)}
+        configs.append({**base, **overrides})
+    return configs
+
+
+def run_id_for(config: Dict) -> str:
+    """Stable short id for a run config (independent of grid order)."""
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def derive_seeds(configs: List[Dict], base_seed: int = 42) -> Dict[str, int]:
+    """
+    Derive an independent seed per run from np.random.SeedSequence.
+    The spawn key is derived from the run id, so a run keeps its seed when the
+    grid is extended or reordered.
+    """
+    seeds = {}
+    for config in configs:
+        run_id = run_id_for(config)
+        child = np.random.SeedSequence(base_seed, spawn_key=(int(run_id, 16),))
+        seeds[run_id] = int(child.generate_state(1)[0])
+    return seeds
+
+
+# -----------------------------------------------------------------------------
+# Worker
+# -----------------------------------------------------------------------------
+def _run_partition_dir(output_dir: str, run_id: str) -> str:
+    return os.path.join(output_dir, f"run_id={run_id}")
+
+
+def is_run_complete(output_dir: str, run_id: str) -> bool:
+    return os.path.exists(os.path.join(_run_partition_dir(output_dir, run_id), SUCCESS_MARKER))
+
+
+def _execute_run(config: Dict, run_id: str, seed: int, output_dir: str) -> Dict:
+    """Run one configuration in a worker process and write its partition."""
+    import torch
+    torch.set_num_threads(1)  # one process per core; avoid thread oversubscription
+
+    start = datetime.utcnow()
+    try:
+        sketch = KLLSketch(seed=seed)
+        df = run_mappo_simulation(**config, seed=seed, verbose=False, reward_sketch=sketch)
+        for key, value in config.items():
+            df[key] = value
+        df["seed"] = seed
+
+        part_dir = _run_partition_dir(output_dir, run_id)
+        os.makedirs(part_dir, exist_ok=True)
+        tmp_path = os.path.join(part_dir, ".part-0.parquet.tmp")  # hidden from dataset readers
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(part_dir, "part-0.parquet"))
+        with open(os.path.join(part_dir, SKETCH_FILE), "w") as f:
+            f.write(sketch.to_json())
+        open(os.path.join(part_dir, SUCCESS_MARKER), "w").close()
+        status, error = "success", ""
+    except Exception:
+        status, error = "failed", traceback.format_exc(limit=3)
+
+    return {
+        "run_id": run_id,
+        "seed": seed,
+        "status": status,
+        "error": error,
+        "seconds": (datetime.utcnow() - start).total_seconds(),
+        **config,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Sweep Runner
+# -----------------------------------------------------------------------------
+def run_sweep(
+    grid: Dict[str, List],
+    output_dir: str,
+    base_config: Dict = None,
+    base_seed: int = 42,
+    max_workers: int = None,
+    resume: bool = True,
+) -> pd.DataFrame:
+    """
+    Run every configuration of the grid over a process pool.
+    Results land in output_dir/run_id=<id>/part-0.parquet; read them back with
+    pd.read_parquet(output_dir). Returns the status table of this invocation.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    configs = expand_grid(grid, base_config)
+    seeds = derive_seeds(configs, base_seed)
+
+    pending = []
+    skipped = []
+    for config in configs:
+        run_id = run_id_for(config)
+        if resume and is_run_complete(output_dir, run_id):
+            skipped.append({"run_id": run_id, "seed": seeds[run_id], "status": "skipped",
+                            "error": "", "seconds": 0.0, **config})
+        else:
+            pending.append((config, run_id))
+
+    print(f"🎬 Sweep: {len(configs)} runs ({len(pending)} pending, {len(skipped)} already complete)")
+
+    statuses = list(skipped)
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(_execute_run, config, run_id, seeds[run_id], output_dir)
+            for config, run_id in pending
+        ]
+        for future in as_completed(futures):
+            status = future.result()
+            statuses.append(status)
+            mark = "✅" if status["status"] == "success" else "❌"
+            print(f"{mark} run {status['run_id']} ({status['seconds']:.1f}s)")
+
+    status_df = pd.DataFrame(statuses)
+    status_df.to_csv(os.path.join(output_dir, STATUS_FILE), index=False)
+
+    n_failed = int((status_df["status"] == "failed").sum()) if not status_df.empty else 0
+    if n_failed:
+        print(f"⚠️ {n_failed} runs failed; rerun the sweep to retry them.")
+    return status_df
+
+
+def load_sweep_results(output_dir: str) -> pd.DataFrame:
+    """Load all completed runs of a sweep (partition column: run_id)."""
+    if not os.path.isdir(output_dir):
+        raise FileNotFoundError(f"Sweep results not found at {output_dir}")
+    return pd.read_parquet(output_dir)
+
+
+def load_sweep_tail_risk(output_dir: str, alpha: float = 0.95) -> pd.DataFrame:
+    """
+    Reward VaR/CVaR per completed run from the stored sketches, plus an "all" row
+    for the whole sweep (sketches merged; no step rewards are loaded).
+    """
+    sketches = {}
+    for name in sorted(os.listdir(output_dir)):
+        path = os.path.join(output_dir, name, SKETCH_FILE)
+        if name.startswith("run_id=") and os.path.exists(path):
+            with open(path) as f:
+                sketches[name.split("=", 1)[1]] = KLLSketch.from_json(f.read())
+
+    sketches["all"] = merge_sketches(sketches.values())
+    pct = int(round(alpha * 100))
+    return pd.DataFrame([
+        {"run_id": run_id, "steps": len(sk), f"reward_var_{pct}": sk.var(alpha), f"reward_cvar_{pct}": sk.cvar(alpha)}
+        for run_id, sk in sketches.items()
+    ])
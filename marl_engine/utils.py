@@ -1,16 +1,22 @@
 import os
 import pandas as pd
 
+from marl_engine.quantile_sketch import KLLSketch, merge_sketches
+
 # -----------------------------
 # Logging & Result Management
 # -----------------------------
 
-def compute_episode_summary(results_df: pd.DataFrame):
+def compute_episode_summary(results_df: pd.DataFrame, sketch: KLLSketch = None):
     """
     Compute summary KPIs for a single MARL simulation episode.
     Expects columns: ['reward', 'cvar_95']
+    sketch: reward sketch of the episode (built from results_df["reward"] if not given);
+            stored as JSON so episode tails can be merged later (see summarize_tail_risk).
     Returns: dict of summary metrics
     """
+    if sketch is None:
+        sketch = KLLSketch(seed=0).update(results_df["reward"].to_numpy())
     return {
         "avg_profit": results_df["reward"].mean(),
         "avg_cvar": results_df["cvar_95"].mean(),
@@ -20,15 +26,34 @@ def compute_episode_summary(results_df: pd.DataFrame):
         "max_profit": results_df["reward"].max(),
         "n_agents": results_df["agent_id"].nunique() if "agent_id" in results_df.columns else None,
         "episode": results_df["episode"].iloc[0] if "episode" in results_df.columns else None,
+        "reward_var_95": sketch.var(0.95),
+        "reward_cvar_95": sketch.cvar(0.95),
+        "reward_sketch": sketch.to_json(),
     }
 
 
+def summarize_tail_risk(summary_df: pd.DataFrame, alpha: float = 0.95):
+    """
+    Reward VaR/CVaR over all episodes by merging their stored sketches
+    (no per-bid results needed). Returns None if summaries carry no sketches.
+    """
+    if "reward_sketch" not in summary_df.columns:
+        return None
+    sketch = merge_sketches(summary_df["reward_sketch"].dropna())
+    pct = int(round(alpha * 100))
+    return {"rewards": len(sketch), f"reward_var_{pct}": sketch.var(alpha), f"reward_cvar_{pct}": sketch.cvar(alpha)}
+
+
 def save_results(results_df: pd.DataFrame, filepath: str):
     """
-    Save simulation or stress test results to CSV.
+    Save simulation or stress test results to CSV, or Parquet if filepath ends with .parquet.
+    For long runs, stream rows with marl_engine.columnar_log.ColumnarLogger instead.
     """
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    results_df.to_csv(filepath, index=False)
+    if filepath.endswith(".parquet"):
+        results_df.to_parquet(filepath, index=False)
+    else:
+        results_df.to_csv(filepath, index=False)
     print(f"✅ Saved results to {filepath} ({len(results_df)} rows)")
 
 
@@ -43,21 +68,31 @@ def save_episode_summaries(episode_summaries: list, filepath: str):
     return summary_df
 
 
-def load_simulation_results(run_path: str, summary_path: str = None):
+def load_simulation_results(run_path: str, summary_path: str = None, columns=None, filters=None):
     """
-    Load simulation runs and (optionally) summary CSVs.
+    Load simulation runs and (optionally) summary CSVs or Parquet files/datasets.
+    columns / filters (e.g. [("run_id", "=", run_id), ("agent_id", "=", "A3")]) are
+    pushed down to partitions and row groups of Parquet datasets.
     """
     if not os.path.exists(run_path):
         raise FileNotFoundError(f"Simulation results not found at {run_path}")
-    results_df = pd.read_csv(run_path)
+    results_df = _read_table(run_path, columns, filters)
 
     summary_df = None
     if summary_path and os.path.exists(summary_path):
-        summary_df = pd.read_csv(summary_path)
+        summary_df = _read_table(summary_path)
 
     return results_df, summary_df
 
 
+def _read_table(path: str, columns=None, filters=None) -> pd.DataFrame:
+    if path.endswith(".csv"):
+        if filters is not None:
+            raise ValueError(f"filters need a Parquet file or dataset, not {path}")
+        return pd.read_csv(path, usecols=columns)
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
 # -----------------------------
 # Utility Functions for YC Demo
 # -----------------------------
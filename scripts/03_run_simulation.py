@@ -8,75 +8,64 @@ and outputs KPIs for MarketLens + Streamlit integration.
 
 import os
 import sys
-import numpy as np
-import pandas as pd
-from datetime import datetime
 
-# Add marl_engine to path
+# Add project root to path
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-ENGINE_DIR = os.path.join(BASE_DIR, "..", "marl_engine")
-sys.path.append(ENGINE_DIR)
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+sys.path.append(PROJECT_ROOT)
 
-from envs.treaty_env import TreatyBiddingEnv
-from agents.mappo_agent import MAPPOAgent
+from marl_engine.sweep import run_mappo_simulation
+from marl_engine.columnar_log import ColumnarLogger, EPISODE_SCHEMA, STEP_SCHEMA
 
 # Output path
 OUTPUT_DIR = os.path.join(BASE_DIR, "..", "data", "processed")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Parquet datasets (directories of part files) so the dashboard can read them mid-run
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, "simulation_results.parquet")
+STEP_LOG_DIR = os.path.join(OUTPUT_DIR, "simulation_steps.parquet")
 
 
 # -----------------------------------------------------------------------------
 # Run Simulation with MAPPO
 # -----------------------------------------------------------------------------
-def run_simulation(num_episodes: int = 10, train_epochs: int = 2, max_steps: int = 20):
+def run_simulation(
+    num_episodes: int = 10,
+    train_epochs: int = 2,
+    max_steps: int = 20,
+    num_agents: int = 3,
+    gamma: float = 0.99,
+    lam: float = 0.95,
+    clip_ratio: float = 0.2,
+    risk_aversion: float = 0.0,
+    seed: int = 42,
+    log_steps: bool = True,
+):
     """
     Runs MAPPO training/simulation for num_episodes and saves results.
+    Episode KPIs (and per-step outcomes if log_steps) are flushed to Parquet while running.
+    For hyperparameter grids use scripts/06_run_sweep.py.
     """
-    num_agents = 3
-    obs_dim = 6
-    action_dim = 1  # Each agent outputs a single bid
-    env = TreatyBiddingEnv(num_agents=num_agents, obs_dim=obs_dim, max_steps=max_steps)
+    # Flush episode KPIs in small parts so the dashboard sees live learning curves
+    episode_logger = ColumnarLogger(OUTPUT_FILE, EPISODE_SCHEMA, chunk_size=10)
+    step_logger = ColumnarLogger(STEP_LOG_DIR, STEP_SCHEMA) if log_steps else None
+
+    df_results = run_mappo_simulation(
+        num_agents=num_agents,
+        max_steps=max_steps,
+        num_episodes=num_episodes,
+        train_epochs=train_epochs,
+        gamma=gamma,
+        lam=lam,
+        clip_ratio=clip_ratio,
+        risk_aversion=risk_aversion,
+        seed=seed,
+        episode_logger=episode_logger,
+        step_logger=step_logger,
+    )
+    if step_logger is not None:
+        step_logger.close()
+        print(f"[INFO] Step log saved to {STEP_LOG_DIR} ({step_logger.rows_written} rows)")
 
-    # Initialize MAPPO agent
-    agent = MAPPOAgent(num_agents=num_agents, obs_dim=obs_dim, action_dim=action_dim, device="cpu")
-
-    results = []
-
-    for episode in range(1, num_episodes + 1):
-        obs, info = env.reset()
-        terminated, truncated = False, False
-
-        while not (terminated or truncated):
-            # MAPPO selects actions for all agents
-            actions = agent.select_actions(obs)
-
-            # Step in environment
-            next_obs, rewards, terminated, truncated, info = env.step(actions)
-
-            # Store transition in MAPPO buffer
-            agent.store_transition(obs, actions, rewards, next_obs, terminated)
-
-            obs = next_obs
-
-        # Perform MAPPO update after each episode (or batch)
-        agent.update(epochs=train_epochs)
-
-        # Collect KPIs at episode end
-        results.append({
-            "round": episode,
-            "avg_profit": info.get("avg_profit", np.nan),
-            "win_rate": info.get("win_rate", np.nan),
-            "cvar_95": info.get("cvar_95", np.nan),
-            "timestamp": datetime.utcnow()
-        })
-
-        print(f"[EP {episode}] Profit={info.get('avg_profit', 0):.2f} | WinRate={info.get('win_rate', 0):.2f}")
-
-    df_results = pd.DataFrame(results)
-
-    # Save to parquet for Streamlit dashboard
-    df_results.to_parquet(OUTPUT_FILE, index=False)
     print(f"[INFO] Simulation results saved to {OUTPUT_FILE}")
 
     return df_results
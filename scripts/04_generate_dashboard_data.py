@@ -48,8 +48,14 @@ def aggregate_dashboard_data():
     # Merge MarketLens data if available
     marketlens_df = pd.DataFrame()
     if not features_df.empty and not labels_df.empty:
-        marketlens_df = features_df.copy()
-        marketlens_df = marketlens_df.merge(labels_df, on="treaty_id", how="left")
+        if "treaty_id" in features_df.columns and "treaty_id" in labels_df.columns:
+            marketlens_df = features_df.merge(labels_df, on="treaty_id", how="left")
+        elif len(features_df) == len(labels_df):
+            # marketlens/preprocess.py writes features and labels row-aligned, without an id column
+            marketlens_df = pd.concat([features_df.reset_index(drop=True), labels_df.reset_index(drop=True)], axis=1)
+        else:
+            raise ValueError(f"❌ MarketLens features ({len(features_df)} rows) and labels ({len(labels_df)} rows) "
+                             "have no treaty_id to join on and are not row-aligned")
     
     # Compute MarketLens KPIs if available
     marketlens_summary = {}
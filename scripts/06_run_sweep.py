@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+06_run_sweep.py
+
+Runs a MAPPO hyperparameter sweep in parallel.
+- Expands a grid over risk_aversion, clip_ratio, gamma, lam and num_agents
+- Seeds each run independently via np.random.SeedSequence
+- Writes per-run results to a Parquet dataset partitioned by run_id
+- Re-running the same command resumes: completed runs are skipped, failed runs retried
+"""
+
+import os
+import sys
+import argparse
+import logging
+from datetime import datetime
+
+# Optional: Load config
+import yaml
+
+# Add project root to path
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+sys.path.append(PROJECT_ROOT)
+
+from marl_engine.sweep import run_sweep, load_sweep_tail_risk
+
+SWEEP_PARAMS = ["risk_aversion", "clip_ratio", "gamma", "lam", "num_agents"]
+
+
+# ---------------------------------------------------------------------
+# Utility Functions
+# ---------------------------------------------------------------------
+
+def setup_logger(log_dir: str = "outputs/logs", script_name: str = "06_run_sweep"):
+    """Initialize a logger for the script."""
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, f"{script_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    logging.getLogger().addHandler(logging.StreamHandler())  # Also log to console
+    logging.info(f"Logger initialized. Output -> {log_file}")
+
+
+# ---------------------------------------------------------------------
+# Main CLI Entry
+# ---------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a parallel MAPPO hyperparameter sweep.")
+    parser.add_argument("--risk_aversion", type=float, nargs="+", default=[0.0, 0.1, 0.2])
+    parser.add_argument("--clip_ratio", type=float, nargs="+", default=[0.1, 0.2])
+    parser.add_argument("--gamma", type=float, nargs="+", default=[0.99])
+    parser.add_argument("--lam", type=float, nargs="+", default=[0.95])
+    parser.add_argument("--num_agents", type=int, nargs="+", default=[3])
+    parser.add_argument("--episodes", type=int, default=10, help="Episodes per run")
+    parser.add_argument("--max_steps", type=int, default=20, help="Steps per episode")
+    parser.add_argument("--seed", type=int, default=42, help="Base seed for the SeedSequence")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: all cores)")
+    parser.add_argument("--output_dir", type=str, default="data/processed/sweeps", help="Partitioned Parquet output")
+    parser.add_argument("--no_resume", action="store_true", help="Rerun runs that already completed")
+    parser.add_argument("--config", type=str, default=None, help="Optional YAML config with a 'sweep_grid' mapping")
+    args = parser.parse_args()
+
+    setup_logger()
+
+    grid = {name: getattr(args, name) for name in SWEEP_PARAMS}
+    base_seed = args.seed
+    output_dir = args.output_dir
+    if args.config and os.path.exists(args.config):
+        with open(args.config, "r") as f:
+            config = yaml.safe_load(f)
+        grid.update(config.get("sweep_grid", {}))
+        base_seed = config.get("random_seed", base_seed)
+        output_dir = config.get("sweep_output_dir", output_dir)
+        logging.info(f"Config loaded from {args.config}")
+
+    base_config = {"num_episodes": args.episodes, "max_steps": args.max_steps}
+    logging.info(f"Sweep grid: {grid}")
+
+    status_df = run_sweep(
+        grid,
+        output_dir=output_dir,
+        base_config=base_config,
+        base_seed=base_seed,
+        max_workers=args.workers,
+        resume=not args.no_resume,
+    )
+
+    counts = status_df["status"].value_counts().to_dict()
+    logging.info(f"Sweep finished: {counts}. Results -> {output_dir}")
+
+    tail_df = load_sweep_tail_risk(output_dir)
+    logging.info(f"Reward tail risk (merged sketches):\n{tail_df.to_string(index=False)}")
+
+
+if __name__ == "__main__":
+    main()
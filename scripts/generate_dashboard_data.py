@@ -1,7 +1,14 @@
 import os
+import sys
 import numpy as np
 import pandas as pd
 
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from marl_engine.utils import summarize_tail_risk
+from datalake.lake import read_dataset, exists, partition_values
+
 # -----------------------------
 # Paths
 # -----------------------------
@@ -10,9 +17,10 @@ DATA_PROCESSED = os.path.join(PROJECT_ROOT, "data", "processed")
 DATA_DEMO = os.path.join(PROJECT_ROOT, "data", "demo")
 os.makedirs(DATA_DEMO, exist_ok=True)
 
-SIM_RUNS_PATH = os.path.join(DATA_PROCESSED, "simulation_runs.csv")
+SIM_RUNS_PATH = os.path.join(DATA_PROCESSED, "simulation_runs.csv")  # legacy; the data lake is preferred
 SIM_SUMMARY_PATH = os.path.join(DATA_PROCESSED, "simulation_summary.csv")
 SIM_STRESS_PATH = os.path.join(DATA_PROCESSED, "simulation_stressed.csv")
+SIM_STRESS_PARQUET = os.path.join(DATA_PROCESSED, "simulation_stressed.parquet")
 
 DASHBOARD_KPIS = os.path.join(DATA_DEMO, "dashboard_kpis.csv")
 DASHBOARD_TRENDS = os.path.join(DATA_DEMO, "dashboard_trends.csv")
@@ -27,12 +35,19 @@ EPISODE_SIZE = 20  # Must match run_simulation.py for index fallback
 # -----------------------------
 # Load Simulation Data
 # -----------------------------
-if not os.path.exists(SIM_RUNS_PATH) or not os.path.exists(SIM_SUMMARY_PATH):
+if not (exists("simulation_runs") or os.path.exists(SIM_RUNS_PATH)) or not os.path.exists(SIM_SUMMARY_PATH):
     raise FileNotFoundError("❌ Simulation data not found. Run run_simulation.py first!")
 
-runs_df = pd.read_csv(SIM_RUNS_PATH)
+# Latest run only: partition pruning reads just that run's files
+if exists("simulation_runs"):
+    run_id = partition_values("simulation_runs", "run_id")[-1]
+    runs_df = read_dataset("simulation_runs", filters=[("run_id", "=", run_id)])
+    print(f"✅ Loaded simulation runs (run_id={run_id}): {len(runs_df)} rows")
+else:
+    run_id = None
+    runs_df = pd.read_csv(SIM_RUNS_PATH)
+    print(f"✅ Loaded simulation runs: {len(runs_df)} rows")
 summary_df = pd.read_csv(SIM_SUMMARY_PATH)
-print(f"✅ Loaded simulation runs: {len(runs_df)} rows")
 print(f"✅ Loaded episode summary: {len(summary_df)} episodes")
 
 # -----------------------------
@@ -46,8 +61,9 @@ if "compliance" not in runs_df.columns:
     else:
         runs_df["compliance"] = 0.6 + 0.4 * np.random.rand(len(runs_df))
 
-# Save updated runs_df back to processed
-runs_df.to_csv(SIM_RUNS_PATH, index=False)
+    # Legacy CSV input: save the updated runs back (lake runs already carry compliance)
+    if run_id is None:
+        runs_df.to_csv(SIM_RUNS_PATH, index=False)
 
 # -----------------------------
 # 1. Compute Latest KPIs
@@ -56,11 +72,16 @@ latest_avg_profit = runs_df["profit"].mean() if "profit" in runs_df else 0
 latest_avg_cvar = runs_df["cvar"].mean() if "cvar" in runs_df else 0
 latest_avg_compliance = runs_df["compliance"].mean()  # float 0.6–1.0
 
-kpi_df = pd.DataFrame([{
+kpi = {
     "avg_profit": latest_avg_profit,
     "avg_cvar": latest_avg_cvar,
     "avg_compliance": latest_avg_compliance
-}])
+}
+# Tail risk over all episodes from merged per-episode reward sketches
+tail = summarize_tail_risk(summary_df)
+if tail:
+    kpi.update({"reward_var_95": tail["reward_var_95"], "reward_cvar_95": tail["reward_cvar_95"]})
+kpi_df = pd.DataFrame([kpi])
 kpi_df.to_csv(DASHBOARD_KPIS, index=False)
 print(f"✅ Saved dashboard KPIs to {DASHBOARD_KPIS}")
 
@@ -112,8 +133,15 @@ print(f"✅ Saved dashboard bids to {DASHBOARD_BIDS}")
 # -----------------------------
 # 4. Optional: Stress Test Summary
 # -----------------------------
-if os.path.exists(SIM_STRESS_PATH):
-    stress_df = pd.read_csv(SIM_STRESS_PATH)
+if exists("simulation_stressed") or os.path.exists(SIM_STRESS_PARQUET) or os.path.exists(SIM_STRESS_PATH):
+    # Prefer the data lake (latest run), then standalone Parquet, then legacy CSV
+    if exists("simulation_stressed"):
+        stress_run = partition_values("simulation_stressed", "run_id")[-1]
+        stress_df = read_dataset("simulation_stressed", filters=[("run_id", "=", stress_run)])
+    elif os.path.exists(SIM_STRESS_PARQUET):
+        stress_df = pd.read_parquet(SIM_STRESS_PARQUET)
+    else:
+        stress_df = pd.read_csv(SIM_STRESS_PATH)
 
     # Ensure compliance for stressed df as well
     if "compliance" not in stress_df.columns:
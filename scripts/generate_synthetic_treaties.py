@@ -1,121 +1,207 @@
+"""
+generate_synthetic_treaties.py
+
+Vectorized synthetic treaty generator for load-testing the whole pipeline.
+- All columns are drawn with a seeded NumPy Generator, a block of rows at a
+  time (including the conditional XoL / Quota fields)
+- Each block of BLOCK_SIZE rows has its own RNG stream default_rng([seed, block]),
+  so a given seed produces identical rows whatever chunk size is used
+- Chunks are written as they are generated (10M+ rows in constant memory) to a
+  treaties dataset of the data lake (datalake/lake.py: partitioned by submission
+  month and region, categorical columns dictionary-encoded); the legacy CSV is optional
+"""
+
 import os
-import random
-import pandas as pd
+import sys
+import argparse
 import numpy as np
-from datetime import datetime, timedelta
+import pandas as pd
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datalake.lake import write_dataset
 
 # -----------------------------
 # Config
 # -----------------------------
-RAW_DIR = "../data/raw"
-DEMO_DIR = "../data/demo"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(SCRIPT_DIR, "..", "data", "raw")
+DEMO_DIR = os.path.join(SCRIPT_DIR, "..", "data", "demo")
+TREATIES_DATASET = os.path.join(RAW_DIR, "treaties_raw")  # partitioned like the lake "treaties" dataset
+TREATIES_CSV = os.path.join(RAW_DIR, "treaties_raw.csv")
 
 N_REINSURERS = 30
 N_CEDENTS = 20
 N_TREATIES = 100_000
 N_DEMO = 1_000
+BLOCK_SIZE = 65_536  # rows per RNG stream; fixed so output does not depend on chunk size
 
 REGIONS = ["US", "EU", "APAC", "LATAM"]
 LINES_OF_BUSINESS = ["Property", "Casualty", "Specialty"]
 TREATY_TYPES = ["XoL", "Quota"]
+RATINGS = ["AA", "A", "BBB"]
+START_DATE = np.datetime64("2025-01-01")
+SUBMISSION_WINDOW_DAYS = 181
 
-os.makedirs(RAW_DIR, exist_ok=True)
-os.makedirs(DEMO_DIR, exist_ok=True)
 
 # -----------------------------
-# 1. Generate Reinsurer & Cedent Metadata
+# 1. Reinsurer & Cedent Metadata
 # -----------------------------
-def generate_reinsurer_info(n_reinsurers=30, n_cedents=20):
-    rows = []
-
-    # Reinsurers
-    for i in range(1, n_reinsurers + 1):
-        rows.append({
-            "entity_id": f"R{i:03d}",
-            "entity_type": "reinsurer",
-            "entity_name": f"Reinsurer_{i:03d}",
-            "region": random.choice(REGIONS),
-            "incumbent_flag": int(random.random() < 0.6),  # 60% incumbents
-            "rating": random.choice(["AA", "A", "BBB"])
-        })
-
-    # Cedents
-    for i in range(1, n_cedents + 1):
-        rows.append({
-            "entity_id": f"C{i:03d}",
-            "entity_type": "cedent",
-            "entity_name": f"Cedent_{i:03d}",
-            "region": random.choice(REGIONS),
-            "incumbent_flag": "",
-            "rating": ""
-        })
-
-    df = pd.DataFrame(rows)
-    return df
-
-reinsurer_df = generate_reinsurer_info(N_REINSURERS, N_CEDENTS)
-reinsurer_path = os.path.join(RAW_DIR, "reinsurer_info.csv")
-reinsurer_df.to_csv(reinsurer_path, index=False)
-print(f"✅ Saved {reinsurer_path} ({len(reinsurer_df)} rows)")
+def generate_reinsurer_info(n_reinsurers=N_REINSURERS, n_cedents=N_CEDENTS, seed=42):
+    rng = np.random.default_rng([seed, 0xC0DE])
+    reinsurers = pd.DataFrame({
+        "entity_id": [f"R{i:03d}" for i in range(1, n_reinsurers + 1)],
+        "entity_type": "reinsurer",
+        "entity_name": [f"Reinsurer_{i:03d}" for i in range(1, n_reinsurers + 1)],
+        "region": rng.choice(REGIONS, n_reinsurers),
+        "incumbent_flag": (rng.random(n_reinsurers) < 0.6).astype(int),  # 60% incumbents
+        "rating": rng.choice(RATINGS, n_reinsurers),
+    })
+    cedents = pd.DataFrame({
+        "entity_id": [f"C{i:03d}" for i in range(1, n_cedents + 1)],
+        "entity_type": "cedent",
+        "entity_name": [f"Cedent_{i:03d}" for i in range(1, n_cedents + 1)],
+        "region": rng.choice(REGIONS, n_cedents),
+        "incumbent_flag": "",
+        "rating": "",
+    })
+    return pd.concat([reinsurers, cedents], ignore_index=True)
+
 
 # -----------------------------
-# 2. Generate Synthetic Treaties
+# 2. Synthetic Treaties (vectorized, block-seeded)
 # -----------------------------
-def generate_treaties(n_treaties=100_000):
-    treaties = []
-
-    reinsurers = reinsurer_df[reinsurer_df["entity_type"] == "reinsurer"]["entity_id"].tolist()
-    cedents = reinsurer_df[reinsurer_df["entity_type"] == "cedent"]["entity_id"].tolist()
-
-    start_date = datetime(2025, 1, 1)
-
-    for i in range(1, n_treaties + 1):
-        treaty_type = random.choice(TREATY_TYPES)
-        line = random.choice(LINES_OF_BUSINESS)
-        region = random.choice(REGIONS)
-        cedent_id = random.choice(cedents)
-        reinsurer_id = random.choice(reinsurers)
-
-        premium = round(np.random.lognormal(mean=15, sigma=0.5), -3)  # ~3M-20M
-        attachment_point = round(premium * random.uniform(2, 5), -3) if treaty_type == "XoL" else ""
-        limit = round(attachment_point * random.uniform(2, 5), -3) if treaty_type == "XoL" else ""
-        quota_share = round(random.uniform(0.1, 0.4), 2) if treaty_type == "Quota" else ""
-
-        accepted = int(random.random() < 0.7)  # ~70% acceptance
-        observed_loss_ratio = round(min(max(np.random.normal(0.65, 0.2), 0), 2), 2)
-        cvar_95 = round(premium * random.uniform(1.5, 3.5), -3)
-
-        submission_date = start_date + timedelta(days=random.randint(0, 180))
-
-        treaties.append({
-            "treaty_id": f"T{i:06d}",
-            "cedent_id": cedent_id,
-            "reinsurer_id": reinsurer_id,
-            "treaty_type": treaty_type,
-            "line_of_business": line,
-            "region": region,
-            "premium": premium,
-            "attachment_point": attachment_point,
-            "limit": limit,
-            "quota_share": quota_share,
-            "accepted": accepted,
-            "observed_loss_ratio": observed_loss_ratio,
-            "cvar_95": cvar_95,
-            "submission_date": submission_date.strftime("%Y-%m-%d")
-        })
-
-    return pd.DataFrame(treaties)
-
-treaties_df = generate_treaties(N_TREATIES)
-
-treaties_path = os.path.join(RAW_DIR, "treaties_raw.csv")
-treaties_df.to_csv(treaties_path, index=False)
-print(f"✅ Saved {treaties_path} ({len(treaties_df)} rows)")
+def _categorical(codes: np.ndarray, categories) -> pd.Categorical:
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def generate_treaty_block(block: int, seed: int = 42, n_rows: int = BLOCK_SIZE,
+                          n_reinsurers: int = N_REINSURERS, n_cedents: int = N_CEDENTS) -> pd.DataFrame:
+    """Rows [block * BLOCK_SIZE, block * BLOCK_SIZE + n_rows) of the synthetic book for this seed."""
+    rng = np.random.default_rng([seed, block])
+    n = BLOCK_SIZE  # always draw the full block so every row's values are fixed by (seed, block, offset)
+    first = block * BLOCK_SIZE + 1
+
+    treaty_type = rng.integers(0, len(TREATY_TYPES), n)
+    line = rng.integers(0, len(LINES_OF_BUSINESS), n)
+    region = rng.integers(0, len(REGIONS), n)
+    cedent = rng.integers(0, n_cedents, n)
+    reinsurer = rng.integers(0, n_reinsurers, n)
+
+    premium = np.round(rng.lognormal(mean=15, sigma=0.5, size=n), -3)  # ~3M-20M
+    is_xol = treaty_type == TREATY_TYPES.index("XoL")
+    attachment_point = np.where(is_xol, np.round(premium * rng.uniform(2, 5, n), -3), np.nan)
+    limit = np.where(is_xol, np.round(attachment_point * rng.uniform(2, 5, n), -3), np.nan)
+    quota_share = np.where(~is_xol, np.round(rng.uniform(0.1, 0.4, n), 2), np.nan)
+
+    accepted = (rng.random(n) < 0.7).astype(np.int8)  # ~70% acceptance
+    observed_loss_ratio = np.round(np.clip(rng.normal(0.65, 0.2, n), 0, 2), 2)
+    cvar_95 = np.round(premium * rng.uniform(1.5, 3.5, n), -3)
+    submission_date = START_DATE + rng.integers(0, SUBMISSION_WINDOW_DAYS, n).astype("timedelta64[D]")
+    sample_key = rng.random(n)  # demo sampling key
+
+    ids = np.arange(first, first + n)
+    df = pd.DataFrame({
+        "treaty_id": np.char.add("T", np.char.zfill(ids.astype(str), 6)),
+        "cedent_id": _categorical(cedent, [f"C{i:03d}" for i in range(1, n_cedents + 1)]),
+        "reinsurer_id": _categorical(reinsurer, [f"R{i:03d}" for i in range(1, n_reinsurers + 1)]),
+        "treaty_type": _categorical(treaty_type, TREATY_TYPES),
+        "line_of_business": _categorical(line, LINES_OF_BUSINESS),
+        "region": _categorical(region, REGIONS),
+        "premium": premium,
+        "attachment_point": attachment_point,
+        "limit": limit,
+        "quota_share": quota_share,
+        "accepted": accepted,
+        "observed_loss_ratio": observed_loss_ratio,
+        "cvar_95": cvar_95,
+        "submission_date": submission_date,
+        "_sample_key": sample_key,
+    })
+    return df.iloc[:n_rows]
+
+
+def iter_treaties(n_treaties: int = N_TREATIES, chunk_size: int = BLOCK_SIZE, seed: int = 42):
+    """Yield DataFrame chunks of about chunk_size rows; concatenated output is chunk-size invariant."""
+    pending, pending_rows = [], 0
+    n_blocks = -(-n_treaties // BLOCK_SIZE)
+    for block in range(n_blocks):
+        pending.append(generate_treaty_block(block, seed, min(BLOCK_SIZE, n_treaties - block * BLOCK_SIZE)))
+        pending_rows += len(pending[-1])
+        while pending_rows >= chunk_size or (block == n_blocks - 1 and pending_rows):
+            buffer = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+            yield buffer.iloc[:chunk_size].reset_index(drop=True)
+            rest = buffer.iloc[chunk_size:]
+            pending, pending_rows = ([rest], len(rest)) if len(rest) else ([], 0)
+
+
+def generate_treaties(n_treaties: int = N_TREATIES, seed: int = 42) -> pd.DataFrame:
+    """Whole synthetic book in memory (small n)."""
+    return pd.concat(iter_treaties(n_treaties, seed=seed), ignore_index=True).drop(columns="_sample_key")
+
 
 # -----------------------------
-# 3. Create 1k Demo Sample
+# 3. Write Dataset (+ optional CSV) and Demo Sample
 # -----------------------------
-demo_sample = treaties_df.sample(N_DEMO, random_state=42)
-demo_sample_path = os.path.join(DEMO_DIR, "sample_treaties.csv")
-demo_sample.to_csv(demo_sample_path, index=False)
-print(f"✅ Saved demo sample {demo_sample_path} ({len(demo_sample)} rows)")
+def write_treaties(n_treaties: int = N_TREATIES, chunk_size: int = 1_000_000, seed: int = 42,
+                   dataset_path: str = TREATIES_DATASET, csv_path: str = None, n_demo: int = N_DEMO):
+    """Stream the synthetic book into a Parquet dataset partitioned by submission_month / region."""
+    demo = None
+    n_rows = 0
+    for i, chunk in enumerate(iter_treaties(n_treaties, chunk_size, seed)):
+        # Demo sample: the n_demo rows with the smallest keys (uniform, chunk-size invariant)
+        candidates = chunk.nsmallest(n_demo, "_sample_key")
+        demo = candidates if demo is None else pd.concat([demo, candidates]).nsmallest(n_demo, "_sample_key")
+        chunk = chunk.drop(columns="_sample_key")
+
+        months, month_codes = np.unique(chunk["submission_date"].to_numpy().astype("datetime64[M]"), return_inverse=True)
+        chunk["submission_month"] = _categorical(month_codes, months.astype(str))  # "YYYY-MM"
+        write_dataset(chunk, "treaties", path=dataset_path)
+        if csv_path:
+            chunk.drop(columns="submission_month").to_csv(csv_path, mode="w" if i == 0 else "a",
+                                                          header=i == 0, index=False, date_format="%Y-%m-%d")
+        n_rows += len(chunk)
+        print(f"   ... {n_rows:,} / {n_treaties:,} rows")
+
+    demo = demo.sort_values("treaty_id").drop(columns="_sample_key")
+    return n_rows, demo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic treaty book.")
+    parser.add_argument("--n", type=int, default=N_TREATIES, help="Number of treaties")
+    parser.add_argument("--chunk_size", type=int, default=1_000_000, help="Rows generated and written per chunk")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, default=TREATIES_DATASET, help="Partitioned Parquet dataset directory")
+    parser.add_argument("--no_csv", action="store_true", help=f"Skip the legacy {os.path.basename(TREATIES_CSV)}")
+    parser.add_argument("--no_demo", action="store_true",
+                        help="Skip data/demo/sample_treaties.csv (written from the cleaned data by process_synthetic_data.py)")
+    args = parser.parse_args()
+    if args.n < 1:
+        parser.error("--n must be at least 1")
+
+    os.makedirs(RAW_DIR, exist_ok=True)
+    os.makedirs(DEMO_DIR, exist_ok=True)
+    if os.path.exists(args.output) and os.listdir(args.output):
+        raise FileExistsError(f"❌ {args.output} already contains data; remove it or pass another --output")
+
+    reinsurer_df = generate_reinsurer_info(seed=args.seed)
+    reinsurer_path = os.path.join(RAW_DIR, "reinsurer_info.csv")
+    reinsurer_df.to_csv(reinsurer_path, index=False)
+    print(f"✅ Saved {reinsurer_path} ({len(reinsurer_df)} rows)")
+
+    n_rows, demo_sample = write_treaties(args.n, args.chunk_size, args.seed, args.output,
+                                         csv_path=None if args.no_csv else TREATIES_CSV)
+    print(f"✅ Saved {args.output} ({n_rows:,} rows, partitioned by submission_month / region)")
+    if not args.no_csv:
+        print(f"✅ Saved {TREATIES_CSV} ({n_rows:,} rows)")
+
+    if not args.no_demo:
+        demo_sample_path = os.path.join(DEMO_DIR, "sample_treaties.csv")
+        demo_sample.to_csv(demo_sample_path, index=False, date_format="%Y-%m-%d")
+        print(f"✅ Saved demo sample {demo_sample_path} ({len(demo_sample)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,61 @@
 import os
+import sys
+import argparse
 import numpy as np
 import pandas as pd
 
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datalake.lake import read_dataset, write_dataset, exists
+
 RAW_DIR = "../data/raw"
 PROCESSED_DIR = "../data/processed"
 DEMO_DIR = "../data/demo"
 
 N_DEMO = 1000
 
+parser = argparse.ArgumentParser(description="Clean synthetic treaties and build the legacy MarketLens feature files.")
+parser.add_argument("--lake_only", action="store_true",
+                    help="Only write the cleaned treaties dataset and the demo treaties; skip the legacy "
+                         "marketlens_features / labels files (marketlens/preprocess.py owns them in the pipeline)")
+args = parser.parse_args()
+
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 os.makedirs(DEMO_DIR, exist_ok=True)
 
 # -----------------------------
 # 1. Load Raw Data
 # -----------------------------
-treaties_df = pd.read_csv(os.path.join(RAW_DIR, "treaties_raw.csv"))
+# Partitioned Parquet from generate_synthetic_treaties.py; legacy CSV as fallback
+RAW_TREATIES_DATASET = os.path.join(RAW_DIR, "treaties_raw")
+if exists("treaties", RAW_TREATIES_DATASET):
+    treaties_df = read_dataset("treaties", path=RAW_TREATIES_DATASET)
+else:
+    treaties_df = pd.read_csv(os.path.join(RAW_DIR, "treaties_raw.csv"))
 reinsurer_df = pd.read_csv(os.path.join(RAW_DIR, "reinsurer_info.csv"))
 
 # -----------------------------
 # 2. Clean & Standardize
 # -----------------------------
 treaties_df["submission_date"] = pd.to_datetime(treaties_df["submission_date"])
-treaties_df["attachment_point"].fillna(0, inplace=True)
-treaties_df["limit"].fillna(0, inplace=True)
-treaties_df["quota_share"].fillna(0, inplace=True)
+fill_cols = ["attachment_point", "limit", "quota_share"]
+treaties_df[fill_cols] = treaties_df[fill_cols].fillna(0)
 
-# Save cleaned synthetic dataset
-treaties_clean_path = os.path.join(PROCESSED_DIR, "treaties_synthetic.csv")
-treaties_df.to_csv(treaties_clean_path, index=False)
+# Save cleaned synthetic dataset to the data lake (partitioned by submission month / region)
+treaties_clean_path = write_dataset(treaties_df, "treaties", mode="overwrite")
 print(f"✅ Saved {treaties_clean_path} ({len(treaties_df)} rows)")
 
+# Demo subset for Streamlit (row positions match the MarketLens demo sample below)
+demo_sample_idx = treaties_df.sample(N_DEMO, random_state=42).index
+demo_treaties = treaties_df.loc[demo_sample_idx]
+demo_treaties_path = os.path.join(DEMO_DIR, "sample_treaties.csv")
+demo_treaties.to_csv(demo_treaties_path, index=False)
+print(f"✅ Demo sample saved: {demo_treaties_path} ({len(demo_treaties)} rows)")
+
+if args.lake_only:
+    sys.exit(0)
+
 # -----------------------------
 # 3. Merge Reinsurer Metadata
 # -----------------------------
@@ -44,20 +70,19 @@ merged_df = treaties_df.merge(reinsurer_meta, on="reinsurer_id", how="left")
 # -----------------------------
 features = merged_df.copy()
 
-# Ratios
-features["premium_to_limit_ratio"] = features.apply(
-    lambda row: row["premium"] / row["limit"] if row["limit"] else 0, axis=1
-)
-features["premium_to_attachment_ratio"] = features.apply(
-    lambda row: row["premium"] / row["attachment_point"] if row["attachment_point"] else 0, axis=1
-)
-features["log_premium"] = features["premium"].apply(lambda x: np.log1p(x))
+# Ratios (vectorized; 0 where the denominator is 0)
+premium = features["premium"].to_numpy(dtype=np.float64)
+for col, denom_col in [("premium_to_limit_ratio", "limit"), ("premium_to_attachment_ratio", "attachment_point")]:
+    denom = features[denom_col].to_numpy(dtype=np.float64)
+    features[col] = np.divide(premium, denom, out=np.zeros_like(premium), where=denom != 0)
+features["log_premium"] = np.log1p(premium)
 
 # One-hot encode categorical columns
 features = pd.get_dummies(
     features,
     columns=["treaty_type", "line_of_business", "region"],
-    drop_first=True
+    drop_first=True,
+    dtype=np.uint8
 )
 
 # Select ML features
@@ -69,7 +94,10 @@ feature_cols = [
                                   or col.startswith("line_of_business_")
                                   or col.startswith("region_")]
 
-features_ml = features[feature_cols]
+# Compact dtypes: float32 numerics, uint8 one-hots
+features_ml = features[feature_cols].astype(
+    {col: np.float32 for col in feature_cols if features[col].dtype != np.uint8}
+)
 
 # -----------------------------
 # 5. Labels
@@ -90,15 +118,8 @@ print(f"✅ Saved {features_path} ({features_ml.shape[0]} rows, {features_ml.sha
 print(f"✅ Saved {labels_path} ({labels.shape[0]} rows, {labels.shape[1]} labels)")
 
 # -----------------------------
-# 7. Create Demo Subset for Streamlit
+# 7. Demo MarketLens Features & Labels (same rows as the demo treaties)
 # -----------------------------
-demo_sample_idx = features_ml.sample(N_DEMO, random_state=42).index
-
-# Demo treaties CSV
-demo_treaties = treaties_df.loc[demo_sample_idx]
-demo_treaties_path = os.path.join(DEMO_DIR, "sample_treaties.csv")
-demo_treaties.to_csv(demo_treaties_path, index=False)
-
 # Demo MarketLens features
 demo_features = features_ml.loc[demo_sample_idx]
 demo_features_path = os.path.join(DEMO_DIR, "sample_marketlens.parquet")
@@ -109,6 +130,5 @@ demo_labels = labels.loc[demo_sample_idx]
 demo_labels_path = os.path.join(DEMO_DIR, "sample_marketlens_labels.parquet")
 demo_labels.to_parquet(demo_labels_path, index=False)
 
-print(f"✅ Demo sample saved: {demo_treaties_path} ({len(demo_treaties)} rows)")
 print(f"✅ Demo MarketLens features: {demo_features_path}")
 print(f"✅ Demo MarketLens labels: {demo_labels_path}")
@@ -0,0 +1,389 @@
+"""
+run_pipeline.py
+
+Incremental DAG runner for the pipeline scripts.
+- Each stage declares its script, parameters (passed as --key value), the code it
+  depends on, and its input and output files / datasets
+- Stage dependencies follow from inputs and outputs (the stage producing a path
+  runs before every stage reading it)
+- A stage's fingerprint hashes its script, code, parameters and the content of
+  its inputs; a stage is skipped when the fingerprint is unchanged and its outputs
+  are still the ones it produced, so a one-parameter change reruns only the
+  stages downstream of it (and none whose inputs come out identical); a stage
+  that overwrites another stage's declared outputs is reported as an undeclared writer
+- Independent stages (e.g. MarketLens training and the MAPPO simulation) run in
+  parallel subprocesses; per-stage status and wall-clock times are reported and
+  saved with the fingerprints in outputs/pipeline_state.json
+
+Usage:
+    python scripts/run_pipeline.py                                   # run what is out of date
+    python scripts/run_pipeline.py --set generate_treaties.seed=7    # one changed parameter
+    python scripts/run_pipeline.py --only marketlens_train --dry_run # what would run
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+STATE_PATH = os.path.join(PROJECT_ROOT, "outputs", "pipeline_state.json")
+LOG_DIR = os.path.join(PROJECT_ROOT, "outputs", "logs")
+
+# -----------------------------
+# Stages (paths relative to the project root)
+# -----------------------------
+# script: run with the current interpreter from cwd (some scripts use "../data" paths)
+# params: passed as --key value (True -> --key, False/None -> omitted)
+# code: extra source files / packages whose changes invalidate the stage
+# clean: outputs removed before the stage runs (scripts that refuse to overwrite)
+PIPELINE = {
+    "generate_treaties": {
+        "script": "scripts/generate_synthetic_treaties.py",
+        "cwd": "scripts",
+        "params": {"n": 100_000, "seed": 42, "no_demo": True},  # the demo sample comes from process_treaties
+        "inputs": [],
+        "outputs": ["data/raw/treaties_raw", "data/raw/treaties_raw.csv", "data/raw/reinsurer_info.csv"],
+        "code": ["datalake"],
+        "clean": ["data/raw/treaties_raw"],
+    },
+    "process_treaties": {
+        "script": "scripts/process_synthetic_data.py",
+        "cwd": "scripts",
+        "params": {"lake_only": True},  # the MarketLens feature files belong to marketlens_features
+        "inputs": ["data/raw/treaties_raw", "data/raw/treaties_raw.csv", "data/raw/reinsurer_info.csv"],
+        "outputs": ["data/lake/treaties", "data/demo/sample_treaties.csv"],
+        "code": ["datalake"],
+    },
+    "marketlens_features": {
+        "script": "marketlens/preprocess.py",
+        "inputs": ["data/lake/treaties"],
+        "outputs": [
+            "data/processed/marketlens_features.parquet", "data/processed/marketlens_labels.parquet",
+            "data/demo/sample_marketlens.parquet", "data/demo/sample_marketlens_labels.parquet",
+        ],
+        "code": ["marketlens/featurizer.py", "datalake"],
+    },
+    "marketlens_train": {
+        "script": "marketlens/train_marketlens.py",
+        "params": {"mode": "hist"},
+        "inputs": ["data/processed/marketlens_features.parquet", "data/processed/marketlens_labels.parquet"],
+        "outputs": ["marketlens/models/xgb_acceptance.json", "marketlens/models/xgb_lossratio.json",
+                    "marketlens/models/training_report.json"],
+        "code": ["marketlens/preprocess.py", "marketlens/featurizer.py"],
+    },
+    "mappo_simulation": {
+        "script": "scripts/03_run_simulation.py",
+        "inputs": [],
+        "outputs": ["data/processed/simulation_results.parquet", "data/processed/simulation_steps.parquet"],
+        "code": ["marl_engine"],
+    },
+    # No stage for scripts/run_simulation.py: it imports marl_engine.simulate_env (the legacy
+    # treaty-driven env), which is not in the tree. Its per-bid outputs are therefore external
+    # inputs here: the data lake run if one exists, else the legacy CSVs in data/processed.
+    "dashboard_bids": {
+        "script": "scripts/generate_dashboard_data.py",
+        "inputs": ["data/lake/simulation_runs", "data/lake/simulation_stressed",
+                   "data/processed/simulation_runs.csv", "data/processed/simulation_stressed.csv",
+                   "data/processed/simulation_summary.csv"],
+        "outputs": ["data/demo/dashboard_kpis.csv", "data/demo/dashboard_trends.csv",
+                    "data/demo/dashboard_bids.csv", "data/demo/dashboard_stress_summary.csv"],
+        "code": ["marl_engine/utils.py", "marl_engine/quantile_sketch.py", "datalake"],
+    },
+    "dashboard_kpis": {
+        "script": "scripts/04_generate_dashboard_data.py",
+        "inputs": ["data/processed/simulation_results.parquet",
+                   "data/processed/marketlens_features.parquet", "data/processed/marketlens_labels.parquet"],
+        "outputs": ["data/processed/dashboard_data.parquet"],
+    },
+    "clause_index": {
+        "script": "scripts/05_export_report.py",
+        "cwd": "scripts",
+        "inputs": ["clauselens/legal_corpus/embeddings.npy"],
+        "outputs": ["clauselens/legal_corpus/faiss_index.bin"],
+    },
+    "report": {
+        "script": "scripts/export_report.py",
+        "cwd": "scripts",
+        "inputs": ["data/demo/dashboard_kpis.csv", "data/demo/dashboard_trends.csv",
+                   "data/demo/dashboard_bids.csv", "data/demo/sample_marketlens.parquet"],
+        "outputs": ["data/reports"],
+    },
+}
+
+
+# -----------------------------
+# Content Hashing
+# -----------------------------
+class ContentHasher:
+    """SHA-256 of files and directories; per-file digests are reused while size and mtime are unchanged."""
+
+    def __init__(self, cache: dict = None):
+        self.cache = cache or {}  # abs path -> [size, mtime_ns, sha256]
+
+    def file(self, path: str) -> str:
+        stat = os.stat(path)
+        cached = self.cache.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path(self, path: str) -> str:
+        """Digest of a file or directory ("missing" if absent)."""
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return "missing"
+        # Directory: sub-directory + content of every file. File names are left out because
+        # dataset part files carry write timestamps; identical data hashes identically.
+        entries = []
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d != "__pycache__"]
+            rel = os.path.relpath(root, path)
+            entries += [f"{rel}:{self.file(os.path.join(root, f))}" for f in files
+                        if not f.startswith(".") and not f.endswith(".pyc")]
+        return hashlib.sha256("\n".join(sorted(entries)).encode()).hexdigest()
+
+
+def _abs(path: str) -> str:
+    return os.path.join(PROJECT_ROOT, path)
+
+
+def stage_fingerprint(name: str, stage: dict, hasher: ContentHasher) -> str:
+    parts = {
+        "stage": name,
+        "script": hasher.path(_abs(stage["script"])),
+        "code": {path: hasher.path(_abs(path)) for path in stage.get("code", [])},
+        "params": stage.get("params", {}),
+        "inputs": {path: hasher.path(_abs(path)) for path in stage["inputs"]},
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# -----------------------------
+# DAG
+# -----------------------------
+def build_dag(pipeline: dict) -> dict:
+    """{stage: set of upstream stages}, from which stage produces each input path."""
+    producers = {}
+    for name, stage in pipeline.items():
+        for path in stage["outputs"]:
+            if path in producers:
+                raise ValueError(f"❌ {path} is an output of both {producers[path]} and {name}")
+            producers[path] = name
+    dag = {name: {producers[p] for p in stage["inputs"] if p in producers} - {name}
+           for name, stage in pipeline.items()}
+
+    # Cycle check (Kahn)
+    remaining = {name: set(deps) for name, deps in dag.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"❌ Pipeline has a dependency cycle among {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return dag
+
+
+def _foreign_outputs(name: str, pipeline: dict, exclude) -> list:
+    """Declared outputs of the other stages (minus those of `exclude`), for undeclared-write checks."""
+    return [path for other, stage in pipeline.items() if other != name and other not in exclude
+            for path in stage["outputs"]]
+
+
+def upstream_closure(dag: dict, targets) -> set:
+    selected, stack = set(), list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(dag[name])
+    return selected
+
+
+def stage_command(stage: dict) -> list:
+    cmd = [sys.executable, _abs(stage["script"])]
+    for key, value in stage.get("params", {}).items():
+        if value is True:
+            cmd.append(f"--{key}")
+        elif value not in (False, None):
+            cmd += [f"--{key}", str(value)]
+    return cmd
+
+
+def _run_stage(name: str, stage: dict, log_path: str):
+    """Run one stage as a subprocess; returns (returncode, seconds)."""
+    for path in stage.get("clean", []):
+        if os.path.isdir(_abs(path)):
+            shutil.rmtree(_abs(path))
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        result = subprocess.run(stage_command(stage), cwd=_abs(stage.get("cwd", ".")),
+                                stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode, time.perf_counter() - start
+
+
+# -----------------------------
+# State
+# -----------------------------
+def load_state(path: str = STATE_PATH) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"stages": {}, "files": {}}
+
+
+def save_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)  # an interrupted run never leaves a corrupt state file
+
+
+def is_up_to_date(name: str, stage: dict, fingerprint: str, state: dict, hasher: ContentHasher) -> bool:
+    record = state["stages"].get(name)
+    if not record or record.get("fingerprint") != fingerprint or record.get("status") != "ok":
+        return False
+    # Outputs must still be the ones this stage produced (not deleted or overwritten since)
+    return all(record["outputs"].get(path) == hasher.path(_abs(path)) for path in stage["outputs"])
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def run_pipeline(pipeline: dict = None, only=None, force=(), max_workers: int = None,
+                 dry_run: bool = False, state_path: str = STATE_PATH) -> list:
+    """
+    Run out-of-date stages in dependency order, independent stages in parallel.
+    only: target stages (their upstream stages are included); force: stages rerun regardless.
+    Returns one report row per stage: stage, status (ran / skipped / failed / blocked / stale), seconds.
+    """
+    pipeline = pipeline or PIPELINE
+    dag = build_dag(pipeline)
+    selected = upstream_closure(dag, only) if only else set(pipeline)
+    state = load_state(state_path)
+    hasher = ContentHasher(state.get("files"))
+    os.makedirs(LOG_DIR, exist_ok=True)
+    run_tag = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    done, report, running = {}, [], {}
+    pending = [name for name in pipeline if name in selected]
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"🎬 Pipeline: {len(pending)} stages, up to {max_workers} in parallel")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name in [n for n in pending if all(d in done or d not in selected for d in dag[n])]:
+                pending.remove(name)
+                stage = pipeline[name]
+                if any(done.get(d) in ("failed", "blocked") for d in dag[name]):
+                    done[name] = "blocked"
+                    report.append({"stage": name, "status": "blocked", "seconds": 0.0})
+                    print(f"⚠️ {name}: blocked by a failed upstream stage")
+                    continue
+                fingerprint = stage_fingerprint(name, stage, hasher)
+                # Inputs are hashed after upstream stages finished: if they came out identical, this stage is
+                # still up to date. In a dry run upstream outputs are unknown, so stale propagates.
+                upstream_stale = any(done.get(d) == "stale" for d in dag[name])
+                if name not in force and not upstream_stale and is_up_to_date(name, stage, fingerprint, state, hasher):
+                    done[name] = "skipped"
+                    report.append({"stage": name, "status": "skipped", "seconds": 0.0})
+                    print(f"✅ {name}: up to date")
+                elif dry_run:
+                    done[name] = "stale"
+                    report.append({"stage": name, "status": "stale", "seconds": 0.0})
+                    print(f"🔁 {name}: would run ({' '.join(stage_command(stage)[1:])})")
+                else:
+                    log_path = os.path.join(LOG_DIR, f"pipeline_{name}_{run_tag}.log")
+                    print(f"🚀 {name}: running (log: {log_path})")
+                    # Snapshot other stages' outputs: a script writing files it does not declare would
+                    # silently invalidate (and rerun) their owners
+                    watched = {path: hasher.path(_abs(path)) for path in _foreign_outputs(name, pipeline, ())}
+                    running[pool.submit(_run_stage, name, stage, log_path)] = (name, fingerprint, log_path, watched)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprint, log_path, watched = running.pop(future)
+                returncode, seconds = future.result()
+                stage = pipeline[name]
+                # Outputs of stages that ran meanwhile changed legitimately
+                busy = {n for n, status in done.items() if status == "ran"} | {r[0] for r in running.values()}
+                undeclared = sorted(path for path in _foreign_outputs(name, pipeline, busy)
+                                    if path in watched and hasher.path(_abs(path)) != watched[path])
+                for path in undeclared:
+                    print(f"⚠️ {name}: wrote {path}, which it does not declare (declared by another stage)")
+                if returncode == 0:
+                    done[name] = "ran"
+                    state["stages"][name] = {
+                        "status": "ok",
+                        "fingerprint": fingerprint,
+                        "outputs": {path: hasher.path(_abs(path)) for path in stage["outputs"]},
+                        "seconds": round(seconds, 3),
+                        "finished": datetime.now().isoformat(timespec="seconds"),
+                        **({"undeclared_writes": undeclared} if undeclared else {}),
+                    }
+                    print(f"✅ {name}: done in {seconds:.1f}s")
+                else:
+                    done[name] = "failed"
+                    state["stages"][name] = {"status": "failed", "fingerprint": fingerprint, "outputs": {},
+                                             "seconds": round(seconds, 3)}
+                    print(f"❌ {name}: failed (exit {returncode}) after {seconds:.1f}s; see {log_path}")
+                report.append({"stage": name, "status": done[name], "seconds": round(seconds, 3)})
+                state["files"] = hasher.cache
+                save_state(state, state_path)
+
+    if not dry_run:
+        state["files"] = {path: entry for path, entry in hasher.cache.items() if os.path.exists(path)}
+        save_state(state, state_path)
+
+    print("\n⏱️ Stage timings:")
+    for row in report:
+        print(f"   {row['stage']:<22} {row['status']:<8} {row['seconds']:>8.1f}s")
+    return report
+
+
+def apply_overrides(pipeline: dict, overrides) -> dict:
+    """Apply "stage.param=value" overrides (values parsed as JSON when possible)."""
+    pipeline = {name: {**stage, "params": dict(stage.get("params", {}))} for name, stage in pipeline.items()}
+    for override in overrides or []:
+        key, _, raw = override.partition("=")
+        name, _, param = key.partition(".")
+        if name not in pipeline or not param or not _:
+            raise ValueError(f"❌ Bad override '{override}' (expected stage.param=value)")
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        pipeline[name]["params"][param] = value
+    return pipeline
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline stages that are out of date.")
+    parser.add_argument("--only", nargs="+", choices=list(PIPELINE), default=None,
+                        help="Target stages (their upstream stages are included)")
+    parser.add_argument("--force", nargs="+", choices=list(PIPELINE), default=[], help="Rerun these stages")
+    parser.add_argument("--set", nargs="+", default=[], metavar="STAGE.PARAM=VALUE", help="Override stage parameters")
+    parser.add_argument("--workers", type=int, default=None, help="Stages run in parallel (default: all cores)")
+    parser.add_argument("--dry_run", action="store_true", help="Only report which stages would run")
+    args = parser.parse_args()
+
+    report = run_pipeline(apply_overrides(PIPELINE, args.set), only=args.only, force=set(args.force),
+                          max_workers=args.workers, dry_run=args.dry_run)
+    sys.exit(1 if any(row["status"] == "failed" for row in report) else 0)
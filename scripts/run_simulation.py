@@ -10,8 +10,13 @@ from datetime import datetime
 
 from marl_engine.simulate_env import TreatyBiddingEnv, run_episode
 from marl_engine.marl_agents import MAPPOAgent
-from marl_engine.stress_tests import run_stress_tests, summarize_stress_results
+from marl_engine.stress_tests import (
+    run_stress_tests_streaming, summarize_stress_results, run_monte_carlo_stress, summarize_monte_carlo
+)
+from marl_engine.stress_scenarios import run_scenario_grid
 from marl_engine.utils import compute_episode_summary, save_results, save_episode_summaries
+from marl_engine.columnar_log import ColumnarLogger, BID_SCHEMA
+from datalake.lake import write_dataset, dataset_path, new_run_id
 
 # -----------------------------
 # Config
@@ -23,10 +28,17 @@ os.makedirs(PROCESSED_DIR, exist_ok=True)
 N_AGENTS = 5
 EPISODES = 50
 EPISODE_SIZE = 20
+MC_SCENARIOS = 5000
 
-SIM_RUNS_PATH = os.path.join(PROCESSED_DIR, "simulation_runs.csv")
+# Per-bid and stressed results go to the data lake, partitioned by run id
+RUN_ID = new_run_id()
+SIM_RUNS_PATH = dataset_path("simulation_runs")
 SIM_SUMMARY_PATH = os.path.join(PROCESSED_DIR, "simulation_summary.csv")
-SIM_STRESS_PATH = os.path.join(PROCESSED_DIR, "simulation_stressed.csv")
+SIM_STRESS_PATH = dataset_path("simulation_stressed")
+SIM_STRESS_SUMMARY_PATH = os.path.join(PROCESSED_DIR, "simulation_stress_summary.csv")
+SIM_MC_STRESS_PATH = os.path.join(PROCESSED_DIR, "simulation_stress_scenarios.parquet")
+# Columnar per-bid log of this run, readable while the simulation is still running
+SIM_RUNS_LOG = os.path.join(PROCESSED_DIR, "simulation_runs.parquet")
 
 # -----------------------------
 # 1. Load Demo Treaties
@@ -45,7 +57,7 @@ print(f"✅ Loaded {len(treaties_df)} demo treaties")
 env = TreatyBiddingEnv(treaties_df, n_agents=N_AGENTS, episode_size=EPISODE_SIZE)
 agents = [MAPPOAgent(f"A{i+1}", risk_aversion=0.2) for i in range(N_AGENTS)]
 
-results = []
+bid_logger = ColumnarLogger(SIM_RUNS_LOG, BID_SCHEMA)
 episode_summaries = []
 
 # -----------------------------
@@ -55,10 +67,12 @@ print(f"🎬 Running {EPISODES} MARL bidding episodes...")
 for ep in range(EPISODES):
     env.reset()
     ep_df = run_episode(env, agents)
-    results.append(ep_df)
+    # Every episode column is logged; one outside BID_SCHEMA raises instead of being dropped
+    bid_logger.log_batch(**{col: ep_df[col].to_numpy() for col in ep_df.columns})
     episode_summaries.append(compute_episode_summary(ep_df))
 
-results_df = pd.concat(results, ignore_index=True)
+bid_logger.close()
+results_df = bid_logger.to_pandas()
 print(f"✅ Completed simulation: {len(results_df)} total bids")
 
 # -----------------------------
@@ -75,37 +89,45 @@ if "compliance" not in results_df.columns:
         # Random fallback for demo
         results_df["compliance"] = 0.6 + 0.4 * np.random.rand(len(results_df))
 
+# Stable bid ids (same format governance derives for legacy files without one)
+results_df["bid_id"] = (results_df["episode"].astype(str) + "_" + results_df["agent_id"].astype(str)
+                        + "_" + results_df.index.astype(str))
+
 # -----------------------------
 # 5. Save Raw Simulation Results
 # -----------------------------
-save_results(results_df, SIM_RUNS_PATH)
+write_dataset(results_df.assign(run_id=RUN_ID), "simulation_runs", mode="overwrite_partitions")
+print(f"✅ Saved results to {SIM_RUNS_PATH} (run_id={RUN_ID}, {len(results_df)} rows)")
 summary_df = save_episode_summaries(episode_summaries, SIM_SUMMARY_PATH)
 
 # -----------------------------
 # 6. Stress Test Simulation Results
 # -----------------------------
 print("⚡ Running stress tests...")
-stressed_df = run_stress_tests(results_df)
+# Streamed from this run's partition of the data lake (which carries compliance and
+# bid_id) in row-group chunks; memory stays bounded however many bids were logged.
+# Stressed rows go to Parquet, not one big CSV.
+stream_summary = run_stress_tests_streaming(os.path.join(SIM_RUNS_PATH, f"run_id={RUN_ID}"), seed=42, run_id=RUN_ID)
 
-# Ensure compliance also exists in stressed simulation
-if "compliance" not in stressed_df.columns:
-    if "cvar" in stressed_df.columns:
-        stressed_df["compliance"] = 1.0 - (
-            stressed_df["cvar"] / stressed_df["cvar"].max() * 0.4
-        )
-        stressed_df["compliance"] = stressed_df["compliance"].clip(lower=0.6, upper=1.0)
-    else:
-        stressed_df["compliance"] = 0.6 + 0.4 * np.random.rand(len(stressed_df))
+# Tidy per-scenario table: legacy scenarios + registered scenario library
+stress_summary = pd.concat(
+    [summarize_stress_results(stream_summary), run_scenario_grid(results_df, seed=42)],
+    ignore_index=True
+)
+save_results(stress_summary, SIM_STRESS_SUMMARY_PATH)
+print("✅ Stress Test Summary:\n", stress_summary[["scenario", "mean_reward", "mean_cvar", "mean_risk_adj_return"]])
 
-save_results(stressed_df, SIM_STRESS_PATH)
-stress_summary = summarize_stress_results(stressed_df)
-print("✅ Stress Test Summary:", stress_summary)
+mc_scenarios = run_monte_carlo_stress(results_df, n_scenarios=MC_SCENARIOS, seed=42)
+save_results(mc_scenarios, SIM_MC_STRESS_PATH)
+print("✅ Monte Carlo Stress Summary:", summarize_monte_carlo(mc_scenarios))
 
 # -----------------------------
 # 7. Final Dashboard Message
 # -----------------------------
 print("\n🎯 Simulation complete! Outputs ready for dashboard:")
-print(f"- Simulation runs:      {SIM_RUNS_PATH}")
+print(f"- Simulation runs:      {SIM_RUNS_PATH} (run_id={RUN_ID})")
 print(f"- Episode summary:      {SIM_SUMMARY_PATH}")
-print(f"- Stressed simulation:  {SIM_STRESS_PATH}")
+print(f"- Stressed simulation:  {SIM_STRESS_PATH} (run_id={RUN_ID})")
+print(f"- Stress summary:       {SIM_STRESS_SUMMARY_PATH}")
+print(f"- MC stress scenarios:  {SIM_MC_STRESS_PATH}")
 print("✅ Compliance column included in outputs.")